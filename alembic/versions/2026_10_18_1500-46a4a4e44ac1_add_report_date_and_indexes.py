@@ -0,0 +1,63 @@
+"""add report date and indexes
+
+Revision ID: 46a4a4e44ac1
+Revises: 0ca225abfb71
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "46a4a4e44ac1"
+down_revision: Union[str, None] = "0ca225abfb71"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("llm_report", sa.Column("report_date", sa.Date(), nullable=True))
+    # Дата отчета - дата продаж его товаров (в XML файле одна дата)
+    op.execute(
+        """
+        UPDATE llm_report
+        SET report_date = products_dates.report_date
+        FROM (
+            SELECT report_id, min(date)::date AS report_date
+            FROM products
+            GROUP BY report_id
+        ) AS products_dates
+        WHERE llm_report.id = products_dates.report_id
+        """
+    )
+    op.create_index(
+        op.f("ix_llm_report_report_date"), "llm_report", ["report_date"], unique=False
+    )
+
+    # Индексы на большой таблице строятся без блокировки записи
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f("ix_products_date"),
+            "products",
+            ["date"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            op.f("ix_products_report_id"),
+            "products",
+            ["report_id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_products_report_id"), table_name="products")
+    op.drop_index(op.f("ix_products_date"), table_name="products")
+    op.drop_index(op.f("ix_llm_report_report_date"), table_name="llm_report")
+    op.drop_column("llm_report", "report_date")
@@ -0,0 +1,103 @@
+"""partition products by month
+
+Revision ID: 897004956f64
+Revises: 46a4a4e44ac1
+Create Date: 2026-10-18 15:30:00.000000
+
+"""
+
+from datetime import date
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "897004956f64"
+down_revision: Union[str, None] = "46a4a4e44ac1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Сколько месяцев вперед создать секции сразу
+PREMAKE_MONTHS = 3
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_products_table(**kwargs: str) -> None:
+    op.create_table(
+        "products",
+        sa.Column(
+            "id",
+            sa.Integer(),
+            server_default=sa.text("nextval('products_id_seq')"),
+            nullable=False,
+        ),
+        sa.Column("report_id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("price", sa.Float(), nullable=False),
+        sa.Column("category", sa.String(), nullable=False),
+        sa.Column("date", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["report_id"],
+            ["llm_report.id"],
+            name=op.f("fk_products_report_id_llm_report"),
+        ),
+        sa.PrimaryKeyConstraint("id", "date", name=op.f("pk_products")),
+        **kwargs,
+    )
+    op.create_index(op.f("ix_products_date"), "products", ["date"], unique=False)
+    op.create_index(
+        op.f("ix_products_report_id"), "products", ["report_id"], unique=False
+    )
+
+
+def _rename_old_table() -> None:
+    op.rename_table("products", "products_old")
+    op.execute("ALTER INDEX pk_products RENAME TO pk_products_old")
+    op.execute(
+        "ALTER TABLE products_old RENAME CONSTRAINT "
+        "fk_products_report_id_llm_report TO fk_products_old_report_id_llm_report"
+    )
+    op.drop_index("ix_products_date", table_name="products_old")
+    op.drop_index("ix_products_report_id", table_name="products_old")
+
+
+def upgrade() -> None:
+    # Первичный ключ секционированной таблицы должен включать date,
+    # поэтому таблица пересоздается, а данные копируются в секции
+    _rename_old_table()
+    _create_products_table(postgresql_partition_by="RANGE (date)")
+    op.execute("ALTER SEQUENCE products_id_seq OWNED BY products.id")
+    op.execute("CREATE TABLE products_default PARTITION OF products DEFAULT")
+
+    first_date = op.get_bind().scalar(sa.text("SELECT min(date) FROM products_old"))
+    month = (first_date.date() if first_date else date.today()).replace(day=1)
+    last_month = _add_months(date.today().replace(day=1), PREMAKE_MONTHS)
+    while month <= last_month:
+        op.execute(
+            f"CREATE TABLE products_{month:%Y_%m} PARTITION OF products "
+            f"FOR VALUES FROM ('{month}') TO ('{_add_months(month, 1)}')"
+        )
+        month = _add_months(month, 1)
+
+    op.execute("INSERT INTO products SELECT * FROM products_old")
+    op.drop_table("products_old")
+
+
+def downgrade() -> None:
+    _rename_old_table()
+    _create_products_table()
+    op.execute("ALTER SEQUENCE products_id_seq OWNED BY products.id")
+    op.execute("INSERT INTO products SELECT * FROM products_old")
+    # Секции удаляются вместе с секционированной таблицей
+    op.drop_table("products_old")
+    op.execute(
+        "ALTER TABLE products DROP CONSTRAINT pk_products, "
+        "ADD CONSTRAINT pk_products PRIMARY KEY (id)"
+    )
@@ -0,0 +1,57 @@
+"""index products by date and id
+
+Revision ID: 8564de444ca1
+Revises: 897004956f64
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+
+from typing import List, Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8564de444ca1"
+down_revision: Union[str, None] = "897004956f64"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _partitions() -> List[str]:
+    return list(
+        op.get_bind().scalars(
+            sa.text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE pg_inherits.inhparent = 'products'::regclass"
+            )
+        )
+    )
+
+
+def _create_partitioned_index(name: str, columns: str) -> None:
+    # На секционированной таблице CONCURRENTLY недоступен: индекс создается
+    # на каждой секции отдельно и подключается к индексу родителя
+    op.execute(f"CREATE INDEX {name} ON ONLY products ({columns})")
+    partitions = _partitions()
+    with op.get_context().autocommit_block():
+        for partition in partitions:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition}_{name} "
+                f"ON {partition} ({columns})"
+            )
+            op.execute(f"ALTER INDEX {name} ATTACH PARTITION {partition}_{name}")
+
+
+def upgrade() -> None:
+    # Страницы товаров за день идут по (date, id): keyset пагинация
+    # читает из индекса ровно одну страницу
+    _create_partitioned_index("ix_products_date_id", "date, id")
+    op.drop_index("ix_products_date", table_name="products")
+
+
+def downgrade() -> None:
+    _create_partitioned_index("ix_products_date", "date")
+    op.drop_index("ix_products_date_id", table_name="products")
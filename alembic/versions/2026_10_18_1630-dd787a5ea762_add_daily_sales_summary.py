@@ -0,0 +1,72 @@
+"""add daily sales summary
+
+Revision ID: dd787a5ea762
+Revises: 8564de444ca1
+Create Date: 2026-10-18 16:30:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "dd787a5ea762"
+down_revision: Union[str, None] = "8564de444ca1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "daily_sales_summary",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("level", sa.String(), nullable=False),
+        sa.Column("date", sa.Date(), nullable=False),
+        sa.Column("category", sa.String(), server_default="", nullable=False),
+        sa.Column("product", sa.String(), server_default="", nullable=False),
+        sa.Column("quantity", sa.BigInteger(), nullable=False),
+        sa.Column("revenue", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_daily_sales_summary")),
+        sa.UniqueConstraint(
+            "level",
+            "date",
+            "category",
+            "product",
+            name=op.f("uq_daily_sales_summary_level_date_category_product"),
+        ),
+    )
+    # Итоги по уже загруженным товарам, дальше таблица пополняется при записи
+    op.execute(
+        """
+        INSERT INTO daily_sales_summary
+            (level, date, category, product, quantity, revenue)
+        SELECT
+            CASE GROUPING(CAST(date AS date), month, category, name)
+                WHEN 7 THEN 'day'
+                WHEN 5 THEN 'category'
+                WHEN 4 THEN 'product'
+                WHEN 9 THEN 'category_month'
+                ELSE 'product_month'
+            END,
+            COALESCE(CAST(date AS date), month),
+            COALESCE(category, ''),
+            COALESCE(name, ''),
+            sum(quantity),
+            sum(quantity * price)
+        FROM products, CAST(date_trunc('month', date) AS date) AS month
+        GROUP BY GROUPING SETS (
+            (CAST(date AS date)),
+            (CAST(date AS date), category),
+            (CAST(date AS date), category, name),
+            (month, category),
+            (month, category, name)
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("daily_sales_summary")
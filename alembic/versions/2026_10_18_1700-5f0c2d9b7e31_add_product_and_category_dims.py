@@ -0,0 +1,86 @@
+"""add product and category dimension tables
+
+Revision ID: 5f0c2d9b7e31
+Revises: dd787a5ea762
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5f0c2d9b7e31"
+down_revision: Union[str, None] = "dd787a5ea762"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DIMENSIONS = (
+    # (справочник, колонка названия в products, колонка id в products)
+    ("product_dim", "name", "product_id"),
+    ("category_dim", "category", "category_id"),
+)
+
+
+def upgrade() -> None:
+    for table, name_column, id_column in DIMENSIONS:
+        op.create_table(
+            table,
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.PrimaryKeyConstraint("id", name=op.f(f"pk_{table}")),
+            sa.UniqueConstraint("name", name=op.f(f"uq_{table}_name")),
+        )
+        op.execute(
+            f"""
+            INSERT INTO {table} (name)
+            SELECT DISTINCT {name_column} FROM products ORDER BY 1
+            """
+        )
+        op.add_column("products", sa.Column(id_column, sa.Integer(), nullable=True))
+
+    # Одно обновление таблицы для обеих колонок вместо двух
+    op.execute(
+        """
+        UPDATE products
+        SET product_id = product_dim.id, category_id = category_dim.id
+        FROM product_dim, category_dim
+        WHERE product_dim.name = products.name
+            AND category_dim.name = products.category
+        """
+    )
+
+    for table, name_column, id_column in DIMENSIONS:
+        op.alter_column("products", id_column, nullable=False)
+        op.create_foreign_key(
+            op.f(f"fk_products_{id_column}_{table}"),
+            "products",
+            table,
+            [id_column],
+            ["id"],
+        )
+        op.drop_column("products", name_column)
+
+
+def downgrade() -> None:
+    for table, name_column, id_column in DIMENSIONS:
+        op.add_column("products", sa.Column(name_column, sa.String(), nullable=True))
+    op.execute(
+        """
+        UPDATE products
+        SET name = product_dim.name, category = category_dim.name
+        FROM product_dim, category_dim
+        WHERE product_dim.id = products.product_id
+            AND category_dim.id = products.category_id
+        """
+    )
+    for table, name_column, id_column in DIMENSIONS:
+        op.alter_column("products", name_column, nullable=False)
+        op.drop_constraint(
+            op.f(f"fk_products_{id_column}_{table}"), "products", type_="foreignkey"
+        )
+        op.drop_column("products", id_column)
+        op.drop_table(table)
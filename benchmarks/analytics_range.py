@@ -0,0 +1,162 @@
+"""
+Аналитика за год: агрегаты прямо по строкам products против выборки
+предрасчитанных итогов из daily_sales_summary. Заодно замеряется, во что
+обходится пополнение итогов при записи товаров.
+
+Нужна локальная БД с примененными миграциями, подключение берется из .env:
+POSTGRES_HOST=127.0.0.1 python -m benchmarks.analytics_range [товаров в день]
+"""
+
+import asyncio
+import sys
+import time
+from datetime import date, timedelta
+from typing import Any, Awaitable, Callable, Dict, List
+
+from sqlalchemy import delete, text
+
+from src.api.v1.cruds.product_crud import SUMMARY_UPSERT, OrmQuery
+from src.core import DailySalesSummary, LLMreport, Product
+from src.core.db_helper import db_helper
+from src.core.utils.logging_config import my_logger
+
+DEFAULT_SIZE = 2000
+DATE_FROM = date(2023, 1, 1)
+DATE_TO = date(2023, 12, 31)
+RUNS = 5
+
+RAW_REVENUE = text(
+    """
+    SELECT CAST(date AS date) AS day, sum(quantity), sum(quantity * price)
+    FROM products
+    WHERE date >= :date_from AND date < :date_to
+    GROUP BY day ORDER BY day
+    """
+)
+RAW_TOP_PRODUCTS = text(
+    """
+    SELECT category_dim.name, product_dim.name, quantity, revenue
+    FROM (
+        SELECT category_id, product_id, sum(quantity) AS quantity,
+               sum(quantity * price) AS revenue
+        FROM products
+        WHERE date >= :date_from AND date < :date_to
+        GROUP BY category_id, product_id ORDER BY revenue DESC LIMIT 10
+    ) AS top
+    JOIN category_dim ON category_dim.id = top.category_id
+    JOIN product_dim ON product_dim.id = top.product_id
+    ORDER BY revenue DESC
+    """
+)
+RAW_TOP_CATEGORIES = text(
+    """
+    SELECT category_dim.name, quantity, revenue
+    FROM (
+        SELECT category_id, sum(quantity) AS quantity,
+               sum(quantity * price) AS revenue
+        FROM products
+        WHERE date >= :date_from AND date < :date_to
+        GROUP BY category_id ORDER BY revenue DESC LIMIT 10
+    ) AS top
+    JOIN category_dim ON category_dim.id = top.category_id
+    ORDER BY revenue DESC
+    """
+)
+RAW_PARAMS = {"date_from": DATE_FROM, "date_to": DATE_TO + timedelta(days=1)}
+
+
+def day_products(day: date, size: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "name": f"Product {i}",
+            "quantity": i % 100,
+            "price": 99.99,
+            "category": f"Category {i % 20}",
+            "date": day.isoformat(),
+        }
+        for i in range(size)
+    ]
+
+
+async def measure(name: str, run: Callable[[], Awaitable[Any]]) -> None:
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        await run()
+        timings.append(time.perf_counter() - start)
+    print(f"{name:>22} {min(timings) * 1000:>10.1f}")
+
+
+async def main(size: int) -> None:
+    my_logger.remove()
+    db_helper.engine.echo = False
+
+    ingest = 0.0
+    day = DATE_FROM
+    while day <= DATE_TO:
+        start = time.perf_counter()
+        await OrmQuery.bulk_create_products_and_report("bench", day_products(day, size))
+        ingest += time.perf_counter() - start
+        day += timedelta(days=1)
+    async with db_helper.session_factory() as session:
+        await session.execute(text("ANALYZE products"))
+        await session.execute(text("ANALYZE daily_sales_summary"))
+        await session.commit()
+        # Сколько из времени записи заняло пополнение итогов
+        report_id = await session.scalar(
+            text("SELECT max(id) FROM llm_report WHERE ai_report = 'bench'")
+        )
+        start = time.perf_counter()
+        await session.execute(SUMMARY_UPSERT, {"report_id": report_id})
+        summary = time.perf_counter() - start
+        await session.rollback()
+
+    print(
+        f"ingest 365 days x {size}: {ingest:.1f} s, "
+        f"summary upsert per file {summary * 1000:.1f} ms"
+    )
+    print(f"{'query':>22} {'best ms':>10}")
+    try:
+        async with db_helper.session_factory() as session:
+            await measure(
+                "raw revenue", lambda: session.execute(RAW_REVENUE, RAW_PARAMS)
+            )
+            await measure(
+                "summary revenue",
+                lambda: OrmQuery.get_revenue(session, DATE_FROM, DATE_TO),
+            )
+            await measure(
+                "raw top products",
+                lambda: session.execute(RAW_TOP_PRODUCTS, RAW_PARAMS),
+            )
+            await measure(
+                "summary top products",
+                lambda: OrmQuery.get_top_products(session, DATE_FROM, DATE_TO, 10),
+            )
+            await measure(
+                "raw top categories",
+                lambda: session.execute(RAW_TOP_CATEGORIES, RAW_PARAMS),
+            )
+            await measure(
+                "summary top categories",
+                lambda: OrmQuery.get_top_categories(session, DATE_FROM, DATE_TO, 10),
+            )
+    finally:
+        async with db_helper.session_factory() as session:
+            await session.execute(
+                delete(Product).where(Product.llm_report.has(ai_report="bench"))
+            )
+            await session.execute(
+                delete(LLMreport).where(LLMreport.ai_report == "bench")
+            )
+            await session.execute(
+                delete(DailySalesSummary).where(
+                    DailySalesSummary.date.between(DATE_FROM, DATE_TO)
+                )
+            )
+            await session.commit()
+        await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SIZE))
@@ -0,0 +1,57 @@
+"""
+Размер аргументов задач цепочки в брокере: старая схема (XML и список товаров
+внутри сообщений) против передачи ссылок на staging хранилище.
+
+Запуск: python -m benchmarks.broker_payload [кол-во товаров ...]
+"""
+
+import sys
+
+from benchmarks.xml_parser_memory import PRODUCT_TEMPLATE
+from kombu.serialization import dumps
+
+from src.core.utils.staging import StagedFile
+
+DEFAULT_SIZES = [1_000, 100_000]
+
+AI_REPORT = "x" * 2000
+
+
+def payload_size(args: tuple) -> int:
+    _, _, data = dumps((args, {}, {}), serializer="json")
+    return len(data)
+
+
+def main(sizes: list[int]) -> None:
+    print(f"{'products':>10} {'stage':>26} {'before, B':>12} {'after, B':>9}")
+    ref = StagedFile(key="0" * 32 + ".ndjson", checksum="0" * 64, size=0).model_dump()
+    summary = ("2024-01-01", 1.0, "A (1), B (1), C (1)", "Books: 1")
+    for size in sizes:
+        products = [
+            {
+                "name": f"Product {i}",
+                "quantity": i % 100,
+                "price": 99.99,
+                "category": f"Category {i % 20}",
+                "date": "2024-01-01",
+            }
+            for i in range(size)
+        ]
+        xml = "".join(
+            PRODUCT_TEMPLATE.format(i=i, q=i % 100, p=99, c=i % 20) for i in range(size)
+        ).encode()
+        stages = [
+            ("task_parse_and_analyze_xml", (xml,), (ref,)),
+            ("task_fan_out_analysis", (products,), (ref, 4)),
+            ("task_generate_report", ((summary, products),), ((summary, ref),)),
+            ("task_save_result_to_db", ((AI_REPORT, products),), ((AI_REPORT, ref),)),
+        ]
+        for name, before, after in stages:
+            print(
+                f"{size:>10} {name:>26} "
+                f"{payload_size(before):>12} {payload_size(after):>9}"
+            )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,81 @@
+"""
+Память API на одну загрузку: файл целиком в памяти (await file.read())
+против загрузки частями (chunked_uploads.open_chunk), где тело части
+читается кусками по 64 KiB, как его отдает request.stream().
+
+Замеряется пик выделенной Python памяти (tracemalloc) во время загрузки.
+Запуск: python -m benchmarks.chunked_upload_memory [размер файла в MiB]
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import AsyncIterator, Awaitable
+
+from src.core.config import settings
+from src.core.utils.logging_config import my_logger
+from src.core.utils.staging import ChunkedUploads, UploadStorage
+
+DEFAULT_SIZE_MIB = 256
+PIECE_SIZE = 64 * 1024
+PIECE = b"<product><name>Product</name></product>\n" * (PIECE_SIZE // 41)
+
+
+async def request_body(size: int) -> AsyncIterator[bytes]:
+    sent = 0
+    while sent < size:
+        piece = PIECE[: size - sent]
+        sent += len(piece)
+        yield piece
+
+
+async def whole_file(size: int) -> None:
+    body = b"".join([piece async for piece in request_body(size)])
+    assert len(body) == size
+
+
+async def chunked(uploads: ChunkedUploads, size: int) -> None:
+    upload_id = uploads.create()
+    offset = 0
+    while offset < size:
+        chunk_size = min(uploads.max_chunk_size, size - offset)
+        writer = uploads.open_chunk(upload_id, offset)
+        try:
+            async for piece in request_body(chunk_size):
+                writer.write(piece)
+            offset = writer.commit()
+        finally:
+            writer.close()
+    staged = uploads.complete(upload_id)
+    uploads.storage.delete(staged)
+
+
+async def measure(name: str, run: Awaitable[None]) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    await run
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:>10} {peak / 2**20:>14.1f} {elapsed:>8.2f}")
+
+
+async def main(size_mib: int) -> None:
+    my_logger.remove()
+    size = size_mib * 2**20
+    with tempfile.TemporaryDirectory() as root:
+        uploads = ChunkedUploads(
+            UploadStorage(root),
+            max_chunk_size=settings.staging.upload_chunk_size,
+            ttl=settings.staging.upload_ttl,
+        )
+        print(f"{size_mib} MiB file, {uploads.max_chunk_size / 2**20:.0f} MiB chunks")
+        print(f"{'mode':>10} {'peak MiB':>14} {'sec':>8}")
+        await measure("read()", whole_file(size))
+        await measure("chunked", chunked(uploads, size))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SIZE_MIB))
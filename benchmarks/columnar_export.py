@@ -0,0 +1,147 @@
+"""
+Выгрузка товаров за диапазон дат: постраничный JSON по дням (как клиент
+забирал бы /sales-product/ за каждый день), один поток Arrow IPC и Parquet.
+Для каждого формата замеряются время выгрузки, размер и время разбора
+на стороне клиента.
+
+Нужна локальная БД с примененными миграциями, подключение берется из .env:
+POSTGRES_HOST=127.0.0.1 python -m benchmarks.columnar_export [товаров в день]
+"""
+
+import asyncio
+import io
+import sys
+import time
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List
+
+import orjson
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from sqlalchemy import delete
+
+from src.api.v1.cruds.product_crud import OrmQuery
+from src.core import DailySalesSummary, LLMreport, Product
+from src.core.config import settings
+from src.core.db_helper import db_helper
+from src.core.utils.columnar_export import encode_columnar
+from src.core.utils.fast_json import rows_to_dicts
+from src.core.utils.logging_config import my_logger
+from src.core.utils.product_export import (
+    PRODUCT_EXPORT_COLUMNS,
+    PRODUCT_RESPONSE_COLUMNS,
+)
+
+DEFAULT_SIZE = 20_000
+FIRST_DAY = date(2024, 2, 1)
+DAYS = 7
+LAST_DAY = FIRST_DAY + timedelta(days=DAYS - 1)
+
+
+async def json_pages() -> List[bytes]:
+    pages = []
+    for offset in range(DAYS):
+        day = FIRST_DAY + timedelta(days=offset)
+        after_id = None
+        while True:
+            async with db_helper.session_factory() as session:
+                rows = await OrmQuery.get_product_rows_by_date(
+                    session,
+                    day,
+                    PRODUCT_RESPONSE_COLUMNS,
+                    limit=settings.db.products_max_page_size,
+                    after_id=after_id,
+                )
+            if not rows:
+                break
+            after_id = rows[-1][-1]
+            pages.append(
+                orjson.dumps(
+                    {
+                        "items": rows_to_dicts(PRODUCT_RESPONSE_COLUMNS, rows),
+                        "next_after_id": after_id,
+                    }
+                )
+            )
+    return pages
+
+
+async def columnar(export_format: str) -> List[bytes]:
+    batches = OrmQuery.stream_products_by_range(
+        FIRST_DAY, LAST_DAY, PRODUCT_EXPORT_COLUMNS
+    )
+    return [chunk async for chunk in encode_columnar(batches, export_format)]
+
+
+def parse_json(chunks: List[bytes]) -> int:
+    return sum(len(orjson.loads(page)["items"]) for page in chunks)
+
+
+def parse_arrow(chunks: List[bytes]) -> int:
+    return ipc.open_stream(b"".join(chunks)).read_all().num_rows
+
+
+def parse_parquet(chunks: List[bytes]) -> int:
+    return pq.read_table(io.BytesIO(b"".join(chunks))).num_rows
+
+
+async def measure(
+    name: str, export: Callable[[], Any], parse: Callable[[List[bytes]], int]
+) -> None:
+    start = time.perf_counter()
+    chunks = await export()
+    exported = time.perf_counter() - start
+    start = time.perf_counter()
+    rows = parse(chunks)
+    parsed = time.perf_counter() - start
+    size = sum(len(chunk) for chunk in chunks)
+    print(
+        f"{name:>12} {exported * 1000:>10.0f} {parsed * 1000:>9.0f} "
+        f"{size / 2**20:>9.1f} {len(chunks):>7} {rows:>9}"
+    )
+
+
+async def main(size: int) -> None:
+    my_logger.remove()
+    db_helper.engine.echo = False
+    for offset in range(DAYS):
+        day = FIRST_DAY + timedelta(days=offset)
+        products: List[Dict[str, Any]] = [
+            {
+                "name": f"Product {i}",
+                "quantity": i % 100,
+                "price": 99.99,
+                "category": f"Category {i % 20}",
+                "date": day.isoformat(),
+            }
+            for i in range(size)
+        ]
+        await OrmQuery.bulk_create_products_and_report("bench", products)
+
+    print(
+        f"{'format':>12} {'export ms':>10} {'parse ms':>9} {'body MiB':>9} "
+        f"{'chunks':>7} {'rows':>9}"
+    )
+    try:
+        await measure("json pages", json_pages, parse_json)
+        await measure("arrow", lambda: columnar("arrow"), parse_arrow)
+        await measure("parquet", lambda: columnar("parquet"), parse_parquet)
+    finally:
+        async with db_helper.session_factory() as session:
+            await session.execute(
+                delete(Product).where(Product.llm_report.has(ai_report="bench"))
+            )
+            await session.execute(
+                delete(LLMreport).where(LLMreport.ai_report == "bench")
+            )
+            await session.execute(
+                delete(DailySalesSummary).where(
+                    DailySalesSummary.date.between(FIRST_DAY, LAST_DAY)
+                )
+            )
+            await session.commit()
+        await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SIZE))
@@ -0,0 +1,128 @@
+"""
+Строки товаров с названиями (как было до справочников product_dim и
+category_dim) против строк с целочисленными id: размер таблицы с индексами
+и время агрегатов по товарам и категориям (как в SUMMARY_UPSERT и топах
+по сырым строкам).
+
+Таблицы создаются во временной схеме и удаляются после замера.
+Нужна локальная БД, подключение берется из .env:
+POSTGRES_HOST=127.0.0.1 python -m benchmarks.dimension_storage [кол-во строк]
+"""
+
+import asyncio
+import sys
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.core.db_helper import db_helper
+from src.core.utils.logging_config import my_logger
+
+DEFAULT_SIZE = 2_000_000
+PRODUCTS = 10_000
+CATEGORIES = 20
+SCHEMA = "bench_dimensions"
+RUNS = 5
+
+SETUP = (
+    f"CREATE SCHEMA {SCHEMA}",
+    f"""
+    CREATE TABLE {SCHEMA}.named (
+        id serial PRIMARY KEY, report_id integer NOT NULL, name varchar NOT NULL,
+        quantity integer NOT NULL, price double precision NOT NULL,
+        category varchar NOT NULL, date timestamp NOT NULL
+    )
+    """,
+    f"""
+    CREATE TABLE {SCHEMA}.interned (
+        id serial PRIMARY KEY, report_id integer NOT NULL,
+        product_id integer NOT NULL, quantity integer NOT NULL,
+        price double precision NOT NULL, category_id integer NOT NULL,
+        date timestamp NOT NULL
+    )
+    """,
+    f"""
+    INSERT INTO {SCHEMA}.named (report_id, name, quantity, price, category, date)
+    SELECT n / {PRODUCTS}, 'Product name ' || n % {PRODUCTS}, n % 100, 99.99,
+           'Category name ' || n % {CATEGORIES},
+           TIMESTAMP '2024-01-01' + n / {PRODUCTS} * INTERVAL '1 day'
+    FROM generate_series(1, :size) AS n
+    """,
+    f"""
+    INSERT INTO {SCHEMA}.interned
+        (report_id, product_id, quantity, price, category_id, date)
+    SELECT n / {PRODUCTS}, n % {PRODUCTS}, n % 100, 99.99, n % {CATEGORIES},
+           TIMESTAMP '2024-01-01' + n / {PRODUCTS} * INTERVAL '1 day'
+    FROM generate_series(1, :size) AS n
+    """,
+    f"CREATE INDEX ON {SCHEMA}.named (date, id)",
+    f"CREATE INDEX ON {SCHEMA}.interned (date, id)",
+    f"VACUUM ANALYZE {SCHEMA}.named",
+    f"VACUUM ANALYZE {SCHEMA}.interned",
+)
+
+AGGREGATES = {
+    "top products": (
+        "SELECT category, name, sum(quantity), sum(quantity * price) AS revenue "
+        f"FROM {SCHEMA}.named GROUP BY category, name "
+        "ORDER BY revenue DESC LIMIT 10",
+        "SELECT category_id, product_id, sum(quantity), "
+        f"sum(quantity * price) AS revenue FROM {SCHEMA}.interned "
+        "GROUP BY category_id, product_id ORDER BY revenue DESC LIMIT 10",
+    ),
+    "categories": (
+        "SELECT category, sum(quantity) " f"FROM {SCHEMA}.named GROUP BY category",
+        "SELECT category_id, sum(quantity) "
+        f"FROM {SCHEMA}.interned GROUP BY category_id",
+    ),
+    "distinct names": (
+        f"SELECT count(DISTINCT name) FROM {SCHEMA}.named",
+        f"SELECT count(DISTINCT product_id) FROM {SCHEMA}.interned",
+    ),
+}
+
+
+async def best_time(conn: AsyncConnection, sql: str) -> float:
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        await conn.execute(text(sql))
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+async def main(size: int) -> None:
+    my_logger.remove()
+    db_helper.engine.echo = False
+    # VACUUM не работает внутри транзакции
+    autocommit = db_helper.engine.execution_options(isolation_level="AUTOCOMMIT")
+    async with autocommit.connect() as conn:
+        await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        try:
+            for statement in SETUP:
+                await conn.execute(text(statement), {"size": size})
+
+            print(f"{'':>16} {'names':>10} {'ids':>10}")
+            sizes = [
+                await conn.scalar(
+                    text(f"SELECT pg_total_relation_size('{SCHEMA}.{table}')")
+                )
+                for table in ("named", "interned")
+            ]
+            print(
+                f"{'size MiB':>16} {sizes[0] / 2**20:>10.1f} {sizes[1] / 2**20:>10.1f}"
+            )
+            for name, (named_sql, interned_sql) in AGGREGATES.items():
+                named = await best_time(conn, named_sql)
+                interned = await best_time(conn, interned_sql)
+                print(
+                    f"{name + ' ms':>16} {named * 1000:>10.0f} {interned * 1000:>10.0f}"
+                )
+        finally:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SIZE))
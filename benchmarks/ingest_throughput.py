@@ -0,0 +1,91 @@
+"""
+Скорость записи товаров в Postgres: ORM (create_new_products_and_report)
+против массовой записи (bulk_create_products_and_report через insert и COPY).
+
+Нужна локальная БД с примененными миграциями, подключение берется из .env:
+POSTGRES_HOST=127.0.0.1 python -m benchmarks.ingest_throughput [кол-во товаров]
+"""
+
+import asyncio
+import sys
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List
+
+from sqlalchemy import delete
+
+from src.api.v1.cruds.product_crud import OrmQuery
+from src.core import LLMreport, Product
+from src.core.db_helper import db_helper
+from src.core.utils.logging_config import my_logger
+
+DEFAULT_SIZE = 100_000
+
+
+def make_products(size: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "name": f"Product {i}",
+            "quantity": i % 100,
+            "price": 99.99,
+            "category": f"Category {i % 20}",
+            "date": "2024-01-01",
+        }
+        for i in range(size)
+    ]
+
+
+async def cleanup() -> None:
+    async with db_helper.session_factory() as session:
+        await session.execute(
+            delete(Product).where(Product.llm_report.has(ai_report="bench"))
+        )
+        await session.execute(delete(LLMreport).where(LLMreport.ai_report == "bench"))
+        await session.commit()
+
+
+async def measure(name: str, size: int, run: Callable[[], Awaitable[Any]]) -> None:
+    start = time.perf_counter()
+    await run()
+    elapsed = time.perf_counter() - start
+    print(f"{name:>8} {size:>10} {elapsed:>8.2f} {size / elapsed:>12,.0f}")
+    await cleanup()
+
+
+async def main(size: int) -> None:
+    my_logger.remove()
+    db_helper.engine.echo = False
+    products = make_products(size)
+    orm_products = [
+        {**product, "date": datetime.fromisoformat(product["date"])}
+        for product in products
+    ]
+
+    print(f"{'mode':>8} {'rows':>10} {'sec':>8} {'rows/sec':>12}")
+    await cleanup()
+    await measure(
+        "orm",
+        size,
+        lambda: OrmQuery.create_new_products_and_report(
+            "bench", orm_products  # type: ignore
+        ),
+    )
+    await measure(
+        "insert",
+        size,
+        lambda: OrmQuery.bulk_create_products_and_report(
+            "bench", products, use_copy=False
+        ),
+    )
+    await measure(
+        "copy",
+        size,
+        lambda: OrmQuery.bulk_create_products_and_report(
+            "bench", products, use_copy=True
+        ),
+    )
+    await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SIZE))
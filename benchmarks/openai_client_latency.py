@@ -0,0 +1,90 @@
+"""
+Задержка запроса к OpenAI-совместимому API: новый клиент на каждый вызов
+(как было в generate_report_content) против переиспользуемого клиента из пула.
+
+Поднимает локальный stub сервер, внешнее API не нужно.
+Запуск: python -m benchmarks.openai_client_latency [кол-во запросов]
+"""
+
+import json
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+from openai import OpenAI
+
+from src.core.config import settings
+from src.core.utils.openai_client import OpenAIClientManager
+
+DEFAULT_CALLS = 200
+
+COMPLETION = json.dumps(
+    {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "stub",
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": "report"},
+                "finish_reason": "stop",
+            }
+        ],
+    }
+).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True
+
+    def do_POST(self) -> None:
+        self.rfile.read(int(self.headers["Content-Length"]))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(COMPLETION)))
+        self.end_headers()
+        self.wfile.write(COMPLETION)
+
+    def log_message(self, *_: object) -> None:
+        pass
+
+
+def measure(name: str, calls: int, get_client: Callable[[], OpenAI]) -> None:
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        get_client().chat.completions.create(
+            model="stub", messages=[{"role": "user", "content": "prompt"}]
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(
+        f"{name:>16} {statistics.mean(latencies):>9.2f} "
+        f"{statistics.median(latencies):>9.2f} "
+        f"{statistics.quantiles(latencies, n=100)[98]:>9.2f}"
+    )
+
+
+def main(calls: int) -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+    settings.openapi.openai_base_url = base_url
+    manager = OpenAIClientManager()
+
+    print(f"{'mode':>16} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    measure(
+        "client per call",
+        calls,
+        lambda: OpenAI(api_key=settings.openapi.openai_api_key, base_url=base_url),
+    )
+    measure("pooled client", calls, manager.get_client)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CALLS)
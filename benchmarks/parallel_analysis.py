@@ -0,0 +1,99 @@
+"""
+Параллельный парсинг большого XML (task_fan_out_analysis -> task_parse_chunk
+-> task_merge_aggregates) против одной задачи task_parse_and_analyze_xml.
+
+Каждый шаг замеряется отдельно в одном процессе. Время с N воркерами -
+критический путь chord: split_products + самая долгая часть + слияние
+(без учета доставки задач брокером), поэтому замер не зависит от числа
+ядер машины, на которой он запущен.
+
+Запуск: python -m benchmarks.parallel_analysis [кол-во товаров ...]
+"""
+
+import sys
+import tempfile
+import time
+from functools import reduce
+from pathlib import Path
+
+from benchmarks.xml_parser_memory import generate_xml
+
+from src.core.utils.data_analyzer import SalesAggregator
+from src.core.utils.logging_config import my_logger
+from src.core.utils.staging import UploadStorage
+from src.core.utils.xml_parser import (
+    iter_parse_xml,
+    iter_parse_xml_range,
+    split_products,
+)
+
+DEFAULT_SIZES = [100_000, 1_000_000]
+WORKERS = [2, 4, 8]
+
+
+def fused(storage: UploadStorage, path: Path) -> float:
+    start = time.perf_counter()
+    aggregator = SalesAggregator()
+    with open(path, "rb") as xml_file:
+        products = storage.write_records(aggregator.consume(iter_parse_xml(xml_file)))
+    aggregator.summary()
+    elapsed = time.perf_counter() - start
+    storage.delete(products)
+    return elapsed
+
+
+def parallel(storage: UploadStorage, path: Path, workers: int) -> float:
+    start = time.perf_counter()
+    with open(path, "rb") as xml_file:
+        prefix_end, suffix, ranges = split_products(xml_file, workers, min_chunk_size=1)
+    split = time.perf_counter() - start
+
+    chunk_times = []
+    partials = []
+    for range_start, range_end in ranges:
+        start = time.perf_counter()
+        aggregator = SalesAggregator()
+        with open(path, "rb") as xml_file:
+            products = storage.write_records(
+                aggregator.consume(
+                    iter_parse_xml_range(
+                        xml_file, prefix_end, range_start, range_end, suffix
+                    )
+                )
+            )
+        partials.append((aggregator.to_dict(), products))
+        chunk_times.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    reduce(
+        SalesAggregator.merge,
+        (SalesAggregator.from_dict(aggregate) for aggregate, _ in partials),
+    ).summary()
+    merged = storage.concat([products for _, products in partials])
+    merge = time.perf_counter() - start
+
+    for _, products in partials:
+        storage.delete(products)
+    storage.delete(merged)
+    return split + max(chunk_times) + merge
+
+
+def main(sizes: list[int]) -> None:
+    my_logger.remove()
+    header = " ".join(f"{f'{workers} workers':>10}" for workers in WORKERS)
+    print(f"{'products':>10} {'file MB':>8} {'fused':>8} {header}")
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = UploadStorage(tmp)
+        for size in sizes:
+            path = Path(tmp) / f"sales_{size}.xml"
+            generate_xml(path, size)
+            timings = [parallel(storage, path, workers) for workers in WORKERS]
+            print(
+                f"{size:>10} {path.stat().st_size / 2**20:>8.1f} "
+                f"{fused(storage, path):>8.2f} "
+                + " ".join(f"{elapsed:>10.2f}" for elapsed in timings)
+            )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,116 @@
+"""
+Время до первой части отчета: обычный запрос к LLM против потокового
+(как в task_generate_report), на локальном stub сервере, который
+отдает ответ по токенам с задержкой, как настоящая модель.
+
+Запуск: python -m benchmarks.report_ttfb [кол-во токенов] [задержка ms]
+"""
+
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+from unittest.mock import patch
+
+from src.core.config import settings
+from src.core.utils.openai_client import OpenAIClientManager
+from src.core.utils.sales_data_prompt import generate_report_content
+
+DEFAULT_TOKENS = 200
+DEFAULT_DELAY_MS = 20
+
+
+def make_handler(tokens: int, delay: float) -> type:
+    def completion(content: str, stream: bool) -> dict:
+        key = "delta" if stream else "message"
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion.chunk" if stream else "chat.completion",
+            "created": 0,
+            "model": "stub",
+            "choices": [
+                {
+                    "index": 0,
+                    key: {"role": "assistant", "content": content},
+                    "finish_reason": None if stream else "stop",
+                }
+            ],
+        }
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self) -> None:
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            self.send_response(200)
+            if not body.get("stream"):
+                time.sleep(delay * tokens)
+                payload = json.dumps(completion("token " * tokens, False)).encode()
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for _ in range(tokens):
+                time.sleep(delay)
+                self.write_chunk(json.dumps(completion("token ", True)))
+            self.write_chunk("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def write_chunk(self, data: str) -> None:
+            event = f"data: {data}\n\n".encode()
+            self.wfile.write(f"{len(event):x}\r\n".encode() + event + b"\r\n")
+            self.wfile.flush()
+
+        def log_message(self, *_: object) -> None:
+            pass
+
+    return StubHandler
+
+
+def main(tokens: int, delay_ms: int) -> None:
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), make_handler(tokens, delay_ms / 1000)
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    settings.openapi.openai_base_url = f"http://127.0.0.1:{server.server_port}/v1"
+    manager = OpenAIClientManager()
+
+    with (
+        patch("src.core.utils.sales_data_prompt.get_openai_client", manager.get_client),
+        patch("src.core.utils.sales_data_prompt.llm_cache.enabled", False),
+    ):
+        print(f"{'mode':>10} {'first byte ms':>14} {'total ms':>10}")
+        start = time.perf_counter()
+        generate_report_content("2024-01-01", 100, "A", "C")
+        total = (time.perf_counter() - start) * 1000
+        print(f"{'blocking':>10} {total:>14.0f} {total:>10.0f}")
+
+        first_chunk: List[float] = []
+
+        def record_first_chunk(_: str) -> None:
+            if not first_chunk:
+                first_chunk.append(time.perf_counter())
+
+        start = time.perf_counter()
+        generate_report_content(
+            "2024-01-01", 100, "A", "C", on_chunk=record_first_chunk
+        )
+        total = (time.perf_counter() - start) * 1000
+        ttfb = (first_chunk[0] - start) * 1000
+        print(f"{'streaming':>10} {ttfb:>14.0f} {total:>10.0f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TOKENS,
+        int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_DELAY_MS,
+    )
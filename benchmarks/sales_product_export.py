@@ -0,0 +1,116 @@
+"""
+Выдача товаров за день: весь список одним JSON массивом (как было в
+/sales-product/) против keyset страниц и потоковой выгрузки NDJSON
+серверным курсором. Замеряется время и пик памяти Python (tracemalloc).
+
+Нужна локальная БД с примененными миграциями, подключение берется из .env:
+POSTGRES_HOST=127.0.0.1 python -m benchmarks.sales_product_export [кол-во товаров]
+"""
+
+import asyncio
+import json
+import sys
+import time
+import tracemalloc
+from datetime import date
+from typing import Any, Awaitable, Callable, List
+
+from sqlalchemy import delete
+
+from src.api.v1.cruds.product_crud import OrmQuery
+from src.core import LLMreport, Product
+from src.core.db_helper import db_helper
+from src.core.schemas.schemas import ProductResponse
+from src.core.utils.logging_config import my_logger
+from src.core.utils.product_export import PRODUCT_EXPORT_COLUMNS, encode_batches
+
+DEFAULT_SIZE = 300_000
+DAY = date(2024, 1, 1)
+PAGE_SIZE = 1000
+
+
+async def full_list() -> int:
+    async with db_helper.session_factory() as session:
+        products = await OrmQuery.get_product_by_date(session, DAY)
+        items = [
+            ProductResponse.model_validate(product, from_attributes=True).model_dump(
+                mode="json"
+            )
+            for product in products
+        ]
+        return len(json.dumps(items))
+
+
+async def keyset_pages() -> int:
+    size = 0
+    after_id = None
+    while True:
+        async with db_helper.session_factory() as session:
+            products = await OrmQuery.get_product_by_date(
+                session, DAY, limit=PAGE_SIZE, after_id=after_id
+            )
+        if not products:
+            return size
+        items = [
+            ProductResponse.model_validate(product, from_attributes=True).model_dump(
+                mode="json"
+            )
+            for product in products
+        ]
+        size += len(json.dumps(items))
+        after_id = products[-1].id
+
+
+async def ndjson_stream() -> int:
+    size = 0
+    batches = OrmQuery.stream_products_by_date(DAY, PRODUCT_EXPORT_COLUMNS)
+    async for chunk in encode_batches(batches, "ndjson"):
+        size += len(chunk)
+    return size
+
+
+async def measure(name: str, run: Callable[[], Awaitable[int]]) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = await run()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:>14} {elapsed:>8.2f} {peak / 2**20:>10.1f} {size / 2**20:>10.1f}")
+
+
+async def main(size: int) -> None:
+    my_logger.remove()
+    db_helper.engine.echo = False
+    products: List[dict[str, Any]] = [
+        {
+            "name": f"Product {i}",
+            "quantity": i % 100,
+            "price": 99.99,
+            "category": f"Category {i % 20}",
+            "date": DAY.isoformat(),
+        }
+        for i in range(size)
+    ]
+    await OrmQuery.bulk_create_products_and_report("bench", products)
+    del products
+
+    print(f"{'mode':>14} {'sec':>8} {'peak MiB':>10} {'body MiB':>10}")
+    try:
+        await measure("full list", full_list)
+        await measure("keyset pages", keyset_pages)
+        await measure("ndjson stream", ndjson_stream)
+    finally:
+        async with db_helper.session_factory() as session:
+            await session.execute(
+                delete(Product).where(Product.llm_report.has(ai_report="bench"))
+            )
+            await session.execute(
+                delete(LLMreport).where(LLMreport.ai_report == "bench")
+            )
+            await session.commit()
+        await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SIZE))
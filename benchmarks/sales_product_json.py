@@ -0,0 +1,131 @@
+"""
+Сериализация товаров за день: путь response_model (ORM объекты, проверка
+pydantic и стандартный json, как было до кэша ответов), pydantic
+model_dump_json по ORM объектам (режим по умолчанию) и быстрый режим
+(кортежи колонок + orjson). Отдельно замеряется сжатие gzip.
+
+Нужна локальная БД с примененными миграциями, подключение берется из .env:
+POSTGRES_HOST=127.0.0.1 python -m benchmarks.sales_product_json [кол-во товаров]
+"""
+
+import asyncio
+import gzip
+import json
+import sys
+import time
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, List
+
+import orjson
+from sqlalchemy import delete
+
+from src.api.v1.cruds.product_crud import OrmQuery
+from src.core import DailySalesSummary, LLMreport, Product
+from src.core.config import settings
+from src.core.db_helper import db_helper
+from src.core.schemas.schemas import ProductPage
+from src.core.utils.fast_json import rows_to_dicts
+from src.core.utils.logging_config import my_logger
+from src.core.utils.product_export import PRODUCT_RESPONSE_COLUMNS
+
+DEFAULT_SIZE = 100_000
+DAY = date(2024, 2, 1)
+RUNS = 5
+
+
+async def response_model_path(size: int) -> bytes:
+    async with db_helper.session_factory() as session:
+        products = await OrmQuery.get_product_by_date(session, DAY, limit=size)
+    page = ProductPage.model_validate(
+        {"items": products, "next_after_id": None}, from_attributes=True
+    )
+    return json.dumps(
+        page.model_dump(mode="json"),
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode()
+
+
+async def pydantic_json_path(size: int) -> bytes:
+    async with db_helper.session_factory() as session:
+        products = await OrmQuery.get_product_by_date(session, DAY, limit=size)
+    page = ProductPage.model_validate(
+        {"items": products, "next_after_id": None}, from_attributes=True
+    )
+    return page.model_dump_json().encode()
+
+
+async def fast_path(size: int) -> bytes:
+    async with db_helper.session_factory() as session:
+        rows = await OrmQuery.get_product_rows_by_date(
+            session, DAY, PRODUCT_RESPONSE_COLUMNS, limit=size
+        )
+    return orjson.dumps(
+        {"items": rows_to_dicts(PRODUCT_RESPONSE_COLUMNS, rows), "next_after_id": None}
+    )
+
+
+async def measure(
+    name: str, run: Callable[[int], Awaitable[bytes]], size: int
+) -> bytes:
+    timings = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        body = await run(size)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    print(
+        f"{name:>16} {best * 1000:>9.0f} {size / best:>12.0f} {len(body) / 2**20:>9.1f}"
+    )
+    return body
+
+
+async def main(size: int) -> None:
+    my_logger.remove()
+    db_helper.engine.echo = False
+    products: List[Dict[str, Any]] = [
+        {
+            "name": f"Product {i}",
+            "quantity": i % 100,
+            "price": 99.99,
+            "category": f"Category {i % 20}",
+            "date": DAY.isoformat(),
+        }
+        for i in range(size)
+    ]
+    await OrmQuery.bulk_create_products_and_report("bench", products)
+    del products
+
+    print(f"{'mode':>16} {'best ms':>9} {'products/s':>12} {'body MiB':>9}")
+    try:
+        await measure("response_model", response_model_path, size)
+        await measure("pydantic json", pydantic_json_path, size)
+        body = await measure("rows + orjson", fast_path, size)
+
+        start = time.perf_counter()
+        compressed = gzip.compress(
+            body, compresslevel=settings.api_response.api_gzip_level
+        )
+        elapsed = time.perf_counter() - start
+        print(
+            f"gzip level {settings.api_response.api_gzip_level}: "
+            f"{len(body) / 2**20:.1f} MiB -> {len(compressed) / 2**20:.1f} MiB "
+            f"in {elapsed * 1000:.0f} ms"
+        )
+    finally:
+        async with db_helper.session_factory() as session:
+            await session.execute(
+                delete(Product).where(Product.llm_report.has(ai_report="bench"))
+            )
+            await session.execute(
+                delete(LLMreport).where(LLMreport.ai_report == "bench")
+            )
+            await session.execute(
+                delete(DailySalesSummary).where(DailySalesSummary.date == DAY)
+            )
+            await session.commit()
+        await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SIZE))
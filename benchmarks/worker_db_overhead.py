@@ -0,0 +1,105 @@
+"""
+Накладные расходы на запись в БД из задачи Celery:
+asyncio.run на каждую задачу (как было в task_save_result_to_db) против
+долгоживущего event loop воркера (run_async).
+
+Для asyncio.run замеряются два варианта: с общим движком db_helper
+(пул привязан к loop первой задачи, последующие задачи падают) и с новым
+движком на каждую задачу (корректно, но каждый раз новое соединение).
+
+Нужна локальная БД с примененными миграциями, подключение берется из .env:
+POSTGRES_HOST=127.0.0.1 python -m benchmarks.worker_db_overhead [кол-во задач]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List
+from unittest.mock import patch
+
+from sqlalchemy import delete
+
+from src.api.v1.cruds.product_crud import OrmQuery
+from src.celery.async_runtime import WorkerEventLoop
+from src.core import LLMreport, Product
+from src.core.config import settings
+from src.core.db_helper import DatabaseHelper, db_helper
+from src.core.utils.logging_config import my_logger
+
+DEFAULT_TASKS = 200
+PRODUCTS_PER_TASK = 100
+
+
+def make_products() -> List[Dict[str, Any]]:
+    return [
+        {
+            "name": f"Product {i}",
+            "quantity": i,
+            "price": 9.99,
+            "category": "Category",
+            "date": "2024-01-01",
+        }
+        for i in range(PRODUCTS_PER_TASK)
+    ]
+
+
+async def cleanup(helper: DatabaseHelper) -> None:
+    async with helper.session_factory() as session:
+        await session.execute(
+            delete(Product).where(Product.llm_report.has(ai_report="bench"))
+        )
+        await session.execute(delete(LLMreport).where(LLMreport.ai_report == "bench"))
+        await session.commit()
+
+
+def measure(name: str, tasks: int, run_task: Callable[[], Any]) -> None:
+    latencies = []
+    errors = 0
+    for _ in range(tasks):
+        start = time.perf_counter()
+        try:
+            run_task()
+        except Exception:
+            errors += 1
+        latencies.append((time.perf_counter() - start) * 1000)
+    print(
+        f"{name:>24} {statistics.mean(latencies):>9.2f} "
+        f"{statistics.median(latencies):>9.2f} {errors:>7}"
+    )
+
+
+def main(tasks: int) -> None:
+    my_logger.remove()
+    db_helper.engine.echo = False
+    products = make_products()
+
+    async def save(helper: DatabaseHelper) -> Any:
+        # OrmQuery пишет через db_helper, подменяем его сессии на движок helper
+        with patch.object(db_helper, "session_factory", helper.session_factory):
+            return await OrmQuery.bulk_create_products_and_report("bench", products)
+
+    def asyncio_run_new_engine() -> None:
+        async def task() -> None:
+            helper = DatabaseHelper(url=settings.db.url)
+            try:
+                await save(helper)
+            finally:
+                await helper.dispose()
+
+        asyncio.run(task())
+
+    worker_loop = WorkerEventLoop()
+
+    print(f"{'mode':>24} {'mean ms':>9} {'p50 ms':>9} {'errors':>7}")
+    measure("asyncio.run shared pool", tasks, lambda: asyncio.run(save(db_helper)))
+    db_helper.reset_after_fork()  # пул выше привязан к закрытым loop
+    measure("asyncio.run new engine", tasks, asyncio_run_new_engine)
+    measure("worker event loop", tasks, lambda: worker_loop.run(save(db_helper)))
+
+    worker_loop.run(cleanup(db_helper))
+    worker_loop.shutdown()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_TASKS)
@@ -0,0 +1,75 @@
+"""
+Сравнение пикового RSS для parse_xml и iter_parse_xml на файлах разного размера.
+
+Запуск: python -m benchmarks.xml_parser_memory [кол-во товаров ...]
+"""
+
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+PRODUCT_TEMPLATE = (
+    "<product><id>{i}</id><name>Product {i}</name><quantity>{q}</quantity>"
+    "<price>{p}.99</price><category>Category {c}</category></product>\n"
+)
+
+
+def generate_xml(path: Path, products: int) -> None:
+    with open(path, "w") as f:
+        f.write('<sales_data date="2024-01-01">\n<products>\n')
+        for i in range(products):
+            f.write(PRODUCT_TEMPLATE.format(i=i, q=i % 100, p=i % 1000, c=i % 20))
+        f.write("</products>\n</sales_data>\n")
+
+
+def run_parser(mode: str, path: str) -> None:
+    from src.core.utils.logging_config import my_logger
+    from src.core.utils.xml_parser import iter_parse_xml, parse_xml
+
+    my_logger.remove()
+    start = time.perf_counter()
+    if mode == "tree":
+        count = len(parse_xml(Path(path).read_bytes()))
+    else:
+        count = sum(1 for _ in iter_parse_xml(path))
+    elapsed = time.perf_counter() - start
+    # ru_maxrss в Linux отдается в килобайтах
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{count}\t{elapsed:.2f}\t{peak_mb:.1f}")
+
+
+def main(sizes: list[int]) -> None:
+    print(f"{'products':>10} {'file MB':>8} {'mode':>6} {'sec':>7} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            path = Path(tmp) / f"sales_{size}.xml"
+            generate_xml(path, size)
+            file_mb = path.stat().st_size / 2**20
+            for mode in ("tree", "stream"):
+                # Каждый замер в отдельном процессе, чтобы пик RSS не накапливался
+                out = subprocess.run(
+                    [
+                        sys.executable,
+                        "-m",
+                        "benchmarks.xml_parser_memory",
+                        mode,
+                        str(path),
+                    ],
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                ).stdout.split()
+                _, elapsed, peak = out
+                print(f"{size:>10} {file_mb:>8.1f} {mode:>6} {elapsed:>7} {peak:>12}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] in ("tree", "stream"):
+        run_parser(sys.argv[1], sys.argv[2])
+    else:
+        main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -1,6 +1,10 @@
 from fastapi import APIRouter
 
+from src.api.v1.veiws.analytics_router import router as analytics_router
+from src.api.v1.veiws.metrics_router import router as metrics_router
 from src.api.v1.veiws.xml_router import router as xml_parser_router
 
 router = APIRouter(prefix="/api/v1", tags=["Xml-parser"])
 router.include_router(xml_parser_router)
+router.include_router(metrics_router)
+router.include_router(analytics_router)
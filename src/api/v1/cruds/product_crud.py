@@ -1,14 +1,254 @@
-from datetime import date
-from typing import List
+from datetime import date, datetime, time, timedelta
+from itertools import chain, islice
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence
 
 from fastapi import HTTPException
-from sqlalchemy import select
+from sqlalchemy import Row, Select, func, insert, select, text, tuple_, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import literal
 
+from src.core.config import settings
 from src.core.db_helper import db_helper
-from src.core.models.shop_model import LLMreport, Product
+from src.core.models.shop_model import DailySalesSummary, LLMreport, Product
 from src.core.schemas.schemas import ProductBase
+from src.core.utils.dimensions import category_dim_ids, product_dim_ids
 from src.core.utils.logging_config import my_logger
+from src.core.utils.partitions import add_months, month_start, product_partitions
+from src.core.utils.response_cache import ANALYTICS_SCOPE, response_cache
+
+# Порядок колонок для COPY в таблицу products
+PRODUCT_COPY_COLUMNS = (
+    "report_id",
+    "product_id",
+    "quantity",
+    "price",
+    "category_id",
+    "date",
+)
+
+# Итоги отчета по всем уровням daily_sales_summary одним проходом по его
+# товарам (GROUPING SETS по id справочников) и прибавление к уже
+# накопленным итогам; названия подставляются к готовым итогам
+SUMMARY_UPSERT = text(
+    """
+    INSERT INTO daily_sales_summary (level, date, category, product, quantity, revenue)
+    SELECT
+        CASE grouping
+            WHEN 7 THEN 'day'
+            WHEN 5 THEN 'category'
+            WHEN 4 THEN 'product'
+            WHEN 9 THEN 'category_month'
+            ELSE 'product_month'
+        END,
+        COALESCE(day, month),
+        COALESCE(category_dim.name, ''),
+        COALESCE(product_dim.name, ''),
+        quantity,
+        revenue
+    FROM (
+        SELECT
+            GROUPING(CAST(date AS date), month, category_id, product_id) AS grouping,
+            CAST(date AS date) AS day,
+            month,
+            category_id,
+            product_id,
+            sum(quantity) AS quantity,
+            sum(quantity * price) AS revenue
+        FROM products, CAST(date_trunc('month', date) AS date) AS month
+        WHERE report_id = :report_id
+        GROUP BY GROUPING SETS (
+            (CAST(date AS date)),
+            (CAST(date AS date), category_id),
+            (CAST(date AS date), category_id, product_id),
+            (month, category_id),
+            (month, category_id, product_id)
+        )
+    ) AS totals
+    LEFT JOIN category_dim ON category_dim.id = totals.category_id
+    LEFT JOIN product_dim ON product_dim.id = totals.product_id
+    ON CONFLICT (level, date, category, product) DO UPDATE SET
+        quantity = daily_sales_summary.quantity + excluded.quantity,
+        revenue = daily_sales_summary.revenue + excluded.revenue
+    """
+)
+
+
+def _batched(
+    data: Iterable[Dict[str, Any]], batch_size: int
+) -> Iterable[List[Dict[str, Any]]]:
+    iterator = iter(data)
+    while batch := list(islice(iterator, batch_size)):
+        yield batch
+
+
+def _report_by_date_query(date_value: date) -> Select:
+    # Последний отчет за дату, поиск по индексу ix_llm_report_report_date
+    return (
+        select(LLMreport)
+        .where(LLMreport.report_date == date_value)
+        .order_by(LLMreport.id.desc())
+        .limit(1)
+    )
+
+
+def _products_by_date_query(
+    date_value: date, limit: Optional[int] = None, after_id: Optional[int] = None
+) -> Select:
+    """
+    Товары за день в порядке (date, id) - порядке индекса ix_products_date_id.
+
+    Keyset пагинация: следующая страница начинается сразу после товара
+    after_id, поэтому каждая страница читает из индекса только limit строк,
+    как бы далеко от начала дня она ни была.
+    """
+    # Колонка date хранит DateTime, день - полуинтервал
+    day_start = datetime.combine(date_value, time.min)
+    in_day = (Product.date >= day_start, Product.date < day_start + timedelta(days=1))
+    stmt = select(Product).where(*in_day).order_by(Product.date, Product.id)
+    if after_id is not None:
+        after_date = (
+            select(Product.date)
+            .where(Product.id == after_id, *in_day)
+            .scalar_subquery()
+        )
+        stmt = stmt.where(
+            tuple_(Product.date, Product.id) > tuple_(after_date, literal(after_id))
+        )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def _with_product_columns(stmt: Select, columns: Sequence[str]) -> Select:
+    """
+    Запрос товаров только с нужными колонками (кортежами, без ORM объектов).
+    Названия товара и категории берутся из справочников, JOIN добавляется
+    только для запрошенных названий.
+    """
+    stmt = stmt.with_only_columns(
+        *(getattr(Product, column).label(column) for column in columns)
+    )
+    if "name" in columns:
+        stmt = stmt.join_from(Product, Product.product_dim)
+    if "category" in columns:
+        stmt = stmt.join_from(Product, Product.category_dim)
+    return stmt
+
+
+def _products_by_range_query(date_from: date, date_to: date) -> Select:
+    # Диапазон дней полуинтервалом по DateTime, секции вне него не читаются
+    range_start = datetime.combine(date_from, time.min)
+    range_end = datetime.combine(date_to, time.min) + timedelta(days=1)
+    return (
+        select(Product)
+        .where(Product.date >= range_start, Product.date < range_end)
+        .order_by(Product.date, Product.id)
+    )
+
+
+async def _stream_batches(
+    stmt: Select, batch_size: int
+) -> AsyncIterator[Sequence[Row]]:
+    # Сессия открывается внутри генератора и живет, пока читается ответ
+    async with db_helper.session_factory() as session:
+        result = await session.stream(stmt.execution_options(yield_per=batch_size))
+        async for batch in result.partitions():
+            yield batch
+
+
+def _summary_range_query(level: str, date_from: date, date_before: date) -> Select:
+    # Строки одного уровня за полуинтервал дат - диапазон уникального
+    # индекса (level, date, category, product)
+    return select().where(
+        DailySalesSummary.level == level,
+        DailySalesSummary.date >= date_from,
+        DailySalesSummary.date < date_before,
+    )
+
+
+def _full_months(date_from: date, date_to: date) -> tuple[date, date]:
+    """
+    Полные месяцы внутри диапазона дат полуинтервалом [начало, конец).
+    Если полных месяцев нет, начало не меньше конца.
+    """
+    first_month = month_start(date_from)
+    if first_month < date_from:
+        first_month = add_months(first_month, 1)
+    return first_month, month_start(date_to + timedelta(days=1))
+
+
+def _revenue_query(date_from: date, date_to: date) -> Select:
+    return (
+        _summary_range_query(
+            DailySalesSummary.DAY, date_from, date_to + timedelta(days=1)
+        )
+        .add_columns(
+            DailySalesSummary.date,
+            DailySalesSummary.quantity,
+            DailySalesSummary.revenue,
+        )
+        .order_by(DailySalesSummary.date)
+    )
+
+
+def _top_query(
+    level: str,
+    date_from: date,
+    date_to: date,
+    limit: int,
+    order_by: str,
+) -> Select:
+    """
+    Топ категорий (level=category) или товаров (level=product) за диапазон.
+
+    Полные месяцы диапазона читаются из месячных итогов, оставшиеся дни
+    по краям - из дневных, так что за год агрегируется порядка 12 строк
+    на товар вместо 365.
+    """
+    month_from, month_before = _full_months(date_from, date_to)
+    date_before = date_to + timedelta(days=1)
+    if month_from < month_before:
+        ranges = [
+            (f"{level}_month", month_from, month_before),
+            (level, date_from, month_from),
+            (level, month_before, date_before),
+        ]
+    else:
+        ranges = [(level, date_from, date_before)]
+    columns = (
+        DailySalesSummary.category,
+        DailySalesSummary.product,
+        DailySalesSummary.quantity,
+        DailySalesSummary.revenue,
+    )
+    parts = union_all(
+        *(
+            _summary_range_query(*range_).add_columns(*columns)
+            for range_ in ranges
+            if range_[1] < range_[2]
+        )
+    ).subquery()
+
+    group_by = [parts.c.category]
+    if level == DailySalesSummary.PRODUCT:
+        group_by.append(parts.c.product)
+    quantity = func.sum(parts.c.quantity).label("quantity")
+    revenue = func.sum(parts.c.revenue).label("revenue")
+    order_column = {"quantity": quantity, "revenue": revenue}[order_by]
+    return (
+        select(*group_by, quantity, revenue)
+        .group_by(*group_by)
+        .order_by(order_column.desc(), *group_by)
+        .limit(limit)
+    )
+
+
+async def _invalidate_cached_responses(report_date: Optional[date]) -> None:
+    # Ответы API за дату отчета и аналитика устарели после записи
+    scopes = [ANALYTICS_SCOPE]
+    if report_date is not None:
+        scopes.append(report_date.isoformat())
+    await response_cache.invalidate(*scopes)
 
 
 class OrmQuery:
@@ -23,10 +263,23 @@ class OrmQuery:
         :param data: список словарей из XML файла.
         :return: list[Product]
         """
+        products = [ProductBase.model_validate(product) for product in data]
+        report_date = products[0].date if products else None
+        if report_date is not None:
+            await product_partitions.ensure(report_date)
+        product_ids = await product_dim_ids.resolve(
+            product.name for product in products
+        )
+        category_ids = await category_dim_ids.resolve(
+            product.category for product in products
+        )
         try:
             async with db_helper.session_factory() as session:
                 # Запись отчета в БД
-                report = LLMreport(ai_report=ai_report)
+                report = LLMreport(
+                    ai_report=ai_report,
+                    report_date=report_date.date() if report_date else None,
+                )
                 session.add(report)
                 await session.flush()
                 # Получаем id отчета
@@ -34,27 +287,136 @@ class OrmQuery:
 
                 # Записываем данные из XML в БД
                 product_data = list()
-                for product in data:
-                    model_dict = ProductBase.model_validate(product)
+                for model_dict in products:
                     product_data.append(
                         Product(
-                            name=model_dict.name,
+                            product_id=product_ids[model_dict.name],
                             report_id=report_id,
                             price=model_dict.price,
                             quantity=model_dict.quantity,
-                            category=model_dict.category,
+                            category_id=category_ids[model_dict.category],
                             date=model_dict.date,
                         )
                     )
 
                 session.add_all(product_data)
+                await session.flush()
+                await session.execute(SUMMARY_UPSERT, {"report_id": report_id})
                 await session.commit()
         except Exception as e:
             await session.rollback()
             my_logger.error(str(e))
+        else:
+            await _invalidate_cached_responses(report.report_date)
         my_logger.info(f"Created {len(data)} products in database")
         return product_data
 
+    @staticmethod
+    async def bulk_create_products_and_report(
+        ai_report: str,
+        data: Iterable[Dict[str, Any]],
+        batch_size: int = settings.db.ingest_batch_size,
+        use_copy: bool = settings.db.ingest_use_copy,
+    ) -> Dict[str, int]:
+        """
+        Массово записывает в БД LLM отчет и products одной транзакцией.
+
+        Товары пишутся пачками через бинарный COPY asyncpg (или многострочным
+        insert при use_copy=False), без создания ORM объектов на каждую строку.
+        В той же транзакции к daily_sales_summary прибавляются итоги отчета,
+        после записи сбрасывается кэш ответов API за дату отчета.
+
+        :param ai_report: Отчет LLM.
+        :param data: Итератор словарей из XML файла.
+        :param batch_size: Размер пачки товаров.
+        :param use_copy: Использовать COPY вместо insert.
+        :return: dict(report_id, products) - id отчета и количество записанных товаров.
+        """
+        parsed_dates: Dict[str, datetime] = {}
+        products_count = 0
+
+        # Секция products за месяц файла создается до транзакции записи,
+        # чтобы DDL не держал блокировку таблицы все время записи
+        iterator = iter(data)
+        first_product = next(iterator, None)
+        if first_product is not None:
+            first_date = first_product["date"]
+            if isinstance(first_date, str):
+                first_date = datetime.fromisoformat(first_date)
+            await product_partitions.ensure(first_date)
+            data = chain([first_product], iterator)
+
+        try:
+            async with db_helper.session_factory() as session, session.begin():
+                # Запись отчета в БД
+                report = LLMreport(ai_report=ai_report)
+                session.add(report)
+                await session.flush()
+                report_id = report.id
+
+                connection = await session.connection()
+                for batch in _batched(data, batch_size):
+                    # Новые названия пачки попадают в справочники до COPY
+                    product_ids = await product_dim_ids.resolve(
+                        product["name"] for product in batch
+                    )
+                    category_ids = await category_dim_ids.resolve(
+                        product["category"] for product in batch
+                    )
+                    rows = []
+                    for product in batch:
+                        product_date = product["date"]
+                        if isinstance(product_date, str):
+                            if product_date not in parsed_dates:
+                                parsed_dates[product_date] = datetime.fromisoformat(
+                                    product_date
+                                )
+                            product_date = parsed_dates[product_date]
+                        rows.append(
+                            (
+                                report_id,
+                                product_ids[product["name"]],
+                                product["quantity"],
+                                product["price"],
+                                category_ids[product["category"]],
+                                product_date,
+                            )
+                        )
+
+                    if report.report_date is None:
+                        # Дата отчета - дата продаж из XML файла
+                        report.report_date = rows[0][-1].date()
+
+                    if use_copy:
+                        raw_connection = await connection.get_raw_connection()
+                        asyncpg_connection = raw_connection.driver_connection
+                        if asyncpg_connection is None:
+                            raise RuntimeError("Connection is already closed")
+                        await asyncpg_connection.copy_records_to_table(
+                            Product.__tablename__,
+                            records=rows,
+                            columns=PRODUCT_COPY_COLUMNS,
+                        )
+                    else:
+                        await session.execute(
+                            insert(Product),
+                            [dict(zip(PRODUCT_COPY_COLUMNS, row)) for row in rows],
+                        )
+                    products_count += len(rows)
+
+                if products_count:
+                    # Итоги за день пишутся в той же транзакции, что и товары
+                    await connection.execute(SUMMARY_UPSERT, {"report_id": report_id})
+                report_date = report.report_date
+        except Exception as e:
+            my_logger.error(str(e))
+            raise e
+
+        await _invalidate_cached_responses(report_date)
+
+        my_logger.info(f"Bulk created {products_count} products in database")
+        return {"report_id": report_id, "products": products_count}
+
     @staticmethod
     async def get_report_by_date(session: AsyncSession, date_value: date) -> LLMreport:
         """
@@ -64,8 +426,7 @@ class OrmQuery:
         :param date_value: За какую дату хотите получить отчет.
         :return: Составленный AI отчет.
         """
-        stmt = select(LLMreport).join(Product).where(Product.date == date_value)
-        results = await session.execute(stmt)
+        results = await session.execute(_report_by_date_query(date_value))
         report = results.scalars().first()
         if not report:
             raise HTTPException(
@@ -75,20 +436,160 @@ class OrmQuery:
 
     @staticmethod
     async def get_product_by_date(
-        session: AsyncSession, date_value: date
+        session: AsyncSession,
+        date_value: date,
+        limit: Optional[int] = None,
+        after_id: Optional[int] = None,
     ) -> List[Product]:
         """
         Выдает сохраненные в БД данные из XML отчетов по дате.
 
         :param session: Подключение к Postgres
         :param date_value: За какую дату хотите получить данные
+        :param limit: Размер страницы (None - все товары за день)
+        :param after_id: id последнего товара предыдущей страницы
         :return: Список из product
         """
-        stmt = select(Product).where(Product.date == date_value)
-        results = await session.execute(stmt)
+        results = await session.execute(
+            _products_by_date_query(date_value, limit=limit, after_id=after_id)
+        )
         products = results.scalars().all()
-        if not products:
+        if not products and after_id is None:
             raise HTTPException(
                 status_code=404, detail="No products found for the given date"
             )
         return list(products)
+
+    @staticmethod
+    async def get_product_rows_by_date(
+        session: AsyncSession,
+        date_value: date,
+        columns: Sequence[str],
+        limit: Optional[int] = None,
+        after_id: Optional[int] = None,
+    ) -> List[Row]:
+        """
+        То же, что get_product_by_date, но без ORM объектов: только нужные
+        колонки кортежами, для быстрой сериализации ответа.
+
+        :param session: Подключение к Postgres
+        :param date_value: За какую дату хотите получить данные
+        :param columns: Колонки Product в порядке полей ответа
+        :param limit: Размер страницы (None - все товары за день)
+        :param after_id: id последнего товара предыдущей страницы
+        :return: Список строк
+        """
+        stmt = _with_product_columns(
+            _products_by_date_query(date_value, limit=limit, after_id=after_id),
+            columns,
+        )
+        results = await session.execute(stmt)
+        rows = results.all()
+        if not rows and after_id is None:
+            raise HTTPException(
+                status_code=404, detail="No products found for the given date"
+            )
+        return list(rows)
+
+    @staticmethod
+    async def stream_products_by_date(
+        date_value: date,
+        columns: Sequence[str],
+        batch_size: int = settings.db.export_batch_size,
+    ) -> AsyncIterator[Sequence[Row]]:
+        """
+        Потоково читает товары за день серверным курсором, пачками по batch_size.
+        Сессия открывается внутри генератора и живет, пока читается ответ.
+
+        :param date_value: За какую дату выгрузить товары
+        :param columns: Колонки Product, которые нужно выгрузить
+        :param batch_size: Сколько строк забирать из курсора за раз
+        :return: Пачки строк (кортежей значений columns)
+        """
+        stmt = _with_product_columns(_products_by_date_query(date_value), columns)
+        async for batch in _stream_batches(stmt, batch_size):
+            yield batch
+
+    @staticmethod
+    async def stream_products_by_range(
+        date_from: date,
+        date_to: date,
+        columns: Sequence[str],
+        batch_size: int = settings.db.export_batch_size,
+    ) -> AsyncIterator[Sequence[Row]]:
+        """
+        Потоково читает товары за диапазон дней в порядке (date, id)
+        серверным курсором, пачками по batch_size.
+
+        :param date_from: Первый день диапазона
+        :param date_to: Последний день диапазона (включительно)
+        :param columns: Колонки Product, которые нужно выгрузить
+        :param batch_size: Сколько строк забирать из курсора за раз
+        :return: Пачки строк (кортежей значений columns)
+        """
+        stmt = _with_product_columns(
+            _products_by_range_query(date_from, date_to), columns
+        )
+        async for batch in _stream_batches(stmt, batch_size):
+            yield batch
+
+    @staticmethod
+    async def get_revenue(
+        session: AsyncSession, date_from: date, date_to: date
+    ) -> List[Row]:
+        """
+        Выручка и количество проданных товаров по дням из daily_sales_summary.
+
+        :param session: Подключение к Postgres.
+        :param date_from: Первый день диапазона.
+        :param date_to: Последний день диапазона (включительно).
+        :return: Строки (date, quantity, revenue) по дням с продажами.
+        """
+        results = await session.execute(_revenue_query(date_from, date_to))
+        return list(results.all())
+
+    @staticmethod
+    async def get_top_products(
+        session: AsyncSession,
+        date_from: date,
+        date_to: date,
+        limit: int,
+        order_by: str = "revenue",
+    ) -> List[Row]:
+        """
+        Самые продаваемые товары за диапазон дат из daily_sales_summary.
+
+        :param session: Подключение к Postgres.
+        :param date_from: Первый день диапазона.
+        :param date_to: Последний день диапазона (включительно).
+        :param limit: Сколько товаров вернуть.
+        :param order_by: quantity или revenue.
+        :return: Строки (category, product, quantity, revenue).
+        """
+        results = await session.execute(
+            _top_query(DailySalesSummary.PRODUCT, date_from, date_to, limit, order_by)
+        )
+        return list(results.all())
+
+    @staticmethod
+    async def get_top_categories(
+        session: AsyncSession,
+        date_from: date,
+        date_to: date,
+        limit: int,
+        order_by: str = "revenue",
+    ) -> List[Row]:
+        """
+        Самые продаваемые категории за диапазон дат из daily_sales_summary.
+
+        :param session: Подключение к Postgres.
+        :param date_from: Первый день диапазона.
+        :param date_to: Последний день диапазона (включительно).
+        :param limit: Сколько категорий вернуть.
+        :param order_by: quantity или revenue.
+        :return: Строки (category, quantity, revenue).
+        """
+        results = await session.execute(
+            _top_query(DailySalesSummary.CATEGORY, date_from, date_to, limit, order_by)
+        )
+        return list(results.all())
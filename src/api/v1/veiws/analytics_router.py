@@ -0,0 +1,161 @@
+from datetime import date
+from typing import List, Literal
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+
+from src.api.v1.cruds.product_crud import OrmQuery
+from src.core.config import settings
+from src.core.db_helper import db_helper
+from src.core.schemas.schemas import (
+    DailyRevenue,
+    RevenueResponse,
+    TopCategory,
+    TopProduct,
+)
+from src.core.utils.fast_json import cached_json_response
+from src.core.utils.response_cache import ANALYTICS_SCOPE
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+top_products_adapter = TypeAdapter(List[TopProduct])
+top_categories_adapter = TypeAdapter(List[TopCategory])
+
+
+def _check_range(date_from: date, date_to: date) -> None:
+    if date_from > date_to:
+        raise HTTPException(
+            status_code=400, detail="'from' must not be later than 'to'"
+        )
+
+
+@router.get("/revenue", response_model=RevenueResponse)
+async def get_revenue(
+    date_from: date = Query(
+        ..., alias="from", description="Date example: '2024-01-01'"
+    ),
+    date_to: date = Query(..., alias="to", description="Date example: '2024-12-31'"),
+    accept_encoding: str | None = Header(None),
+) -> Response:
+    """
+    Выручка за диапазон дат: итог и разбивка по дням.
+    Ответы аналитики кэшируются до записи новых данных.
+
+    :param date_from: Первый день диапазона.
+
+    :param date_to: Последний день диапазона (включительно).
+
+    :param accept_encoding: Допустимые клиентом виды сжатия ответа.
+
+    :return: Итоги за диапазон и по дням с продажами.
+    """
+    _check_range(date_from, date_to)
+
+    async def load() -> bytes:
+        async with db_helper.session_factory() as session:
+            days = await OrmQuery.get_revenue(session, date_from, date_to)
+        revenue = RevenueResponse(
+            date_from=date_from,
+            date_to=date_to,
+            quantity=sum(day.quantity for day in days),
+            revenue=sum(day.revenue for day in days),
+            days=[DailyRevenue(**day._asdict()) for day in days],
+        )
+        return revenue.model_dump_json().encode()
+
+    return await cached_json_response(
+        ANALYTICS_SCOPE, f"revenue:{date_from}:{date_to}", load, accept_encoding
+    )
+
+
+@router.get("/top-products", response_model=List[TopProduct])
+async def get_top_products(
+    date_from: date = Query(
+        ..., alias="from", description="Date example: '2024-01-01'"
+    ),
+    date_to: date = Query(..., alias="to", description="Date example: '2024-12-31'"),
+    limit: int = Query(
+        settings.db.analytics_top_limit, ge=1, le=settings.db.analytics_max_top_limit
+    ),
+    order_by: Literal["quantity", "revenue"] = Query("revenue"),
+    accept_encoding: str | None = Header(None),
+) -> Response:
+    """
+    Самые продаваемые товары за диапазон дат.
+
+    :param date_from: Первый день диапазона.
+
+    :param date_to: Последний день диапазона (включительно).
+
+    :param limit: Сколько товаров вернуть.
+
+    :param order_by: Сортировка по количеству (quantity) или выручке (revenue).
+
+    :param accept_encoding: Допустимые клиентом виды сжатия ответа.
+
+    :return: Товары по убыванию order_by.
+    """
+    _check_range(date_from, date_to)
+
+    async def load() -> bytes:
+        async with db_helper.session_factory() as session:
+            rows = await OrmQuery.get_top_products(
+                session, date_from, date_to, limit=limit, order_by=order_by
+            )
+        return top_products_adapter.dump_json(
+            top_products_adapter.validate_python([row._asdict() for row in rows])
+        )
+
+    return await cached_json_response(
+        ANALYTICS_SCOPE,
+        f"top-products:{date_from}:{date_to}:{limit}:{order_by}",
+        load,
+        accept_encoding,
+    )
+
+
+@router.get("/top-categories", response_model=List[TopCategory])
+async def get_top_categories(
+    date_from: date = Query(
+        ..., alias="from", description="Date example: '2024-01-01'"
+    ),
+    date_to: date = Query(..., alias="to", description="Date example: '2024-12-31'"),
+    limit: int = Query(
+        settings.db.analytics_top_limit, ge=1, le=settings.db.analytics_max_top_limit
+    ),
+    order_by: Literal["quantity", "revenue"] = Query("revenue"),
+    accept_encoding: str | None = Header(None),
+) -> Response:
+    """
+    Самые продаваемые категории за диапазон дат.
+
+    :param date_from: Первый день диапазона.
+
+    :param date_to: Последний день диапазона (включительно).
+
+    :param limit: Сколько категорий вернуть.
+
+    :param order_by: Сортировка по количеству (quantity) или выручке (revenue).
+
+    :param accept_encoding: Допустимые клиентом виды сжатия ответа.
+
+    :return: Категории по убыванию order_by.
+    """
+    _check_range(date_from, date_to)
+
+    async def load() -> bytes:
+        async with db_helper.session_factory() as session:
+            rows = await OrmQuery.get_top_categories(
+                session, date_from, date_to, limit=limit, order_by=order_by
+            )
+        return top_categories_adapter.dump_json(
+            top_categories_adapter.validate_python([row._asdict() for row in rows])
+        )
+
+    return await cached_json_response(
+        ANALYTICS_SCOPE,
+        f"top-categories:{date_from}:{date_to}:{limit}:{order_by}",
+        load,
+        accept_encoding,
+    )
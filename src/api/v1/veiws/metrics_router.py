@@ -0,0 +1,21 @@
+from fastapi import APIRouter
+
+from src.core.utils.metrics import metrics
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+
+@router.get("/")
+async def get_metrics() -> dict[str, float]:
+    """
+    Показывает счетчики сервиса (попадания дедупликации, кэшей и т.д.).
+
+    Для замеров длительности хранятся пары <name>_sum и <name>_count,
+    среднее значение - их отношение. Для пар <name>_hits и <name>_misses
+    считается доля попаданий <name>_hit_rate, например по уровням кэша
+    ответов: response_cache_l1_hit_rate (память процесса) и
+    response_cache_l2_hit_rate (Redis).
+
+    :return: Счетчики сервиса.
+    """
+    return await metrics.snapshot()
@@ -1,23 +1,78 @@
+import time
+from contextlib import contextmanager
 from datetime import date
-from typing import Any, List
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+)
 
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, status
-from fastapi_cache.decorator import cache
+import orjson
+import redis
+from fastapi import APIRouter, Header, HTTPException, Query, Request, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from celery.result import AsyncResult
+from celery.result import AsyncResult, GroupResult
+from celery.utils import uuid
 from src.api.v1.cruds.product_crud import OrmQuery
-from src.core import LLMreport, Product
+from src.core.config import settings
 from src.core.db_helper import db_helper
 from src.core.schemas.schemas import (
     AIReportResponse,
+    BackfillEndpointResponse,
+    BatchEndpointResponse,
+    BatchStatus,
     ParseEndpointResponse,
+    ProductPage,
     ProductResponse,
+    UploadStatus,
+)
+from src.core.utils.archives import BatchBudget, stage_xml_files
+from src.core.utils.columnar_export import (
+    COLUMNAR_EXTENSIONS,
+    COLUMNAR_MEDIA_TYPES,
+    choose_columnar_format,
+    encode_columnar,
 )
+from src.core.utils.dedup import upload_index
+from src.core.utils.fast_json import cached_json_response, rows_to_dicts
 from src.core.utils.logging_config import my_logger
+from src.core.utils.metrics import metrics
+from src.core.utils.pipeline_store import pipeline_store
+from src.core.utils.product_export import (
+    EXPORT_MEDIA_TYPES,
+    PRODUCT_EXPORT_COLUMNS,
+    PRODUCT_RESPONSE_COLUMNS,
+    encode_batches,
+)
+from src.core.utils.report_stream import ERROR_EVENT, format_sse, report_stream
+from src.core.utils.staging import (
+    ChecksumMismatch,
+    ChunkTooLarge,
+    EmptyUpload,
+    StagedFile,
+    UploadBusy,
+    UploadError,
+    UploadNotFound,
+    UploadOffsetMismatch,
+    chunked_uploads,
+    upload_storage,
+)
 
 router = APIRouter()
 
+product_list_adapter = TypeAdapter(List[ProductResponse])
+
 
 @router.post(
     "/parse-xml/",
@@ -28,47 +83,500 @@ async def parse_xml_endpoint(
     file: UploadFile,
 ) -> dict[str, str | Any]:
     """
-    Принимает XML файл, создает цепочку фоновых задач в Celery.
+    Принимает XML файл, сохраняет его в staging хранилище и создает цепочку
+    фоновых задач в Celery. Через брокер передается только ссылка на файл.
     Цепочка задач состоит из таких функций:
 
-        1. task_parse_xml - эта функция нужна чтобы распарсить полученный XML файл и возвращает она список словарей.
+        1. task_parse_and_analyze_xml - потоково парсит полученный XML файл и
+        одновременно делает вычисления для составления llm prompt.
+
+        2. task_generate_report - генерирует prompt запрос к LLM на генерацию отчета.
 
-        2. task_analyze_data - делает вычисления для составления llm prompt.
+        3. task_save_result_to_db - сохраняет данные в БД.
 
-        3. task_generate_report - генерирует prompt запрос к LLM на генерацию отчета.
 
-        4. task_save_result_to_db - сохраняет данные в БД.
+    Повторно присланный файл (тот же sha256 содержимого) не обрабатывается
+    заново: возвращается id уже запущенной для него задачи.
 
+    Отчет по мере генерации можно читать через GET /reports/{task_id}/stream.
 
     :param file: XML file
 
     :return: Celery Task ID
     """
     try:
-        from src.celery.celery_worker import process_full_chain
+        start = time.perf_counter()
+        staged_xml = await run_in_threadpool(upload_storage.stage, file.file)
+        await metrics.aobserve("upload_stage_seconds", time.perf_counter() - start)
 
-        content = await file.read()
-        task_chain = process_full_chain.apply_async(args=(content,))
-        task_id = task_chain.id
+        return await _enqueue_staged_xml(staged_xml)
     except Exception as e:
         my_logger.error(str(e))
         raise HTTPException(status_code=400, detail="Invalid XML or API connection")
 
+
+async def _enqueue_staged_xml(staged_xml: StagedFile) -> dict[str, str | Any]:
+    """
+    Запускает обработку загруженного файла, если он не обрабатывался раньше.
+    :param staged_xml: Ссылка на загруженный XML файл.
+    :return: Ответ для ParseEndpointResponse.
+    """
+    from src.celery.celery_worker import pipeline_stages, report_pipeline
+
+    task_id = uuid()
+    try:
+        existing_task_id = await _claim_staged_xml(staged_xml, task_id)
+    except Exception:
+        upload_storage.delete(staged_xml)
+        raise
+    if existing_task_id:
+        return {
+            "result": "The file has already been processed",
+            "task_id": existing_task_id,
+            "duplicate": True,
+        }
+
+    # Цепочка отправляется в брокер сразу, task_id - id ее первой задачи.
+    # Небольшие интерактивные загрузки идут вне очереди
+    pipeline = report_pipeline(staged_xml.model_dump(), task_id)
+    if staged_xml.size >= settings.celery.parallel_analysis_min_size:
+        priority = settings.celery.default_priority
+    else:
+        priority = settings.celery.interactive_priority
+    try:
+        await pipeline_store.register({task_id: pipeline_stages(pipeline)})
+        pipeline.apply_async(priority=priority)
+    except Exception:
+        upload_storage.delete(staged_xml)
+        await upload_index.release(staged_xml.checksum)
+        raise
+
     return {
         "result": "The report is being generated",
         "task_id": task_id,
     }
 
 
+async def _claim_staged_xml(staged_xml: StagedFile, task_id: str) -> Optional[str]:
+    """
+    Закрепляет загруженный файл за новой задачей, если этот файл (тот же
+    sha256) еще не обрабатывался. Дубликат удаляется из staging хранилища.
+    :param staged_xml: Ссылка на загруженный XML файл.
+    :param task_id: id новой задачи.
+    :return: None, если файл закреплен за task_id, иначе id уже существующей задачи.
+    """
+    start = time.perf_counter()
+    existing_task_id = await upload_index.get(staged_xml.checksum)
+    await metrics.aobserve("dedup_check_seconds", time.perf_counter() - start)
+
+    if existing_task_id and not await _run_failed(existing_task_id):
+        my_logger.info(
+            f"Duplicate upload {staged_xml.checksum}, task {existing_task_id}"
+        )
+        await metrics.aincr("dedup_hits")
+        upload_storage.delete(staged_xml)
+        return existing_task_id
+    await metrics.aincr("dedup_misses")
+
+    if existing_task_id:
+        # Прошлая обработка этого файла упала - запускаем заново
+        await upload_index.replace(staged_xml.checksum, task_id)
+    elif concurrent_task_id := await upload_index.claim(staged_xml.checksum, task_id):
+        # Тот же файл только что загрузили параллельно (или он повторяется
+        # в том же пакете)
+        await metrics.aincr("dedup_hits")
+        upload_storage.delete(staged_xml)
+        return concurrent_task_id
+    return None
+
+
+async def _run_failed(task_id: str) -> bool:
+    """
+    Упала ли обработка файла. У цепочки (id из pipeline_store) проверяются
+    все стадии: первая задача успешна, даже если потом упали LLM или БД.
+    Файлы backfill, которые не удалось обработать, воркер сам снимает
+    из индекса дубликатов, поэтому для них достаточно состояния задачи.
+    :param task_id: id задачи из индекса дубликатов.
+    :return: True, если хотя бы одна стадия упала.
+    """
+    try:
+        pipeline = await pipeline_store.get(task_id)
+    except redis.RedisError as e:
+        my_logger.warning(f"Pipeline store is unavailable: {e}")
+        pipeline = None
+    stage_ids = [stage_id for stage_id, _ in pipeline[0]] if pipeline else [task_id]
+    return any(AsyncResult(stage_id).state == "FAILURE" for stage_id in stage_ids)
+
+
+UPLOAD_ERROR_STATUS: Dict[Type[UploadError], int] = {
+    UploadNotFound: status.HTTP_404_NOT_FOUND,
+    UploadBusy: status.HTTP_409_CONFLICT,
+    UploadOffsetMismatch: status.HTTP_409_CONFLICT,
+    ChunkTooLarge: status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+    ChecksumMismatch: status.HTTP_422_UNPROCESSABLE_ENTITY,
+    EmptyUpload: status.HTTP_422_UNPROCESSABLE_ENTITY,
+}
+
+
+@contextmanager
+def _upload_errors() -> Iterator[None]:
+    """Переводит ошибки загрузки частями в HTTP ответы."""
+    try:
+        yield
+    except UploadError as e:
+        raise HTTPException(
+            status_code=UPLOAD_ERROR_STATUS[type(e)], detail=str(e)
+        ) from e
+
+
+def _upload_status(upload_id: str, offset: int) -> dict[str, str | int]:
+    return {
+        "upload_id": upload_id,
+        "offset": offset,
+        "chunk_size": chunked_uploads.max_chunk_size,
+    }
+
+
+@router.post(
+    "/parse-xml/uploads/",
+    response_model=UploadStatus,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_upload() -> dict[str, str | int]:
+    """
+    Начинает загрузку XML файла частями (для больших файлов и нестабильной
+    связи). Дальше части отправляются через PUT /parse-xml/uploads/{upload_id},
+    а обработка запускается через POST /parse-xml/uploads/{upload_id}/complete.
+
+    :return: id загрузки и максимальный размер части.
+    """
+    upload_id = await run_in_threadpool(chunked_uploads.create)
+    return _upload_status(upload_id, 0)
+
+
+@router.get("/parse-xml/uploads/{upload_id}", response_model=UploadStatus)
+async def get_upload(upload_id: str) -> dict[str, str | int]:
+    """
+    Состояние загрузки: после обрыва связи загрузка продолжается с offset.
+
+    :param upload_id: id загрузки.
+
+    :return: Сколько байт уже принято.
+    """
+    with _upload_errors():
+        offset = await run_in_threadpool(chunked_uploads.offset, upload_id)
+    return _upload_status(upload_id, offset)
+
+
+@router.put("/parse-xml/uploads/{upload_id}", response_model=UploadStatus)
+async def append_upload_chunk(
+    upload_id: str,
+    request: Request,
+    offset: int = Query(..., ge=0, description="Смещение части в файле"),
+    chunk_sha256: str | None = Header(None, alias="X-Chunk-SHA256"),
+) -> dict[str, str | int]:
+    """
+    Принимает очередную часть файла (тело запроса - байты части) и пишет ее
+    на диск по мере чтения, не держа часть в памяти целиком.
+
+    :param upload_id: id загрузки.
+
+    :param offset: Смещение части, должно совпадать с offset загрузки
+        (иначе 409). Часть больше chunk_size не принимается (413).
+
+    :param chunk_sha256: sha256 части; при несовпадении часть
+        не принимается (422) и ее можно отправить заново.
+
+    :return: Новый offset загрузки.
+    """
+    with _upload_errors():
+        writer = await run_in_threadpool(chunked_uploads.open_chunk, upload_id, offset)
+        try:
+            try:
+                async for piece in request.stream():
+                    await run_in_threadpool(writer.write, piece)
+                new_offset = await run_in_threadpool(writer.commit, chunk_sha256)
+            except BaseException:
+                # Оборванная или неверная часть не остается в файле
+                await run_in_threadpool(writer.rollback)
+                raise
+        finally:
+            await run_in_threadpool(writer.close)
+    return _upload_status(upload_id, new_offset)
+
+
+@router.post(
+    "/parse-xml/uploads/{upload_id}/complete",
+    response_model=ParseEndpointResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def complete_upload(
+    upload_id: str,
+    checksum: str | None = Query(None, description="sha256 всего файла"),
+) -> dict[str, str | Any]:
+    """
+    Завершает загрузку частями и запускает обработку файла так же, как
+    POST /parse-xml/: в цепочку задач передается только ссылка на файл.
+
+    :param upload_id: id загрузки.
+
+    :param checksum: sha256 всего файла для проверки (необязательно).
+
+    :return: Celery Task ID
+    """
+    with _upload_errors():
+        staged_xml = await run_in_threadpool(
+            chunked_uploads.complete, upload_id, checksum
+        )
+    try:
+        return await _enqueue_staged_xml(staged_xml)
+    except Exception as e:
+        my_logger.error(str(e))
+        raise HTTPException(status_code=400, detail="Invalid XML or API connection")
+
+
+@router.delete("/parse-xml/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_upload(upload_id: str) -> None:
+    """
+    Отменяет загрузку и удаляет принятые части.
+
+    :param upload_id: id загрузки.
+    """
+    with _upload_errors():
+        await run_in_threadpool(chunked_uploads.abort, upload_id)
+
+
+@router.post(
+    "/parse-xml/batch",
+    response_model=BatchEndpointResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def parse_xml_batch_endpoint(
+    files: List[UploadFile],
+) -> dict[str, Any]:
+    """
+    Принимает сразу много XML файлов (например, дневные файлы всех филиалов)
+    или архив с ними: zip, tar.gz, tar.zst, а также один XML, сжатый gzip
+    или zstd. Архивы распаковываются потоково прямо в staging хранилище.
+
+    Для каждого файла запускается своя цепочка задач (как в POST /parse-xml/),
+    все цепочки отправляются в Celery одной группой с общим batch_id.
+    Файлы, которые уже обрабатывались (тот же sha256, в том числе повторы
+    внутри пакета), заново не обрабатываются: для них возвращается id
+    существующей задачи.
+
+    Общее состояние пакета - GET /parse-xml/batch/{batch_id}.
+
+    :param files: XML файлы или архив.
+
+    :return: batch_id и id задачи по каждому файлу.
+    """
+    from celery import group
+    from src.celery.celery_app import celery_app
+    from src.celery.celery_worker import pipeline_stages, report_pipeline
+
+    budget = BatchBudget(
+        settings.staging.batch_max_files, settings.staging.batch_max_size
+    )
+    staged_xmls: List[Tuple[str, StagedFile]] = []
+    try:
+        for file in files:
+            staged_xmls += await run_in_threadpool(
+                stage_xml_files,
+                upload_storage,
+                file.file,
+                file.filename or "upload.xml",
+                budget,
+            )
+    except Exception as e:
+        for _, staged_xml in staged_xmls:
+            upload_storage.delete(staged_xml)
+        if isinstance(e, HTTPException):
+            raise
+        my_logger.error(str(e))
+        raise HTTPException(status_code=400, detail="Invalid archive")
+    if not staged_xmls:
+        raise HTTPException(status_code=400, detail="No XML files in the batch")
+
+    batch_id = uuid()
+    batch_files: List[dict[str, Any]] = []
+    pipelines = {}
+    claimed: List[StagedFile] = []
+    try:
+        for name, staged_xml in staged_xmls:
+            task_id = uuid()
+            if existing_task_id := await _claim_staged_xml(staged_xml, task_id):
+                batch_files.append(
+                    {"name": name, "task_id": existing_task_id, "duplicate": True}
+                )
+                continue
+            claimed.append(staged_xml)
+            batch_files.append({"name": name, "task_id": task_id})
+            pipelines[task_id] = report_pipeline(staged_xml.model_dump(), task_id)
+
+        if pipelines:
+            await pipeline_store.register(
+                {
+                    task_id: pipeline_stages(pipeline)
+                    for task_id, pipeline in pipelines.items()
+                }
+            )
+            # Все цепочки пакета уходят в брокер за одно соединение
+            batch = group(list(pipelines.values())).apply_async(task_id=batch_id)
+        else:
+            batch = GroupResult(batch_id, [], app=celery_app)
+        batch.save()
+    except Exception as e:
+        my_logger.error(str(e))
+        for _, staged_xml in staged_xmls:
+            upload_storage.delete(staged_xml)
+        for staged_xml in claimed:
+            await upload_index.release(staged_xml.checksum)
+        raise HTTPException(status_code=400, detail="Invalid XML or API connection")
+
+    return {
+        "result": "The reports are being generated",
+        "batch_id": batch_id,
+        "files": batch_files,
+        "duplicates": len(batch_files) - len(pipelines),
+    }
+
+
+def _pipeline_status(result: AsyncResult) -> dict[str, Any]:
+    # result - последняя задача цепочки файла, id файла - у первой задачи
+    stages = [result]
+    while stages[-1].parent is not None:
+        stages.append(stages[-1].parent)
+    task_id = stages[-1].id
+    for stage in reversed(stages):
+        if stage.state == "FAILURE":
+            return {
+                "task_id": task_id,
+                "status": "FAILURE",
+                "result": str(stage.result),
+            }
+    return {
+        "task_id": task_id,
+        "status": result.state,
+        "result": str(result.result) if result.state == "SUCCESS" else None,
+    }
+
+
+@router.get("/parse-xml/batch/{batch_id}", response_model=BatchStatus)
+async def get_batch_status(batch_id: str) -> dict[str, Any]:
+    """
+    Общее состояние пакетной загрузки и состояние каждого файла пакета.
+    Файлы-дубликаты в пакет не входят: их состояние - по id из ответа загрузки.
+
+    :param batch_id: id пакета из ответа POST /parse-xml/batch.
+
+    :return: Сколько файлов обработано, сколько упало, и состояние по файлам.
+    """
+    from src.celery.celery_app import celery_app
+
+    batch = GroupResult.restore(batch_id, app=celery_app)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    files = [_pipeline_status(result) for result in batch.results]
+    completed = sum(file["status"] == "SUCCESS" for file in files)
+    failed = sum(file["status"] == "FAILURE" for file in files)
+    if completed + failed < len(files):
+        batch_status = "PROGRESS"
+    else:
+        batch_status = "FAILURE" if failed else "SUCCESS"
+    return {
+        "batch_id": batch_id,
+        "status": batch_status,
+        "total": len(files),
+        "completed": completed,
+        "failed": failed,
+        "files": files,
+    }
+
+
+@router.post(
+    "/parse-xml/backfill/",
+    response_model=BackfillEndpointResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def parse_xml_backfill_endpoint(
+    files: List[UploadFile],
+) -> dict[str, str | Any]:
+    """
+    Принимает много XML файлов за прошлые даты (backfill истории) и запускает
+    их пакетную обработку (process_backfill): файлы парсятся параллельно,
+    а отчеты LLM генерируются одним пакетом с ограничением параллельных
+    запросов, после чего каждый отчет сохраняется со своими товарами.
+
+    Уже обработанные файлы (тот же sha256 содержимого) пропускаются, если
+    их обработка не упала.
+
+    :param files: XML files
+
+    :return: Celery Task ID
+    """
+    from src.celery.celery_worker import process_backfill
+
+    task_id = uuid()
+    staged_xmls = []
+    duplicates = 0
+    try:
+        for file in files:
+            staged_xml = await run_in_threadpool(upload_storage.stage, file.file)
+            try:
+                existing_task_id = await _claim_staged_xml(staged_xml, task_id)
+            except Exception:
+                upload_storage.delete(staged_xml)
+                raise
+            if existing_task_id:
+                duplicates += 1
+                continue
+            staged_xmls.append(staged_xml)
+
+        if staged_xmls:
+            process_backfill.apply_async(
+                args=([staged_xml.model_dump() for staged_xml in staged_xmls],),
+                task_id=task_id,
+                priority=settings.celery.backfill_priority,
+            )
+    except Exception as e:
+        my_logger.error(str(e))
+        for staged_xml in staged_xmls:
+            upload_storage.delete(staged_xml)
+        for staged_xml in staged_xmls:
+            await upload_index.release(staged_xml.checksum)
+        raise HTTPException(status_code=400, detail="Invalid XML or API connection")
+
+    return {
+        "result": "The reports are being generated",
+        "task_id": task_id,
+        "files": len(staged_xmls),
+        "duplicates": duplicates,
+    }
+
+
 @router.get("/task-status/{task_id}")
 async def get_task_status(task_id: str) -> dict[str, Any]:
     """
     Показывает состояние задач по id.
 
+    Для цепочки обработки файла (id из ответа загрузки) состояние собирается
+    по всем ее задачам: упавшая задача, результат последней и время каждой
+    стадии - ожидание в очереди (queue_wait) и выполнение (runtime), в секундах.
+
     :param task_id: id of the task
 
     :return: status of the task
     """
+    try:
+        pipeline = await pipeline_store.get(task_id)
+    except redis.RedisError as e:
+        my_logger.warning(f"Pipeline store is unavailable: {e}")
+        pipeline = None
+    if pipeline is not None:
+        return _pipeline_task_status(task_id, *pipeline)
+
     result = AsyncResult(task_id)
 
     # Проходим по всем подзадачам
@@ -89,43 +597,352 @@ async def get_task_status(task_id: str) -> dict[str, Any]:
     }
 
 
+def _pipeline_task_status(
+    pipeline_id: str,
+    stages: List[Tuple[str, str]],
+    timings: dict[tuple[str, str], dict[str, Any]],
+) -> dict[str, Any]:
+    stage_statuses = []
+    failed: Optional[AsyncResult] = None
+    result = None
+    for stage_id, stage in stages:
+        result = AsyncResult(stage_id)
+        timing = timings.get((stage_id, stage), {})
+        stage_statuses.append(
+            {
+                "task_id": stage_id,
+                "stage": stage,
+                "status": result.state,
+                "queue_wait": timing.get("queue_wait"),
+                "runtime": timing.get("runtime"),
+            }
+        )
+        if failed is None and result.state == "FAILURE":
+            failed = result
+
+    # От отправки первой задачи до конца последней записанной
+    elapsed = None
+    if timings:
+        start = min(t["queued_at"] or t["started_at"] for t in timings.values())
+        elapsed = max(t["finished_at"] for t in timings.values()) - start
+
+    if failed is not None:
+        return {
+            "task_id": failed.id,
+            "status": failed.state,
+            "result": str(failed.result),
+            "traceback": failed.traceback,
+            "stages": stage_statuses,
+            "elapsed": elapsed,
+        }
+    # result - последняя стадия цепочки
+    if result is not None and result.state == "SUCCESS":
+        status, output = "SUCCESS", str(result.result)
+    else:
+        # Время пишется по завершении задачи: цепочка идет, если хотя бы
+        # одна стадия уже выполнена
+        started = any(stage_key in timings for stage_key in stages)
+        status, output = ("STARTED" if started else "PENDING"), None
+    return {
+        "task_id": pipeline_id,
+        "status": status,
+        "result": output,
+        "stages": stage_statuses,
+        "elapsed": elapsed,
+    }
+
+
 @router.get(
     "/reports/",
     response_model=AIReportResponse,
 )
-@cache(expire=30)
 async def get_ai_report(
     date_value: date = Query(..., description="Date example: '2024-01-01'"),
-    session: AsyncSession = Depends(db_helper.session_getter),
-) -> LLMreport:
+    accept_encoding: str | None = Header(None),
+) -> Response:
     """
     Выдает сохраненный в БД llm отчет по дате.
-
-    :param session: Подключение к Postgres.
+    Ответ кэшируется до записи новых данных за эту дату.
 
     :param date_value: За какую дату хотите получить отчет.
 
+    :param accept_encoding: Допустимые клиентом виды сжатия ответа.
+
     :return: Составленный AI отчет.
     """
-    return await OrmQuery.get_report_by_date(session=session, date_value=date_value)
+
+    async def load() -> bytes:
+        async with db_helper.session_factory() as session:
+            report = await OrmQuery.get_report_by_date(
+                session=session, date_value=date_value
+            )
+            return (
+                AIReportResponse.model_validate(report, from_attributes=True)
+                .model_dump_json()
+                .encode()
+            )
+
+    return await cached_json_response(
+        date_value.isoformat(), "reports", load, accept_encoding
+    )
+
+
+@router.get("/reports/{task_id}/stream")
+async def stream_ai_report(
+    task_id: str,
+    last_event_id: str | None = Header(None),
+) -> StreamingResponse:
+    """
+    Отдает отчет LLM по мере генерации (Server-Sent Events).
+
+    События: chunk - очередная часть текста отчета, done - отчет готов,
+    error - генерация упала. Подключиться можно сразу после загрузки файла:
+    пока идет парсинг, приходят только keep-alive комментарии. При
+    переподключении с заголовком Last-Event-ID поток продолжается с
+    места обрыва.
+
+    :param task_id: id задачи, полученный при загрузке XML файла.
+
+    :param last_event_id: id последнего полученного события.
+
+    :return: Поток text/event-stream.
+    """
+    return StreamingResponse(
+        _report_events(task_id, last_event_id or "0"),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _report_events(task_id: str, last_id: str) -> AsyncIterator[str]:
+    deadline = time.monotonic() + settings.report_stream.report_stream_timeout
+    try:
+        async for message in report_stream.listen(task_id, last_id):
+            if message is None:
+                if time.monotonic() >= deadline:
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            yield format_sse(*message)
+    except redis.RedisError as e:
+        my_logger.error(f"Report stream {task_id} failed: {e}")
+        yield format_sse(last_id, ERROR_EVENT, "Report stream is unavailable")
 
 
 @router.get(
     "/sales-product/",
     response_model=List[ProductResponse],
 )
-@cache(expire=30)
 async def get_sales_product(
     date_value: date = Query(..., description="Date example: '2024-01-01'"),
-    session: AsyncSession = Depends(db_helper.session_getter),
-) -> list[Product]:
+    accept_encoding: str | None = Header(None),
+) -> Response:
     """
      Выдает сохраненные в БД данные из XML отчетов по дате.
+     Ответ кэшируется до записи новых данных за эту дату. Для больших дней
+     есть постраничный /sales-product/page/ и потоковый /sales-product/export/.
 
     :param date_value: За какую дату хотите получить данные.
 
-    :param session: Подключение к Postgres.
+    :param accept_encoding: Допустимые клиентом виды сжатия ответа.
 
     :return: Список из product.
     """
-    return await OrmQuery.get_product_by_date(session=session, date_value=date_value)
+
+    async def load() -> bytes:
+        async with db_helper.session_factory() as session:
+            if settings.api_response.api_fast_json:
+                rows = await OrmQuery.get_product_rows_by_date(
+                    session, date_value, PRODUCT_RESPONSE_COLUMNS
+                )
+                return orjson.dumps(rows_to_dicts(PRODUCT_RESPONSE_COLUMNS, rows))
+            products = await OrmQuery.get_product_by_date(
+                session=session, date_value=date_value
+            )
+            return product_list_adapter.dump_json(
+                product_list_adapter.validate_python(products, from_attributes=True)
+            )
+
+    return await cached_json_response(
+        date_value.isoformat(), "sales-product", load, accept_encoding
+    )
+
+
+@router.get(
+    "/sales-product/page/",
+    response_model=ProductPage,
+)
+async def get_sales_product_page(
+    date_value: date = Query(..., description="Date example: '2024-01-01'"),
+    limit: int = Query(
+        settings.db.products_page_size,
+        ge=1,
+        le=settings.db.products_max_page_size,
+        description="Page size",
+    ),
+    after_id: Optional[int] = Query(
+        None, description="next_after_id from the previous page"
+    ),
+    accept_encoding: str | None = Header(None),
+) -> Response:
+    """
+     Выдает сохраненные в БД данные из XML отчетов по дате постранично.
+     Страницы кэшируются до записи новых данных за эту дату.
+
+    :param date_value: За какую дату хотите получить данные.
+
+    :param limit: Сколько товаров вернуть.
+
+    :param after_id: С какого товара продолжить (next_after_id прошлой страницы).
+
+    :param accept_encoding: Допустимые клиентом виды сжатия ответа.
+
+    :return: Страница из product и курсор следующей страницы.
+    """
+
+    async def load() -> bytes:
+        async with db_helper.session_factory() as session:
+            if settings.api_response.api_fast_json:
+                return await _load_product_rows(session, date_value, limit, after_id)
+            products = await OrmQuery.get_product_by_date(
+                session=session, date_value=date_value, limit=limit, after_id=after_id
+            )
+            page = ProductPage.model_validate(
+                {
+                    "items": products,
+                    "next_after_id": (
+                        products[-1].id if len(products) == limit else None
+                    ),
+                },
+                from_attributes=True,
+            )
+        return page.model_dump_json().encode()
+
+    return await cached_json_response(
+        date_value.isoformat(),
+        f"sales-product-page:{limit}:{after_id}",
+        load,
+        accept_encoding,
+    )
+
+
+async def _load_product_rows(
+    session: AsyncSession, date_value: date, limit: int, after_id: Optional[int]
+) -> bytes:
+    # Быстрый режим: кортежи колонок и orjson, тот же JSON, что у ProductPage
+    rows = await OrmQuery.get_product_rows_by_date(
+        session, date_value, PRODUCT_RESPONSE_COLUMNS, limit=limit, after_id=after_id
+    )
+    return orjson.dumps(
+        {
+            "items": rows_to_dicts(PRODUCT_RESPONSE_COLUMNS, rows),
+            "next_after_id": rows[-1].id if len(rows) == limit else None,
+        }
+    )
+
+
+@router.get("/sales-product/export/")
+async def export_sales_product(
+    date_value: date = Query(..., description="Date example: '2024-01-01'"),
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+) -> StreamingResponse:
+    """
+    Выгружает все товары за дату одним потоковым ответом (NDJSON или CSV).
+
+    Строки читаются из БД серверным курсором и отправляются клиенту
+    по мере чтения, поэтому память не зависит от количества товаров за день.
+
+    :param date_value: За какую дату выгрузить товары.
+
+    :param export_format: ndjson или csv.
+
+    :return: Поток строк товаров.
+    """
+    batches = OrmQuery.stream_products_by_date(date_value, PRODUCT_EXPORT_COLUMNS)
+    first_batch = await anext(batches, None)
+    if first_batch is None:
+        raise HTTPException(
+            status_code=404, detail="No products found for the given date"
+        )
+
+    async def all_batches() -> AsyncIterator[Sequence[Any]]:
+        yield first_batch
+        async for batch in batches:
+            yield batch
+
+    return StreamingResponse(
+        encode_batches(all_batches(), export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="products-{date_value}.{export_format}"'
+            )
+        },
+    )
+
+
+@router.get("/sales-product/export/columnar/")
+async def export_sales_product_columnar(
+    date_from: date = Query(
+        ..., alias="from", description="Date example: '2024-01-01'"
+    ),
+    date_to: date = Query(..., alias="to", description="Date example: '2024-01-31'"),
+    accept: str | None = Header(None),
+) -> StreamingResponse:
+    """
+    Выгружает товары за диапазон дат одним потоком в Arrow IPC или Parquet.
+    Формат выбирается по заголовку Accept, по умолчанию Arrow IPC stream.
+
+    Строки читаются из БД пачками и сразу пишутся record batch'ами,
+    весь диапазон в памяти не собирается.
+
+    :param date_from: Первый день диапазона.
+
+    :param date_to: Последний день диапазона (включительно).
+
+    :param accept: application/vnd.apache.arrow.stream
+        или application/vnd.apache.parquet.
+
+    :return: Поток Arrow IPC или Parquet файл.
+    """
+    if date_from > date_to:
+        raise HTTPException(
+            status_code=400, detail="'from' must not be later than 'to'"
+        )
+    if (date_to - date_from).days >= settings.db.export_max_days:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range must not exceed {settings.db.export_max_days} days",
+        )
+    export_format = choose_columnar_format(accept)
+    if export_format is None:
+        raise HTTPException(
+            status_code=406,
+            detail=f"Supported types: {', '.join(COLUMNAR_MEDIA_TYPES.values())}",
+        )
+
+    batches = OrmQuery.stream_products_by_range(
+        date_from, date_to, PRODUCT_EXPORT_COLUMNS
+    )
+    first_batch = await anext(batches, None)
+    if first_batch is None:
+        raise HTTPException(
+            status_code=404, detail="No products found for the given range"
+        )
+
+    async def all_batches() -> AsyncIterator[Sequence[Any]]:
+        yield first_batch
+        async for batch in batches:
+            yield batch
+
+    extension = COLUMNAR_EXTENSIONS[export_format]
+    return StreamingResponse(
+        encode_columnar(all_batches(), export_format),
+        media_type=COLUMNAR_MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="products-{date_from}-{date_to}.{extension}"'
+            ),
+            "Vary": "Accept",
+        },
+    )
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import threading
+from typing import Any, Coroutine, Optional, TypeVar
+
+from src.core.db_helper import db_helper
+from src.core.utils.logging_config import my_logger
+from src.core.utils.openai_client import openai_clients
+
+T = TypeVar("T")
+
+
+class WorkerEventLoop:
+    """
+    Один долгоживущий event loop на процесс воркера Celery.
+
+    Loop работает в отдельном потоке, задачи отправляют в него корутины и
+    ждут результат. Так объекты, привязанные к loop (пул asyncpg движка
+    db_helper, async клиенты OpenAI и Redis), создаются один раз и
+    переиспользуются всеми задачами процесса, а не пересоздаются через
+    asyncio.run на каждую задачу. Подходит и для prefork, и для пула потоков:
+    корутины разных задач выполняются в одном loop конкурентно.
+
+    Поток loop не переживает fork, поэтому в дочернем процессе ссылки
+    сбрасываются и loop создается заново при первом вызове.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    self._thread = threading.Thread(
+                        target=loop.run_forever,
+                        name="worker-event-loop",
+                        daemon=True,
+                    )
+                    self._thread.start()
+                    self._loop = loop
+        return self._loop
+
+    def run(self, coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+        """
+        Выполняет корутину в loop воркера и ждет результат.
+        :param coro: Корутина, например запрос к БД.
+        :param timeout: Сколько ждать результат, секунд.
+        :return: Результат корутины (исключения пробрасываются как есть).
+        """
+        if self._thread is threading.current_thread():
+            coro.close()
+            raise RuntimeError("WorkerEventLoop.run called from its own loop")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def shutdown(self) -> None:
+        """
+        Закрывает пул БД и соединения async клиента OpenAI внутри loop
+        и останавливает loop.
+        """
+        if self._loop is None:
+            return
+        try:
+            self.run(db_helper.dispose(), timeout=10)
+        except Exception as e:
+            my_logger.warning(f"Failed to dispose database engine: {e}")
+        try:
+            self.run(openai_clients.aclose(), timeout=10)
+        except Exception as e:
+            my_logger.warning(f"Failed to close OpenAI client: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self._loop.close()
+        self.reset()
+
+    def reset(self) -> None:
+        """Забывает loop родителя (после fork его поток в процессе не существует)."""
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+
+
+worker_loop = WorkerEventLoop()
+os.register_at_fork(after_in_child=worker_loop.reset)
+
+
+def run_async(coro: Coroutine[Any, Any, T]) -> T:
+    return worker_loop.run(coro)
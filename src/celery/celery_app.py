@@ -1,8 +1,165 @@
+import json
+import time
+from typing import Any, Dict, Tuple
+
+from kombu import Queue
+
 from celery import Celery
+from celery.schedules import crontab
+from celery.signals import (
+    before_task_publish,
+    celeryd_init,
+    task_postrun,
+    task_prerun,
+    worker_process_shutdown,
+    worker_shutdown,
+)
+from src.celery.async_runtime import worker_loop
 from src.core.config import settings
+from src.core.utils.logging_config import my_logger
+from src.core.utils.pipeline_store import pipeline_store
 
 celery_app = Celery(
     "worker",
     backend=settings.celery.CELERY_RESULT_BACKEND,
     broker=settings.celery.CELERY_BROKER_URL,
 )
+
+celery_settings = settings.celery
+TASKS = "src.celery.celery_worker"
+
+# Стадия -> (очередь, пул, concurrency) для CELERY_WORKER_STAGE
+WORKER_STAGES: Dict[str, Tuple[str, str, int]] = {
+    "default": (
+        celery_settings.default_queue,
+        celery_settings.default_pool,
+        celery_settings.default_concurrency,
+    ),
+    "parse": (
+        celery_settings.parse_queue,
+        celery_settings.parse_pool,
+        celery_settings.parse_concurrency,
+    ),
+    "llm": (
+        celery_settings.llm_queue,
+        celery_settings.llm_pool,
+        celery_settings.llm_concurrency,
+    ),
+    "db": (
+        celery_settings.db_queue,
+        celery_settings.db_pool,
+        celery_settings.db_concurrency,
+    ),
+}
+
+celery_app.conf.result_expires = celery_settings.result_expires
+celery_app.conf.task_default_queue = celery_settings.default_queue
+# Ключ маршрутизации у каждой очереди свой, иначе все очереди, привязанные
+# к обменнику по умолчанию, получали бы копию каждой задачи
+celery_app.conf.task_queues = [
+    Queue(queue, routing_key=queue) for queue, _, _ in WORKER_STAGES.values()
+]
+celery_app.conf.task_routes = {
+    f"{TASKS}.task_parse_xml": {"queue": celery_settings.parse_queue},
+    f"{TASKS}.task_parse_and_analyze_xml": {"queue": celery_settings.parse_queue},
+    f"{TASKS}.task_parse_chunk": {"queue": celery_settings.parse_queue},
+    f"{TASKS}.task_merge_aggregates": {"queue": celery_settings.parse_queue},
+    f"{TASKS}.task_fan_out_analysis": {"queue": celery_settings.parse_queue},
+    f"{TASKS}.task_generate_report": {"queue": celery_settings.llm_queue},
+    f"{TASKS}.task_generate_reports_batch": {"queue": celery_settings.llm_queue},
+    f"{TASKS}.task_save_result_to_db": {"queue": celery_settings.db_queue},
+    f"{TASKS}.task_maintain_partitions": {"queue": celery_settings.db_queue},
+}
+
+# Приоритеты в Redis: каждая очередь делится на подочереди по приоритету,
+# воркер сначала забирает задачи с меньшим номером. Следующие задачи
+# цепочки отправляются воркером и наследуют приоритет предыдущей
+celery_app.conf.broker_transport_options = {
+    "priority_steps": list(range(10)),
+    "sep": ":",
+    "queue_order_strategy": "priority",
+}
+celery_app.conf.task_default_priority = celery_settings.default_priority
+celery_app.conf.task_inherit_parent_priority = True
+# Без предвыборки задача с низким приоритетом не занимает слот воркера
+# раньше пришедшей позже интерактивной
+celery_app.conf.worker_prefetch_multiplier = 1
+
+if celery_settings.celery_worker_stage:
+    _, celery_app.conf.worker_pool, celery_app.conf.worker_concurrency = WORKER_STAGES[
+        celery_settings.celery_worker_stage
+    ]
+
+celery_app.conf.beat_schedule = {
+    "maintain-product-partitions": {
+        "task": "src.celery.celery_worker.task_maintain_partitions",
+        "schedule": crontab(hour=0, minute=5),
+    },
+    "remove-expired-uploads": {
+        "task": "src.celery.celery_worker.task_remove_expired_uploads",
+        "schedule": crontab(minute=30),
+    },
+}
+
+
+@before_task_publish.connect
+def log_task_payload_size(
+    sender: str | None = None, body: Any = None, **_: Any
+) -> None:
+    """Логирует размер аргументов задачи, уходящих в брокер."""
+    payload_size = len(json.dumps(body, default=str))
+    my_logger.debug(f"Task {sender} payload size: {payload_size} bytes")
+
+
+@before_task_publish.connect
+def stamp_publish_time(headers: Dict[str, Any] | None = None, **_: Any) -> None:
+    """Время отправки задачи в брокер: по нему считается ожидание в очереди."""
+    if headers is not None:
+        headers["published_at"] = time.time()
+
+
+@task_prerun.connect
+def mark_task_start(task: Any = None, **_: Any) -> None:
+    task.request.started_at = time.time()
+
+
+@task_postrun.connect
+def record_task_timing(task_id: str = "", task: Any = None, **_: Any) -> None:
+    """Пишет время задачи в запись цепочки (root_id) в pipeline_store."""
+    request = task.request
+    started_at = getattr(request, "started_at", None)
+    if started_at is None:
+        return
+    pipeline_store.record_timing(
+        pipeline_id=request.root_id or task_id,
+        task_id=task_id,
+        stage=task.name.rsplit(".", 1)[-1],
+        queued_at=request.get("published_at"),
+        started_at=started_at,
+        finished_at=time.time(),
+    )
+
+
+@celeryd_init.connect
+def select_stage_queue(
+    instance: Any = None, options: Dict[str, Any] | None = None, **_: Any
+) -> None:
+    """
+    Воркер стадии (CELERY_WORKER_STAGE) читает только очередь стадии,
+    если очереди не заданы явно через -Q.
+    """
+    stage = settings.celery.celery_worker_stage
+    if stage and not (options or {}).get("queues"):
+        queue, pool, concurrency = WORKER_STAGES[stage]
+        instance.app.amqp.queues.select(queue)
+        my_logger.info(
+            f"Worker stage {stage}: queue {queue}, pool {pool}, "
+            f"concurrency {concurrency}"
+        )
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def shutdown_worker_loop(**_: Any) -> None:
+    """Закрывает пул БД и event loop процесса при остановке воркера."""
+    worker_loop.shutdown()
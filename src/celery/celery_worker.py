@@ -1,75 +1,370 @@
-import asyncio
-from typing import Any, Dict, List
+from functools import reduce
+from typing import Any, Dict, List, Optional, Tuple
 
-from celery import chain
+from celery import Task, chain, chord, group
 from src.api.v1.cruds.product_crud import OrmQuery
+from src.celery.async_runtime import run_async
 from src.celery.celery_app import celery_app
-from src.core.utils.data_analyzer import analyze_data
+from src.core.config import settings
+from src.core.utils.data_analyzer import SalesAggregator
+from src.core.utils.dedup import upload_index
 from src.core.utils.logging_config import my_logger
-from src.core.utils.sales_data_prompt import generate_report_content
-from src.core.utils.xml_parser import parse_xml
+from src.core.utils.partitions import product_partitions
+from src.core.utils.report_stream import report_stream
+from src.core.utils.sales_data_prompt import (
+    generate_report_content,
+    generate_reports_batch,
+)
+from src.core.utils.staging import StagedFile, chunked_uploads, upload_storage
+from src.core.utils.xml_parser import (
+    iter_parse_xml,
+    iter_parse_xml_range,
+    split_products,
+)
 
 
 @celery_app.task
-def task_parse_xml(xml_text: bytes) -> List[Dict[str, Any]]:
+def task_parse_xml(staged_xml: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Запускает функцию которая парсит XML контент.
-    :param xml_text: XML content
-    :return: List[Dict[str, Any]]
+    Потоково парсит XML контент из staging хранилища (iter_parse_xml).
+    Распаршенные товары записываются обратно в хранилище, дальше по цепочке
+    передается только ссылка на них.
+    :param staged_xml: StagedFile загруженного XML файла
+    :return: StagedFile с товарами в формате NDJSON
     """
-    return parse_xml(xml_text)
+    xml_ref = StagedFile.model_validate(staged_xml)
+    try:
+        with upload_storage.open(xml_ref) as xml_file:
+            products_ref = upload_storage.write_records(iter_parse_xml(xml_file))
+    finally:
+        # Битый XML повторно не парсится: файл удаляется и при ошибке
+        upload_storage.delete(xml_ref)
+    return products_ref.model_dump()
 
 
 @celery_app.task
-def task_analyze_data(prod_list: List[Dict[str, Any]]) -> tuple:
+def task_parse_and_analyze_xml(
+    staged_xml: Dict[str, Any], skip_errors: bool = False
+) -> Optional[tuple]:
     """
-    Принимает распаршенный контент и делает вычисления для составления prompt запрос к llm.
-    :param prod_list: List[Dict[str, Any]] распаршенный контент
+    Потоково парсит XML и одновременно считает сводку для prompt запроса к llm.
+    Анализ заканчивается вместе с парсингом, без второго прохода по товарам.
+    :param staged_xml: StagedFile загруженного XML файла
+    :param skip_errors: Вернуть None вместо ошибки (для backfill, чтобы один
+        битый файл не ронял весь пакет)
     :return: tuple(date, total_revenue, top_products_str, categories_str),
-        prod_list - передает дальше по цепочке распаршеный XML content
+        staged_products - ссылка на распаршеный XML content
     """
-    result: tuple = analyze_data(prod_list)
-    return result, prod_list
+    xml_ref = StagedFile.model_validate(staged_xml)
+    aggregator = SalesAggregator()
+    try:
+        with upload_storage.open(xml_ref) as xml_file:
+            products_ref = upload_storage.write_records(
+                aggregator.consume(iter_parse_xml(xml_file))
+            )
+        try:
+            summary = aggregator.summary()
+        except ValueError:
+            upload_storage.delete(products_ref)
+            raise
+    except Exception as e:
+        if not skip_errors:
+            raise e
+        my_logger.error(f"Skipping {xml_ref.key}: {e}")
+        return None
+    finally:
+        # Недописанный NDJSON удаляет сам write_records
+        upload_storage.delete(xml_ref)
+    return summary, products_ref.model_dump()
 
 
 @celery_app.task
-def task_generate_report(analyze_report: tuple) -> tuple:
+def task_parse_chunk(
+    staged_xml: Dict[str, Any], prefix_end: int, start: int, end: int, suffix: str
+) -> Dict[str, Any]:
+    """
+    Парсит товары из диапазона байт XML файла (см. split_products) и
+    одновременно считает по ним частичный агрегат.
+    :param staged_xml: StagedFile загруженного XML файла
+    :param prefix_end: Конец заголовка XML до товаров
+    :param start: Начало диапазона в байтах
+    :param end: Конец диапазона в байтах
+    :param suffix: Закрывающие теги документа
+    :return: dict(aggregate, products) - сериализованный SalesAggregator
+        и StagedFile с товарами диапазона в формате NDJSON
+    """
+    xml_ref = StagedFile.model_validate(staged_xml)
+    aggregator = SalesAggregator()
+    with upload_storage.open(xml_ref) as xml_file:
+        products_ref = upload_storage.write_records(
+            aggregator.consume(
+                iter_parse_xml_range(xml_file, prefix_end, start, end, suffix)
+            )
+        )
+    return {"aggregate": aggregator.to_dict(), "products": products_ref.model_dump()}
+
+
+@celery_app.task
+def task_merge_aggregates(
+    partials: List[Dict[str, Any]], staged_xml: Dict[str, Any]
+) -> tuple:
+    """
+    Сливает частичные агрегаты (по порядку диапазонов) в итоговую сводку
+    и склеивает товары диапазонов в один NDJSON файл.
+    :param partials: Результаты task_parse_chunk
+    :param staged_xml: StagedFile загруженного XML файла
+    :return: tuple того же вида, что и у task_parse_and_analyze_xml
+    """
+    parts = [StagedFile.model_validate(partial["products"]) for partial in partials]
+    try:
+        aggregator = reduce(
+            SalesAggregator.merge,
+            (SalesAggregator.from_dict(partial["aggregate"]) for partial in partials),
+        )
+        summary = aggregator.summary()
+        products_ref = upload_storage.concat(parts)
+    finally:
+        for part in parts:
+            upload_storage.delete(part)
+        upload_storage.delete(StagedFile.model_validate(staged_xml))
+    return summary, products_ref.model_dump()
+
+
+@celery_app.task(bind=True)
+def task_fan_out_analysis(self: Task, staged_xml: Dict[str, Any], chunks: int) -> Any:
+    """
+    Делит товары XML файла на диапазоны байт и заменяет себя на chord:
+    task_parse_chunk по каждому диапазону + task_merge_aggregates.
+    Парсинг, самая дорогая часть обработки, идет параллельно на воркерах
+    стадии parse. Следующие задачи цепочки получат результат
+    task_merge_aggregates.
+    """
+    xml_ref = StagedFile.model_validate(staged_xml)
+    try:
+        with upload_storage.open(xml_ref) as xml_file:
+            prefix_end, suffix, ranges = split_products(
+                xml_file, chunks, settings.celery.analysis_min_chunk_size
+            )
+    except Exception:
+        upload_storage.delete(xml_ref)
+        raise
+    my_logger.debug(f"Parsing {xml_ref.key} in {len(ranges)} chunks")
+    # Если упадет одна из частей, XML и NDJSON остальных частей удалит
+    # task_remove_expired_uploads
+    return self.replace(
+        chord(
+            [
+                task_parse_chunk.s(staged_xml, prefix_end, start, end, suffix)
+                for start, end in ranges
+            ],
+            task_merge_aggregates.s(staged_xml),
+        )
+    )
+
+
+@celery_app.task(bind=True)
+def task_generate_report(self: Task, analyze_report: tuple) -> tuple:
     """
     Генерирует prompt и отправляет запрос к LLM на генерацию отчета.
+    Отчет запрашивается потоково: части текста по мере прихода пишутся
+    в поток отчета под id всей цепочки (его клиент получил при загрузке
+    файла) и доступны через GET /api/v1/reports/{task_id}/stream.
     """
-    dict_data_result = analyze_report[1]  # Распаршенный XML контент
+    staged_products = analyze_report[1]  # Ссылка на распаршенный XML контент
     analyze_report = analyze_report[0]
 
+    writer = report_stream.writer(self.request.root_id or self.request.id)
     date, total_revenue, top_products, categories = analyze_report
-    ai_report_result = generate_report_content(
-        date=date,
-        total_revenue=total_revenue,
-        top_products=top_products,
-        categories=categories,
-    )
-    return ai_report_result, dict_data_result
+    try:
+        ai_report_result = generate_report_content(
+            date=date,
+            total_revenue=total_revenue,
+            top_products=top_products,
+            categories=categories,
+            on_chunk=writer.write,
+        )
+    except Exception as e:
+        writer.fail(str(e))
+        # Цепочка дальше не пойдет, товары в БД не попадут
+        upload_storage.delete(StagedFile.model_validate(staged_products))
+        raise
+    writer.close()
+    return ai_report_result, staged_products
+
+
+def _release_upload(checksum: Optional[str]) -> None:
+    """
+    Снимает файл из индекса дубликатов, чтобы повторная загрузка обработала
+    его заново (для backfill: его задача успешна, даже если файл не обработан).
+    :param checksum: sha256 загруженного XML файла.
+    """
+    if checksum is None:
+        return
+    try:
+        run_async(upload_index.release(checksum))
+    except Exception as e:
+        my_logger.warning(f"Failed to release upload {checksum}: {e}")
 
 
 @celery_app.task
-def task_save_result_to_db(data: tuple) -> None:
-    """Сохраняет данные в БД"""
-    ai_report, data_dict = data
-    asyncio.run(
-        OrmQuery.create_new_products_and_report(
-            ai_report=ai_report,
-            data=data_dict,
+def task_save_result_to_db(
+    data: tuple, upload_checksum: Optional[str] = None
+) -> Dict[str, int]:
+    """
+    Сохраняет данные в БД массовой записью.
+    :param upload_checksum: sha256 XML файла backfill: при ошибке файл
+        снимается из индекса дубликатов.
+    :return: dict(report_id, products) - id отчета и количество записанных товаров
+    """
+    ai_report, staged_products = data
+    products_ref = StagedFile.model_validate(staged_products)
+    try:
+        return run_async(
+            OrmQuery.bulk_create_products_and_report(
+                ai_report=ai_report,
+                data=upload_storage.read_records(products_ref),
+            )
         )
-    )
+    except Exception:
+        _release_upload(upload_checksum)
+        raise
+    finally:
+        upload_storage.delete(products_ref)
+
+
+def report_pipeline(staged_xml: Dict[str, Any], task_id: str) -> chain:
+    """
+    Цепочка обработки одного файла, которую API отправляет в брокер сразу,
+    без промежуточной задачи. Большие файлы парсятся параллельно:
+    task_fan_out_analysis распределяет диапазоны товаров между воркерами
+    через chord. Остальные парсятся и анализируются одной задачей.
+
+    Цепочка возвращается замороженной: id всех задач известны до отправки
+    и записываются в pipeline_store (см. pipeline_stages).
+
+    :param staged_xml: StagedFile загруженного XML файла
+    :param task_id: id цепочки - id первой задачи: он становится root_id
+        всех задач, под ним пишется поток отчета
+    :return: chain
+    """
+    if StagedFile.model_validate(staged_xml).size >= (
+        settings.celery.parallel_analysis_min_size
+    ):
+        first_task = task_fan_out_analysis.s(
+            staged_xml, settings.celery.analysis_chunks
+        ).set(task_id=task_id)
+    else:
+        first_task = task_parse_and_analyze_xml.s(staged_xml).set(task_id=task_id)
+    pipeline = chain(first_task, task_generate_report.s(), task_save_result_to_db.s())
+    pipeline.freeze()
+    return pipeline
+
+
+def pipeline_stages(pipeline: chain) -> List[Tuple[str, str]]:
+    """
+    :param pipeline: Цепочка из report_pipeline.
+    :return: (id задачи, название стадии) в порядке выполнения.
+        task_merge_aggregates выполняется под id task_fan_out_analysis
+        (тело chord из replace получает id заменяемой задачи).
+    """
+    stages = []
+    for task in pipeline.tasks:
+        stages.append((task.id, task.task.rsplit(".", 1)[-1]))
+        if task.task == task_fan_out_analysis.name:
+            stages.append((task.id, task_merge_aggregates.name.rsplit(".", 1)[-1]))
+    return stages
+
+
+@celery_app.task(bind=True)
+def task_generate_reports_batch(
+    self: Task,
+    analyze_reports: List[Optional[tuple]],
+    upload_checksums: Optional[List[str]] = None,
+) -> Any:
+    """
+    Генерирует отчеты LLM сразу для многих файлов параллельными запросами
+    и заменяет себя на группу task_save_result_to_db: каждый отчет
+    сохраняется вместе с товарами своего файла.
+
+    Файлы, которые не удалось разобрать или для которых не получен отчет,
+    снимаются из индекса дубликатов.
+
+    :param analyze_reports: Результаты task_parse_and_analyze_xml по каждому файлу
+    :param upload_checksums: sha256 XML файлов в том же порядке
+    :return: Результаты task_save_result_to_db
+    """
+    checksums: List[Optional[str]] = [None] * len(analyze_reports)
+    if upload_checksums:
+        checksums = list(upload_checksums)
+    parsed = []
+    for analyze_report, checksum in zip(analyze_reports, checksums):
+        if analyze_report is None:
+            _release_upload(checksum)
+        else:
+            parsed.append((analyze_report, checksum))
+    try:
+        ai_reports = run_async(
+            generate_reports_batch([summary for (summary, _), _ in parsed])
+        )
+    except Exception:
+        for (_, staged_products), checksum in parsed:
+            upload_storage.delete(StagedFile.model_validate(staged_products))
+            _release_upload(checksum)
+        raise
+
+    save_tasks = []
+    for ai_report, ((_, staged_products), checksum) in zip(ai_reports, parsed):
+        if ai_report is None:
+            my_logger.error(f"No report generated for {staged_products['key']}")
+            upload_storage.delete(StagedFile.model_validate(staged_products))
+            _release_upload(checksum)
+            continue
+        save_tasks.append(
+            task_save_result_to_db.s(
+                (ai_report, staged_products), upload_checksum=checksum
+            )
+        )
+
+    if not save_tasks:
+        return []
+    return self.replace(group(save_tasks))
 
 
 @celery_app.task
-def process_full_chain(content: bytes) -> dict:
-    my_logger.debug("Starting process_full_chain")
-    report_chain = chain(
-        task_parse_xml.s(content),
-        task_analyze_data.s(),
-        task_generate_report.s(),
-        task_save_result_to_db.s(),
-    )
-    report_chain.apply_async()
+def process_backfill(staged_xmls: List[Dict[str, Any]]) -> dict:
+    """
+    Обработка истории из многих файлов: файлы парсятся параллельно, затем
+    отчеты LLM генерируются одним пакетом (task_generate_reports_batch).
+    """
+    my_logger.debug(f"Starting process_backfill for {len(staged_xmls)} files")
+    chord(
+        [
+            task_parse_and_analyze_xml.s(staged_xml, skip_errors=True)
+            for staged_xml in staged_xmls
+        ],
+        task_generate_reports_batch.s(
+            upload_checksums=[staged_xml["checksum"] for staged_xml in staged_xmls]
+        ),
+    ).apply_async()
     return {"result": "Success"}
+
+
+@celery_app.task
+def task_maintain_partitions() -> List[str]:
+    """
+    Создает секции products на ближайшие месяцы (по расписанию Celery beat).
+    :return: Имена созданных секций
+    """
+    return run_async(product_partitions.maintain())
+
+
+@celery_app.task
+def task_remove_expired_uploads() -> int:
+    """
+    Удаляет брошенные загрузки частями и staging файлы, которые не удалила
+    цепочка задач (по расписанию Celery beat).
+    :return: Количество удаленных файлов
+    """
+    return chunked_uploads.remove_expired() + upload_storage.remove_expired(
+        settings.staging.staged_file_ttl
+    )
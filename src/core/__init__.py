@@ -2,7 +2,16 @@ __ALL__ = [
     "Base",
     "Product",
     "LLMreport",
+    "DailySalesSummary",
+    "ProductDim",
+    "CategoryDim",
 ]
 
 from src.core.base import Base
-from src.core.models.shop_model import LLMreport, Product
+from src.core.models.shop_model import (
+    CategoryDim,
+    DailySalesSummary,
+    LLMreport,
+    Product,
+    ProductDim,
+)
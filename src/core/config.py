@@ -10,14 +10,127 @@ class OpenAPISettings(BaseSettings):
     openai_api_key: str
     openai_gpt_model: str
 
+    # Таймауты и пул HTTP соединений клиента OpenAI
+    openai_timeout: float = 60.0
+    openai_connect_timeout: float = 5.0
+    openai_max_retries: int = 2
+    openai_max_connections: int = 20
+    openai_max_keepalive_connections: int = 10
+    openai_keepalive_expiry: float = 30.0
+
+    # Пакетная генерация отчетов (backfill)
+    openai_batch_concurrency: int = 8
+    openai_batch_max_attempts: int = 5
+    openai_backoff_base: float = 1.0
+    openai_backoff_max: float = 60.0
+
+
+class LLMCacheSettings(BaseSettings):
+    llm_cache_enabled: bool = True
+    llm_cache_ttl: int = 7 * 24 * 60 * 60
+    llm_cache_max_entries: int = 10_000
+
+
+class ReportStreamSettings(BaseSettings):
+    # Частичные результаты генерации отчета (Redis Stream + SSE)
+    report_stream_ttl: int = 60 * 60
+    report_stream_maxlen: int = 10_000
+    report_stream_flush_interval: float = 0.05
+    # Как долго ждать новых событий до keep-alive и сколько всего держать SSE
+    report_stream_block_ms: int = 15_000
+    report_stream_timeout: float = 10 * 60
+
+
+class ResponseCacheSettings(BaseSettings):
+    # Готовые JSON ответы API по датам, сбрасываются при записи новых данных
+    response_cache_enabled: bool = True
+    response_cache_ttl: int = 24 * 60 * 60
+    # Сколько остальные процессы ждут ответа, который считает другой процесс
+    response_cache_lock_timeout: float = 30.0
+    response_cache_poll_interval: float = 0.05
+    # Кэш первого уровня в памяти каждого процесса API: предел по размеру
+    # ответов и ttl на случай пропущенных событий сброса
+    response_cache_local_max_bytes: int = 64 * 1024 * 1024
+    response_cache_local_ttl: float = 60.0
+    # Как часто счетчики попаданий процесса сбрасываются в общие метрики
+    response_cache_stats_interval: float = 10.0
+
+
+class ApiResponseSettings(BaseSettings):
+    # Быстрый режим ответов: товары читаются кортежами колонок без ORM
+    # объектов и сериализуются orjson вместо проверки через pydantic модели
+    api_fast_json: bool = False
+    # Сжатие больших ответов (brotli или gzip по Accept-Encoding)
+    api_compression: bool = False
+    api_compression_min_size: int = 16 * 1024
+    api_gzip_level: int = 5
+    api_brotli_quality: int = 4
+
 
 class RedisCache(BaseSettings):
     redis_cache: str
+    # Сколько помнить обработанные XML файлы для дедупликации
+    upload_dedup_ttl: int = 30 * 24 * 60 * 60
 
 
 class CeleryConfig(BaseSettings):
     CELERY_BROKER_URL: str
     CELERY_RESULT_BACKEND: str
+    # Сколько хранить результаты задач и записи цепочек (id и время стадий)
+    result_expires: int = 24 * 60 * 60
+
+    # Параллельный парсинг больших файлов (fan-out/fan-in через chord).
+    # benchmarks/parallel_analysis.py: одна задача парсит ~10 МБ/с, при
+    # 4 частях критический путь короче в 3.4 раза; запас порога и размера
+    # части покрывает доставку задач chord брокером
+    parallel_analysis_min_size: int = 32 * 1024 * 1024
+    analysis_chunks: int = 4
+    analysis_min_chunk_size: int = 8 * 1024 * 1024
+
+    # Очереди стадий цепочки: у каждой очереди свой пул воркеров, чтобы
+    # парсинг (CPU), запросы к LLM (ожидание сети) и запись в БД не
+    # занимали слоты друг друга. Оркестрация и задачи beat - в очереди
+    # по умолчанию
+    default_queue: str = "celery"
+    parse_queue: str = "parse"
+    llm_queue: str = "llm"
+    db_queue: str = "db"
+    # Стадия процесса воркера (CELERY_WORKER_STAGE): default, parse, llm
+    # или db - воркер читает только свою очередь и берет пул и concurrency
+    # стадии. Пусто - один воркер на все очереди
+    celery_worker_stage: str = ""
+    default_pool: str = "prefork"
+    default_concurrency: int = 2
+    parse_pool: str = "prefork"
+    parse_concurrency: int = 4
+    # Потоки ждут ответ LLM; не больше openai_max_connections на процесс
+    llm_pool: str = "threads"
+    llm_concurrency: int = 16
+    db_pool: str = "prefork"
+    db_concurrency: int = 2
+
+    # Приоритеты задач в брокере Redis (0 - самый высокий): небольшие
+    # интерактивные загрузки обгоняют пакеты и backfill в тех же очередях
+    interactive_priority: int = 0
+    default_priority: int = 5
+    backfill_priority: int = 9
+
+
+class StagingSettings(BaseSettings):
+    # Общая для API и воркеров директория с загруженными файлами
+    staging_dir: str = "/tmp/xml_staging"
+    staging_chunk_size: int = 1024 * 1024
+    # Загрузка XML частями (init / append / complete): максимальный размер
+    # части и через сколько секунд брошенная загрузка удаляется
+    upload_chunk_size: int = 8 * 1024 * 1024
+    upload_ttl: int = 24 * 60 * 60
+    # Через сколько секунд staging файл, который не удалила цепочка задач,
+    # считается брошенным (больше самого долгого ожидания в очереди)
+    staged_file_ttl: int = 2 * 24 * 60 * 60
+    # Пакетная загрузка (много файлов или архив): сколько XML файлов
+    # и сколько байт после распаковки можно принять за один запрос
+    batch_max_files: int = 500
+    batch_max_size: int = 2 * 1024 * 1024 * 1024
 
 
 class DatabaseConfig(BaseSettings):
@@ -32,6 +145,31 @@ class DatabaseConfig(BaseSettings):
     pool_size: int = 50
     max_overflow: int = 10
 
+    # Массовая запись товаров из XML
+    ingest_batch_size: int = 10_000
+    ingest_use_copy: bool = True
+    # Сколько названий товаров и категорий держать в кэше name -> id процесса
+    dimension_cache_size: int = 1_000_000
+
+    # Выдача товаров: размер страницы и пачки серверного курсора выгрузки
+    products_page_size: int = 1000
+    products_max_page_size: int = 10_000
+    export_batch_size: int = 5000
+    # Колоночная выгрузка (Arrow IPC / Parquet) за диапазон дат
+    export_max_days: int = 366
+    export_parquet_row_group_size: int = 128 * 1024
+    export_compression: str = "zstd"
+
+    # Аналитика по daily_sales_summary: размер топов по умолчанию и максимум
+    analytics_top_limit: int = 10
+    analytics_max_top_limit: int = 100
+
+    # Помесячные секции products: сколько месяцев создавать заранее,
+    # сколько хранить и куда переносить отсоединенные секции
+    partition_premake_months: int = 3
+    partition_retention_months: int = 24
+    partition_archive_schema: str = "archive"
+
     # авто наминг для ключей БД алембик
     naming_convention: dict[str, str] = {
         "ix": "ix_%(column_0_label)s",
@@ -51,7 +189,12 @@ class Settings(BaseModel):
     db: DatabaseConfig = DatabaseConfig()
     celery: CeleryConfig = CeleryConfig()
     openapi: OpenAPISettings = OpenAPISettings()
+    llm_cache: LLMCacheSettings = LLMCacheSettings()
+    report_stream: ReportStreamSettings = ReportStreamSettings()
+    response_cache: ResponseCacheSettings = ResponseCacheSettings()
+    api_response: ApiResponseSettings = ApiResponseSettings()
     cache_url: RedisCache = RedisCache()
+    staging: StagingSettings = StagingSettings()
     logging: str = "DEBUG"
 
 
@@ -1,3 +1,4 @@
+import os
 from typing import AsyncGenerator
 
 from sqlalchemy.ext.asyncio import (
@@ -36,6 +37,13 @@ class DatabaseHelper:
     async def dispose(self) -> None:
         await self.engine.dispose()
 
+    def reset_after_fork(self) -> None:
+        """
+        Отказывается от соединений пула, унаследованных от родителя при fork,
+        не закрывая их: ими продолжает пользоваться родительский процесс.
+        """
+        self.engine.sync_engine.dispose(close=False)
+
     async def session_getter(self) -> AsyncGenerator[AsyncSession, None]:
         async with self.session_factory() as session:
             yield session
@@ -48,3 +56,4 @@ db_helper = DatabaseHelper(
     pool_size=settings.db.pool_size,
     max_overflow=settings.db.max_overflow,
 )
+os.register_at_fork(after_in_child=db_helper.reset_after_fork)
@@ -1,35 +1,98 @@
 import asyncio
-from datetime import datetime
-from typing import List
+from datetime import date, datetime
+from typing import List, Optional
 
-from sqlalchemy import ForeignKey
+from sqlalchemy import DDL, BigInteger, ForeignKey, Index, UniqueConstraint, event
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.sql import SQLColumnExpression
 
 from src.core.base import Base
 from src.core.db_helper import db_helper
 
+# Внутри модели с колонкой date имя date занято самой колонкой
+SalesDate = date
+
 
 class Product(Base):
     __tablename__ = "products"
+    # Помесячные секции, см. src/core/utils/partitions.py
+    __table_args__ = (
+        # Товары за день по порядку id (keyset пагинация)
+        Index("ix_products_date_id", "date", "id"),
+        {"postgresql_partition_by": "RANGE (date)"},
+    )
 
-    id: Mapped[int] = mapped_column(primary_key=True)
-    report_id: Mapped[int] = mapped_column(ForeignKey("llm_report.id"))
-    name: Mapped[str] = mapped_column()
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    report_id: Mapped[int] = mapped_column(ForeignKey("llm_report.id"), index=True)
+    # Названия товара и категории хранятся один раз в справочниках,
+    # в строке товара - только их id
+    product_id: Mapped[int] = mapped_column(ForeignKey("product_dim.id"))
     quantity: Mapped[int] = mapped_column()
     price: Mapped[float] = mapped_column()
-    category: Mapped[str] = mapped_column()
-    date: Mapped[datetime] = mapped_column()
+    category_id: Mapped[int] = mapped_column(ForeignKey("category_dim.id"))
+    # Ключ секционирования должен входить в первичный ключ
+    date: Mapped[datetime] = mapped_column(primary_key=True)
 
     llm_report: Mapped["LLMreport"] = relationship(back_populates="product")
+    # Названия загружаются вместе с товаром (JOIN по первичному ключу)
+    product_dim: Mapped["ProductDim"] = relationship(lazy="joined", innerjoin=True)
+    category_dim: Mapped["CategoryDim"] = relationship(lazy="joined", innerjoin=True)
+
+    @hybrid_property
+    def name(self) -> str:
+        return self.product_dim.name
+
+    @name.inplace.expression
+    @classmethod
+    def _name_expression(cls) -> SQLColumnExpression[str]:
+        # В запросах по колонкам нужен JOIN product_dim
+        return ProductDim.name
+
+    @hybrid_property
+    def category(self) -> str:
+        return self.category_dim.name
+
+    @category.inplace.expression
+    @classmethod
+    def _category_expression(cls) -> SQLColumnExpression[str]:
+        # В запросах по колонкам нужен JOIN category_dim
+        return CategoryDim.name
+
+    def __repr__(self) -> str:
+        return f"<Product(product_id={self.product_id}, quantity={self.quantity}, price={self.price})>"
+
+
+class ProductDim(Base):
+    """Справочник названий товаров: название -> целочисленный id."""
+
+    __tablename__ = "product_dim"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(unique=True)
+
+    def __repr__(self) -> str:
+        return f"<ProductDim(id={self.id}, name={self.name})>"
+
+
+class CategoryDim(Base):
+    """Справочник названий категорий: название -> целочисленный id."""
+
+    __tablename__ = "category_dim"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(unique=True)
 
     def __repr__(self) -> str:
-        return f"<Product(product_name={self.name}, quantity={self.quantity}, price={self.price})>"
+        return f"<CategoryDim(id={self.id}, name={self.name})>"
 
 
 class LLMreport(Base):
     __tablename__ = "llm_report"
     id: Mapped[int] = mapped_column(primary_key=True)
     ai_report: Mapped[str] = mapped_column()
+    # Дата продаж, по которым составлен отчет
+    report_date: Mapped[Optional[date]] = mapped_column(index=True)
 
     product: Mapped[List["Product"]] = relationship(back_populates="llm_report")
 
@@ -37,6 +100,46 @@ class LLMreport(Base):
         return f"<LLMreport(ai_report={self.ai_report}>"
 
 
+class DailySalesSummary(Base):
+    """
+    Предрасчитанные итоги продаж (level): за день целиком, по категориям
+    и товарам за день, а также по категориям и товарам за месяц (date -
+    первое число месяца). Для уровня дня category и product пустые, для
+    уровней категорий пустой product. Заполняется при записи товаров,
+    аналитика по диапазонам дат читает только эту таблицу: полные месяцы
+    диапазона берутся из месячных строк, дни на краях - из дневных.
+    """
+
+    __tablename__ = "daily_sales_summary"
+    # Уникальный ключ - он же индекс для выборок уровня за диапазон дат
+    __table_args__ = (UniqueConstraint("level", "date", "category", "product"),)
+
+    DAY = "day"
+    CATEGORY = "category"
+    PRODUCT = "product"
+    CATEGORY_MONTH = "category_month"
+    PRODUCT_MONTH = "product_month"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    level: Mapped[str] = mapped_column()
+    date: Mapped[SalesDate] = mapped_column()
+    category: Mapped[str] = mapped_column(server_default="")
+    product: Mapped[str] = mapped_column(server_default="")
+    quantity: Mapped[int] = mapped_column(BigInteger)
+    revenue: Mapped[float] = mapped_column()
+
+    def __repr__(self) -> str:
+        return f"<DailySalesSummary(level={self.level}, date={self.date}, category={self.category}, product={self.product})>"
+
+
+# Секция по умолчанию принимает строки, для которых месячной секции еще нет
+event.listen(
+    Product.__table__,
+    "after_create",
+    DDL("CREATE TABLE products_default PARTITION OF products DEFAULT"),
+)
+
+
 async def create_tables() -> None:
     async with db_helper.engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
@@ -1,4 +1,5 @@
-from datetime import datetime
+from datetime import date, datetime
+from typing import List, Optional
 
 from pydantic import BaseModel, ConfigDict
 
@@ -21,6 +22,84 @@ class ProductResponse(ProductBase):
     id: int
 
 
+class ProductPage(BaseModel):
+    items: List[ProductResponse]
+    # Передается как after_id для следующей страницы, None - страниц больше нет
+    next_after_id: Optional[int] = None
+
+
 class ParseEndpointResponse(BaseModel):
     result: str
     task_id: str
+    duplicate: bool = False
+
+
+class UploadStatus(BaseModel):
+    upload_id: str
+    # Сколько байт уже принято: следующая часть отправляется с этим offset
+    offset: int
+    # Максимальный размер одной части
+    chunk_size: int
+
+
+class BackfillEndpointResponse(BaseModel):
+    result: str
+    task_id: str
+    files: int
+    duplicates: int
+
+
+class BatchFile(BaseModel):
+    # Имя файла в запросе или в архиве
+    name: str
+    # id задачи: по нему читается поток отчета (/reports/{task_id}/stream)
+    task_id: str
+    duplicate: bool = False
+
+
+class BatchEndpointResponse(BaseModel):
+    result: str
+    batch_id: str
+    files: List[BatchFile]
+    duplicates: int
+
+
+class BatchFileStatus(BaseModel):
+    task_id: str
+    status: str
+    result: Optional[str] = None
+
+
+class BatchStatus(BaseModel):
+    batch_id: str
+    # PROGRESS, пока не завершены все файлы, затем SUCCESS или FAILURE
+    # (если хотя бы один файл упал)
+    status: str
+    total: int
+    completed: int
+    failed: int
+    files: List[BatchFileStatus]
+
+
+class DailyRevenue(BaseModel):
+    date: date
+    quantity: int
+    revenue: float
+
+
+class RevenueResponse(BaseModel):
+    date_from: date
+    date_to: date
+    quantity: int
+    revenue: float
+    days: List[DailyRevenue]
+
+
+class TopCategory(BaseModel):
+    category: str
+    quantity: int
+    revenue: float
+
+
+class TopProduct(TopCategory):
+    product: str
@@ -0,0 +1,190 @@
+import gzip
+import io
+import posixpath
+import tarfile
+import zipfile
+from typing import Any, BinaryIO, Iterator, List, Tuple
+
+import zstandard
+from fastapi import HTTPException
+
+from src.core.utils.staging import StagedFile, UploadStorage
+
+ZIP_MAGIC = b"PK\x03\x04"
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+# Признак tar архива (формат ustar) внутри первого блока
+TAR_MAGIC = b"ustar"
+TAR_MAGIC_OFFSET = 257
+TAR_BLOCK_SIZE = 512
+
+
+class BatchBudget:
+    """
+    Ограничения одного пакета файлов: количество XML файлов и их суммарный
+    размер после распаковки. Проверяются по мере чтения, поэтому архив,
+    который распаковывается в гигабайты (zip-бомба), обрывается на лимите.
+    """
+
+    def __init__(self, max_files: int, max_size: int) -> None:
+        self.max_files = max_files
+        self.max_size = max_size
+        self.files = 0
+        self.size = 0
+
+    def add_file(self) -> None:
+        self.files += 1
+        if self.files > self.max_files:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Batch must not contain more than {self.max_files} files",
+            )
+
+    def add_bytes(self, size: int) -> None:
+        self.size += size
+        if self.size > self.max_size:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Batch exceeds {self.max_size} bytes after decompression",
+            )
+
+
+class _LimitedReader:
+    """Файловый объект, который учитывает прочитанные байты в BatchBudget."""
+
+    def __init__(self, stream: Any, budget: BatchBudget) -> None:
+        self._stream = stream
+        self._budget = budget
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        self._budget.add_bytes(len(data))
+        return data
+
+
+class _PrefixedReader(io.RawIOBase):
+    """Поток, из начала которого уже прочитаны head байт."""
+
+    def __init__(self, head: bytes, stream: Any) -> None:
+        self._head = head
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        size = len(buffer)
+        if self._head:
+            chunk, self._head = self._head[:size], self._head[size:]
+        else:
+            chunk = self._stream.read(size)
+        buffer[: len(chunk)] = chunk
+        return len(chunk)
+
+
+def _is_xml_member(name: str) -> bool:
+    # Служебные файлы архиваторов (__MACOSX/, ._name) пропускаются
+    basename = posixpath.basename(name)
+    return (
+        name.lower().endswith(".xml")
+        and not basename.startswith(".")
+        and "__MACOSX/" not in name
+    )
+
+
+def _strip_suffix(filename: str, suffixes: Tuple[str, ...]) -> str:
+    for suffix in suffixes:
+        if filename.lower().endswith(suffix):
+            stem_size = len(filename) - len(suffix)
+            return filename[:stem_size]
+    return filename
+
+
+def _iter_compressed(
+    stream: Any, filename: str, budget: BatchBudget
+) -> Iterator[Tuple[str, Any]]:
+    # Сжатый поток - это либо tar архив (.tar.gz, .tar.zst), либо один XML
+    head = b""
+    while len(head) < TAR_BLOCK_SIZE:
+        chunk = stream.read(TAR_BLOCK_SIZE - len(head))
+        if not chunk:
+            break
+        head += chunk
+    source = io.BufferedReader(_PrefixedReader(head, stream))
+    magic_end = TAR_MAGIC_OFFSET + len(TAR_MAGIC)
+    if head[TAR_MAGIC_OFFSET:magic_end] != TAR_MAGIC:
+        budget.add_file()
+        name = _strip_suffix(filename, (".gz", ".gzip", ".zst", ".zstd"))
+        yield name, _LimitedReader(source, budget)
+        return
+    # Режим "r|" читает tar последовательно, без seek по распакованному потоку
+    with tarfile.open(fileobj=source, mode="r|") as tar:
+        for member in tar:
+            if not member.isfile() or not _is_xml_member(member.name):
+                continue
+            budget.add_file()
+            yield member.name, _LimitedReader(tar.extractfile(member), budget)
+
+
+def iter_xml_files(
+    source: BinaryIO, filename: str, budget: BatchBudget
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Перебирает XML файлы из загруженного файла без распаковки на диск.
+
+    Формат определяется по первым байтам: zip, gzip или zstd (внутри сжатого
+    потока может быть tar архив или один XML файл), иначе файл считается
+    XML. Каждый файл читается потоково и должен быть прочитан до перехода
+    к следующему.
+
+    :param source: Загруженный файл (UploadFile.file), с поддержкой seek.
+    :param filename: Имя загруженного файла.
+    :param budget: Ограничения пакета.
+    :return: Пары (имя файла, файловый объект с методом read).
+    """
+    magic = source.read(len(ZSTD_MAGIC))
+    source.seek(0)
+    if magic.startswith(ZIP_MAGIC):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not _is_xml_member(info.filename):
+                    continue
+                budget.add_file()
+                with archive.open(info) as member:
+                    yield info.filename, _LimitedReader(member, budget)
+    elif magic.startswith(GZIP_MAGIC):
+        with gzip.GzipFile(fileobj=source, mode="rb") as stream:
+            yield from _iter_compressed(stream, filename, budget)
+    elif magic.startswith(ZSTD_MAGIC):
+        # Сжатый поток может состоять из нескольких zstd кадров (zstd -c a b)
+        with zstandard.ZstdDecompressor().stream_reader(
+            source, read_across_frames=True, closefd=False
+        ) as stream:
+            yield from _iter_compressed(stream, filename, budget)
+    else:
+        budget.add_file()
+        yield filename, _LimitedReader(source, budget)
+
+
+def stage_xml_files(
+    storage: UploadStorage, source: BinaryIO, filename: str, budget: BatchBudget
+) -> List[Tuple[str, StagedFile]]:
+    """
+    Сохраняет в staging хранилище все XML файлы загруженного файла или архива.
+    При ошибке уже сохраненные файлы удаляются.
+
+    :param storage: Staging хранилище.
+    :param source: Загруженный файл или архив.
+    :param filename: Имя загруженного файла.
+    :param budget: Ограничения пакета.
+    :return: Пары (имя файла, StagedFile).
+    """
+    staged: List[Tuple[str, StagedFile]] = []
+    try:
+        for name, stream in iter_xml_files(source, filename, budget):
+            staged.append((name, storage.stage(stream)))
+    except BaseException:
+        for _, staged_xml in staged:
+            storage.delete(staged_xml)
+        raise
+    return staged
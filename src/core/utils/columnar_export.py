@@ -0,0 +1,178 @@
+from typing import Any, AsyncIterator, List, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from src.core.config import settings
+from src.core.utils.product_export import PRODUCT_EXPORT_COLUMNS
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+COLUMNAR_MEDIA_TYPES = {
+    "arrow": ARROW_MEDIA_TYPE,
+    "parquet": PARQUET_MEDIA_TYPE,
+}
+# Accept -> формат выгрузки, включая устаревшие имена типов
+_ACCEPTED_TYPES = {
+    ARROW_MEDIA_TYPE: "arrow",
+    "application/vnd.apache.arrow.file": "arrow",
+    PARQUET_MEDIA_TYPE: "parquet",
+    "application/x-parquet": "parquet",
+}
+COLUMNAR_EXTENSIONS = {"arrow": "arrows", "parquet": "parquet"}
+
+# Схема в порядке PRODUCT_EXPORT_COLUMNS
+PRODUCT_ARROW_SCHEMA = pa.schema(
+    [
+        pa.field("id", pa.int64(), nullable=False),
+        pa.field("name", pa.string(), nullable=False),
+        pa.field("quantity", pa.int64(), nullable=False),
+        pa.field("price", pa.float64(), nullable=False),
+        pa.field("category", pa.string(), nullable=False),
+        pa.field("date", pa.timestamp("us"), nullable=False),
+    ]
+)
+
+
+def choose_columnar_format(accept: Optional[str]) -> Optional[str]:
+    """
+    Выбирает формат выгрузки по заголовку Accept.
+
+    Без заголовка и для */* отдается Arrow IPC stream. Типы с q=0
+    клиент не принимает, из подходящих берется тип с большим q.
+
+    :param accept: Заголовок Accept запроса.
+    :return: arrow, parquet или None, если подходящего формата нет.
+    """
+    if not accept:
+        return "arrow"
+    best_format, best_quality = None, 0.0
+    for item in accept.split(","):
+        media_type, *params = item.split(";")
+        media_type = media_type.strip().lower()
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        export_format: Optional[str]
+        if media_type in ("*/*", "application/*"):
+            export_format = "arrow"
+        else:
+            export_format = _ACCEPTED_TYPES.get(media_type)
+        if quality <= 0 or export_format is None:
+            continue
+        # При равном q явно названный тип важнее */*
+        if (
+            quality > best_quality
+            or quality == best_quality
+            and media_type in _ACCEPTED_TYPES
+        ):
+            best_format, best_quality = export_format, quality
+    return best_format
+
+
+def rows_to_record_batch(rows: Sequence[Sequence[Any]]) -> pa.RecordBatch:
+    """Пачка строк в порядке PRODUCT_EXPORT_COLUMNS в RecordBatch."""
+    columns = list(zip(*rows)) or [()] * len(PRODUCT_EXPORT_COLUMNS)
+    return pa.RecordBatch.from_arrays(
+        [
+            pa.array(values, type=field.type)
+            for values, field in zip(columns, PRODUCT_ARROW_SCHEMA)
+        ],
+        schema=PRODUCT_ARROW_SCHEMA,
+    )
+
+
+class _ChunkSink:
+    """
+    Файлоподобный приемник для писателей pyarrow: записанные байты
+    копятся в списке и забираются drain() после каждой пачки.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data: Any) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        body = b"".join(self._chunks)
+        self._chunks.clear()
+        return body
+
+
+async def encode_columnar(
+    batches: AsyncIterator[Sequence[Sequence[Any]]], export_format: str
+) -> AsyncIterator[bytes]:
+    """
+    Кодирует пачки строк в Arrow IPC stream или Parquet по мере чтения из БД.
+
+    Arrow пишет каждую пачку отдельным record batch. Parquet копит строки
+    до export_parquet_row_group_size и пишет их одной группой строк,
+    поэтому в памяти держится не больше одной группы.
+
+    :param batches: Пачки строк в порядке PRODUCT_EXPORT_COLUMNS.
+    :param export_format: arrow или parquet.
+    :return: Части тела ответа.
+    """
+    options = settings.db
+    sink = _ChunkSink()
+    stream = pa.PythonFile(sink, mode="w")
+    if export_format == "parquet":
+        writer = pq.ParquetWriter(
+            stream, PRODUCT_ARROW_SCHEMA, compression=options.export_compression
+        )
+    else:
+        writer = ipc.new_stream(
+            stream,
+            PRODUCT_ARROW_SCHEMA,
+            options=ipc.IpcWriteOptions(compression=options.export_compression),
+        )
+
+    pending: List[pa.RecordBatch] = []
+    pending_rows = 0
+    try:
+        async for batch in batches:
+            record_batch = rows_to_record_batch(batch)
+            if export_format == "parquet":
+                pending.append(record_batch)
+                pending_rows += record_batch.num_rows
+                if pending_rows < options.export_parquet_row_group_size:
+                    continue
+                writer.write_table(
+                    pa.Table.from_batches(pending),
+                    row_group_size=pending_rows,
+                )
+                pending, pending_rows = [], 0
+            else:
+                writer.write_batch(record_batch)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+        if pending:
+            writer.write_table(
+                pa.Table.from_batches(pending), row_group_size=pending_rows
+            )
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -1,9 +1,204 @@
-from typing import Any, Dict, List, Tuple
+import heapq
+import math
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from src.core.utils.logging_config import my_logger
 
 
-def analyze_data(sales_data: List[Dict[str, Any]]) -> Tuple[str, int, str, str]:
+def _add_exact(partials: List[float], value: float) -> None:
+    """
+    Добавляет число к сумме, которая хранится как список частичных сумм
+    без потери точности (алгоритм Шевчука, как в math.fsum).
+    """
+    i = 0
+    for partial in partials:
+        if abs(value) < abs(partial):
+            value, partial = partial, value
+        high = value + partial
+        low = partial - (high - value)
+        if low:
+            partials[i] = low
+            i += 1
+        value = high
+    partials[i:] = [value]
+
+
+class SalesAggregator:
+    """
+    Онлайн-агрегатор данных о продажах.
+
+    Принимает продажи по одной и хранит только накопленные суммы, поэтому
+    анализ заканчивается одновременно с парсингом, без второго прохода
+    и без полного списка товаров в памяти.
+
+    Выручка копится без округления (как в math.fsum), поэтому итог не
+    зависит от порядка продаж и от того, на какие части разбит файл.
+
+    Топ товаров обновляется с каждой продажей в куче из top_n элементов
+    (количество, -номер первого появления, название): при равном количестве
+    выше товар, встреченный раньше, как в sorted(...)[:top_n].
+
+    Векторизованного анализа по колонкам (NumPy/Arrow) здесь нет намеренно:
+    продажи приходят из потокового парсера по одной, колонок файла целиком
+    нет ни на одном шаге, а сборка их ради анализа - второй проход по данным.
+    Векторная сумма выручки к тому же зависит от порядка сложения.
+    """
+
+    def __init__(self, top_n: int = 3) -> None:
+        self.top_n = top_n
+        self.date: Optional[str] = None
+        self.revenue_partials: List[float] = []
+        self.product_sales: Dict[str, int] = {}
+        self.category_distribution: Dict[str, int] = {}
+        self._first_seen: Dict[str, int] = {}
+        # Куча с минимумом в начале: self._top[0] - первый кандидат на вытеснение
+        self._top: List[Tuple[int, int, str]] = []
+
+    def add(self, sale: Dict[str, Any]) -> None:
+        """
+        Учитывает одну продажу.
+        :param sale: Словарь с ключами "name", "quantity", "price", "category", "date".
+        """
+        if self.date is None:
+            self.date = sale["date"]
+
+        _add_exact(self.revenue_partials, sale["quantity"] * sale["price"])
+
+        name = sale["name"]
+        if name not in self._first_seen:
+            self._first_seen[name] = len(self._first_seen)
+        self.product_sales[name] = self.product_sales.get(name, 0) + sale["quantity"]
+        self._update_top(name)
+
+        category = sale["category"]
+        self.category_distribution[category] = (
+            self.category_distribution.get(category, 0) + sale["quantity"]
+        )
+
+    def update(self, sales_data: Iterable[Dict[str, Any]]) -> None:
+        for sale in sales_data:
+            self.add(sale)
+
+    def consume(self, sales_data: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Учитывает продажи и отдает их дальше без изменений.
+        Позволяет считать сводку на лету, пока данные пишутся в другое место.
+        :param sales_data: Итератор словарей с данными о продажах.
+        :return: Iterator[Dict[str, Any]]
+        """
+        for sale in sales_data:
+            self.add(sale)
+            yield sale
+
+    def merge(self, other: "SalesAggregator") -> "SalesAggregator":
+        """
+        Добавляет к агрегату частичный результат другого агрегата.
+
+        Операция ассоциативна: при слиянии частей файла по порядку результат
+        совпадает с последовательной обработкой всего файла (выручка -
+        при любом порядке слияния).
+        :param other: Агрегат следующей части данных.
+        :return: self
+        """
+        if self.date is None:
+            self.date = other.date
+
+        for partial in other.revenue_partials:
+            _add_exact(self.revenue_partials, partial)
+
+        for name, quantity in other.product_sales.items():
+            if name not in self._first_seen:
+                self._first_seen[name] = len(self._first_seen)
+            self.product_sales[name] = self.product_sales.get(name, 0) + quantity
+        self._rebuild_top()
+
+        for category, quantity in other.category_distribution.items():
+            self.category_distribution[category] = (
+                self.category_distribution.get(category, 0) + quantity
+            )
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Сериализует агрегат для передачи между задачами Celery."""
+        return {
+            "top_n": self.top_n,
+            "date": self.date,
+            "revenue_partials": self.revenue_partials,
+            "product_sales": self.product_sales,
+            "category_distribution": self.category_distribution,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SalesAggregator":
+        aggregator = cls(top_n=data["top_n"])
+        aggregator.date = data["date"]
+        aggregator.revenue_partials = list(data["revenue_partials"])
+        aggregator.product_sales = dict(data["product_sales"])
+        aggregator.category_distribution = dict(data["category_distribution"])
+        # Порядок товаров в словаре - порядок их первого появления
+        aggregator._first_seen = {
+            name: index for index, name in enumerate(aggregator.product_sales)
+        }
+        aggregator._rebuild_top()
+        return aggregator
+
+    def _top_entry(self, name: str) -> Tuple[int, int, str]:
+        return self.product_sales[name], -self._first_seen[name], name
+
+    def _update_top(self, name: str) -> None:
+        if self.top_n <= 0:
+            return
+        entry = self._top_entry(name)
+        for index, (quantity, _, top_name) in enumerate(self._top):
+            if top_name == name:
+                if entry[0] < quantity:
+                    # Количество уменьшилось (возврат): товар мог выпасть из топа
+                    self._rebuild_top()
+                else:
+                    self._top[index] = entry
+                    heapq.heapify(self._top)
+                return
+        if len(self._top) < self.top_n:
+            heapq.heappush(self._top, entry)
+        elif entry > self._top[0]:
+            heapq.heapreplace(self._top, entry)
+
+    def _rebuild_top(self) -> None:
+        self._top = heapq.nlargest(
+            max(self.top_n, 0), map(self._top_entry, self.product_sales)
+        )
+        heapq.heapify(self._top)
+
+    @property
+    def total_revenue(self) -> float:
+        # Точная сумма, округленная один раз
+        return math.fsum(self.revenue_partials)
+
+    def top_products(self) -> List[Tuple[str, int]]:
+        return [
+            (name, quantity) for quantity, _, name in sorted(self._top, reverse=True)
+        ]
+
+    def summary(self) -> Tuple[str, float, str, str]:
+        """
+        Формирует сводку по накопленным данным.
+        :return: Кортеж того же вида, что и у analyze_data.
+        """
+        if self.date is None:
+            my_logger.info("Data is empty.")
+            raise ValueError("Data is empty.")
+
+        # Формирование строк для промпта
+        top_products_str = ", ".join(
+            [f"{name} ({quantity})" for name, quantity in self.top_products()]
+        )
+        categories_str = ", ".join(
+            [f"{cat}: {qty}" for cat, qty in self.category_distribution.items()]
+        )
+        return self.date, self.total_revenue, top_products_str, categories_str
+
+
+def analyze_data(sales_data: List[Dict[str, Any]]) -> Tuple[str, float, str, str]:
     """
     Анализирует данные о продажах и возвращает сводку, включающую общую выручку,
     топовые продукты и категории.
@@ -13,44 +208,17 @@ def analyze_data(sales_data: List[Dict[str, Any]]) -> Tuple[str, int, str, str]:
                        "name", "quantity", "price", "category", и "date".
     :return: Кортеж, содержащий:
          - дату первой записи из данных (str)
-         - общую выручку (int)
+         - общую выручку (float): точную сумму, округленную один раз (как
+           math.fsum); сложение по порядку может отличаться от нее в последних
+           знаках
          - строку с топ-3 продуктами и их количеством (str)
          - строку с распределением по категориям и количеству продаж (str).
     """
     my_logger.debug("Task analyzing data started")
 
-    if not sales_data:
-        my_logger.info("Data is empty.")
-        raise ValueError("Data is empty.")
-
-    date: str = sales_data[0]["date"]
-    total_revenue: int = 0
-    product_sales: Dict[str, int] = {}
-    category_distribution: Dict[str, int] = {}
-
-    for sale in sales_data:
-        total_revenue += sale["quantity"] * sale["price"]
-
-        if sale["name"] in product_sales:
-            product_sales[sale["name"]] += sale["quantity"]
-        else:
-            product_sales[sale["name"]] = sale["quantity"]
-
-        if sale["category"] in category_distribution:
-            category_distribution[sale["category"]] += sale["quantity"]
-        else:
-            category_distribution[sale["category"]] = sale["quantity"]
-
-    # Определение топ-3 продуктов по продажам
-    top_products = sorted(product_sales.items(), key=lambda x: x[1], reverse=True)[:3]
-
-    # Формирование строк для промпта
-    top_products_str = ", ".join(
-        [f"{name} ({quantity})" for name, quantity in top_products]
-    )
-    categories_str = ", ".join(
-        [f"{cat}: {qty}" for cat, qty in category_distribution.items()]
-    )
+    aggregator = SalesAggregator()
+    aggregator.update(sales_data)
+    result = aggregator.summary()
 
     my_logger.info("Analyzing sales data successfully.")
-    return date, total_revenue, top_products_str, categories_str
+    return result
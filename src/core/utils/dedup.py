@@ -0,0 +1,62 @@
+from typing import Optional
+
+import redis.asyncio as aioredis
+
+from src.core.config import settings
+
+
+class UploadIndex:
+    """
+    Индекс обработанных XML файлов: sha256 содержимого -> id задачи Celery.
+
+    Позволяет не запускать повторно всю цепочку (вместе с платным запросом
+    к LLM), когда тот же файл присылают еще раз.
+    """
+
+    prefix = "xml-upload:"
+
+    def __init__(self, url: str, ttl: int) -> None:
+        self.url = url
+        self.ttl = ttl
+        self._client: Optional[aioredis.Redis] = None
+
+    @property
+    def client(self) -> aioredis.Redis:
+        if self._client is None:
+            self._client = aioredis.from_url(self.url, decode_responses=True)
+        return self._client
+
+    def _key(self, checksum: str) -> str:
+        return f"{self.prefix}{checksum}"
+
+    async def get(self, checksum: str) -> Optional[str]:
+        """
+        :param checksum: sha256 загруженного файла.
+        :return: id задачи, которая уже обрабатывает этот файл, или None.
+        """
+        return await self.client.get(self._key(checksum))
+
+    async def claim(self, checksum: str, task_id: str) -> Optional[str]:
+        """
+        Атомарно закрепляет файл за задачей.
+        :param checksum: sha256 загруженного файла.
+        :param task_id: id новой задачи.
+        :return: None, если файл закреплен за task_id, иначе id уже существующей задачи.
+        """
+        key = self._key(checksum)
+        if await self.client.set(key, task_id, nx=True, ex=self.ttl):
+            return None
+        return await self.client.get(key)
+
+    async def replace(self, checksum: str, task_id: str) -> None:
+        """Перезакрепляет файл за новой задачей (например, если прошлая упала)."""
+        await self.client.set(self._key(checksum), task_id, ex=self.ttl)
+
+    async def release(self, checksum: str) -> None:
+        await self.client.delete(self._key(checksum))
+
+
+upload_index = UploadIndex(
+    url=settings.cache_url.redis_cache,
+    ttl=settings.cache_url.upload_dedup_ttl,
+)
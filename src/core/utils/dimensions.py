@@ -0,0 +1,76 @@
+from typing import Dict, Iterable, Type
+
+from sqlalchemy import text
+
+from src.core.base import Base
+from src.core.config import settings
+from src.core.db_helper import db_helper
+from src.core.models.shop_model import CategoryDim, ProductDim
+from src.core.utils.logging_config import my_logger
+
+
+class DimensionIds:
+    """
+    Кэш процесса name -> id для справочника названий (product_dim,
+    category_dim).
+
+    Новые названия добавляются в справочник отдельной короткой транзакцией
+    до записи товаров: id в кэше всегда уже закоммичены, даже если запись
+    товаров потом откатится. Строки справочников не удаляются, поэтому
+    кэш не устаревает; при переполнении в нем остаются только названия
+    последней пачки.
+    """
+
+    def __init__(self, model: Type[Base], max_size: int) -> None:
+        table = model.__tablename__
+        self.max_size = max_size
+        self._ids: Dict[str, int] = {}
+        # Сортировка новых названий - одинаковый порядок блокировок
+        # у воркеров, добавляющих одни и те же названия одновременно
+        self._insert = text(
+            f"INSERT INTO {table} (name) "
+            "SELECT name FROM unnest(CAST(:names AS text[])) AS name "
+            "ORDER BY name ON CONFLICT (name) DO NOTHING"
+        )
+        self._select = text(
+            f"SELECT name, id FROM {table} " "WHERE name = ANY(CAST(:names AS text[]))"
+        )
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    async def resolve(self, names: Iterable[str]) -> Dict[str, int]:
+        """
+        Возвращает id для всех названий, добавляя новые в справочник.
+        Обычно (все названия уже в кэше) это не запрос к БД.
+
+        :param names: Названия (могут повторяться).
+        :return: Новый словарь name -> id только с этими названиями; кэш
+            процесса наружу не отдается и может меняться, пока словарь
+            используется.
+        """
+        wanted = set(names)
+        ids = {name: self._ids[name] for name in wanted if name in self._ids}
+        missing = wanted.difference(ids)
+        if not missing:
+            return ids
+
+        params = {"names": sorted(missing)}
+        async with db_helper.engine.begin() as conn:
+            await conn.execute(self._insert, params)
+            # Отдельный запрос видит и строки, добавленные другими воркерами
+            result = await conn.execute(self._select, params)
+            for name, dim_id in result.all():
+                ids[name] = dim_id
+
+        if len(self._ids) + len(missing) > self.max_size:
+            my_logger.debug(f"Dimension cache is full, clearing {len(self._ids)}")
+            # В кэше остаются только названия этой пачки
+            self._ids = dict(ids)
+        else:
+            self._ids.update(ids)
+        return ids
+
+
+product_dim_ids = DimensionIds(ProductDim, settings.db.dimension_cache_size)
+category_dim_ids = DimensionIds(CategoryDim, settings.db.dimension_cache_size)
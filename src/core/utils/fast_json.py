@@ -0,0 +1,94 @@
+import gzip
+from typing import Any, Dict, List, Optional, Sequence
+
+import brotli
+from fastapi.responses import Response
+
+from src.core.config import settings
+from src.core.utils.response_cache import Loader, response_cache
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+def rows_to_dicts(
+    columns: Sequence[str], rows: Sequence[Sequence[Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Строки БД (Row или кортежи) в словари для orjson без pydantic моделей.
+    datetime и date orjson пишет в ISO формате, как и pydantic.
+    """
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Выбирает сжатие по заголовку Accept-Encoding: br, затем gzip.
+    Кодировки с q=0 клиент не принимает.
+    """
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for item in accept_encoding.split(","):
+        name, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(name.strip().lower())
+    if "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.api_response.api_brotli_quality)
+    return gzip.compress(body, compresslevel=settings.api_response.api_gzip_level)
+
+
+async def cached_json_response(
+    scope: str,
+    key: str,
+    loader: Loader,
+    accept_encoding: Optional[str] = None,
+) -> Response:
+    """
+    JSON ответ из кэша ответов (response_cache).
+
+    Большие ответы при api_compression сжимаются, сжатый вариант кэшируется
+    отдельной записью, так что при попаданиях сжатие не повторяется.
+
+    :param scope: Область кэша (дата ответа или ANALYTICS_SCOPE).
+    :param key: Ключ ответа внутри области.
+    :param loader: Считает JSON тело ответа при промахе.
+    :param accept_encoding: Заголовок Accept-Encoding запроса.
+    :return: Готовый ответ.
+    """
+    body = await response_cache.get_or_load(scope, key, loader)
+    options = settings.api_response
+    if not options.api_compression:
+        return Response(body, media_type=JSON_MEDIA_TYPE)
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None or len(body) < options.api_compression_min_size:
+        return Response(
+            body, media_type=JSON_MEDIA_TYPE, headers={"Vary": "Accept-Encoding"}
+        )
+
+    async def load_compressed() -> bytes:
+        return compress(body, encoding)
+
+    compressed = await response_cache.get_or_load(
+        scope, f"{key}:{encoding}", load_compressed
+    )
+    return Response(
+        compressed,
+        media_type=JSON_MEDIA_TYPE,
+        headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+    )
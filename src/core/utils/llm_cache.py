@@ -0,0 +1,104 @@
+import hashlib
+import time
+from typing import Optional
+
+import redis
+
+from src.core.config import settings
+from src.core.utils.logging_config import my_logger
+from src.core.utils.metrics import metrics
+
+
+class LLMCache:
+    """
+    Кэш ответов LLM в Redis по хэшу prompt + модели.
+
+    Записи живут ttl секунд с последнего обращения, а при превышении
+    max_entries вытесняются те, к которым дольше всего не обращались (время
+    обращения хранится в sorted set). Срок жизни ключа и его время в sorted set
+    обновляются вместе, поэтому истекшие ключи вычищаются из индекса по времени.
+    Ошибки Redis не прерывают генерацию отчета: запрос просто идет в API.
+    """
+
+    prefix = "llm-cache:"
+    index_key = "llm-cache-index"
+
+    def __init__(
+        self, url: str, ttl: int, max_entries: int, enabled: bool = True
+    ) -> None:
+        self.url = url
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._client: Optional[redis.Redis] = None
+
+    @property
+    def client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.from_url(self.url, decode_responses=True)
+        return self._client
+
+    @classmethod
+    def make_key(cls, prompt: str, model: str) -> str:
+        # Отступы и пустые строки не влияют на смысл prompt
+        normalized = "\n".join(
+            line.strip() for line in prompt.strip().splitlines() if line.strip()
+        )
+        digest = hashlib.sha256(f"{model}\n{normalized}".encode()).hexdigest()
+        return f"{cls.prefix}{digest}"
+
+    def get(self, prompt: str, model: str) -> Optional[str]:
+        """
+        :return: Сохраненный ответ LLM или None.
+        """
+        if not self.enabled:
+            return None
+        key = self.make_key(prompt, model)
+        try:
+            # Попадание продлевает срок жизни ключа вместе с временем обращения
+            content = self.client.getex(key, ex=self.ttl)
+            if content is not None:
+                self.client.zadd(self.index_key, {key: time.time()})
+        except redis.RedisError as e:
+            my_logger.warning(f"LLM cache is unavailable: {e}")
+            return None
+
+        metrics.incr("llm_cache_hits" if content is not None else "llm_cache_misses")
+        return content
+
+    def set(self, prompt: str, model: str, content: str) -> None:
+        if not self.enabled:
+            return
+        key = self.make_key(prompt, model)
+        now = time.time()
+        try:
+            with self.client.pipeline() as pipe:
+                pipe.set(key, content, ex=self.ttl)
+                pipe.zadd(self.index_key, {key: now})
+                # Записи старше ttl уже удалены самим Redis
+                pipe.zremrangebyscore(self.index_key, "-inf", now - self.ttl)
+                pipe.zcard(self.index_key)
+                *_, size = pipe.execute()
+            self._evict(size)
+        except redis.RedisError as e:
+            my_logger.warning(f"LLM cache is unavailable: {e}")
+
+    def _evict(self, size: int) -> None:
+        overflow = size - self.max_entries
+        if overflow <= 0:
+            return
+        stale_keys = self.client.zrange(self.index_key, 0, overflow - 1)
+        if stale_keys:
+            with self.client.pipeline() as pipe:
+                pipe.delete(*stale_keys)
+                pipe.zrem(self.index_key, *stale_keys)
+                pipe.execute()
+            metrics.incr("llm_cache_evictions", len(stale_keys))
+
+
+llm_cache = LLMCache(
+    url=settings.cache_url.redis_cache,
+    ttl=settings.llm_cache.llm_cache_ttl,
+    max_entries=settings.llm_cache.llm_cache_max_entries,
+    enabled=settings.llm_cache.llm_cache_enabled,
+)
@@ -0,0 +1,88 @@
+from typing import Dict, Mapping, Optional
+
+import redis
+import redis.asyncio as aioredis
+
+from src.core.config import settings
+from src.core.utils.logging_config import my_logger
+
+METRICS_KEY = "metrics"
+
+
+class Metrics:
+    """
+    Счетчики сервиса в общем Redis hash.
+
+    Метрики пишут и API, и воркеры Celery, поэтому счетчики хранятся в Redis,
+    а не в памяти процесса. Ошибки Redis только логируются: метрики
+    не должны ломать обработку запросов.
+    """
+
+    def __init__(self, url: str, key: str = METRICS_KEY) -> None:
+        self.url = url
+        self.key = key
+        self._client: Optional[redis.Redis] = None
+        self._async_client: Optional[aioredis.Redis] = None
+
+    @property
+    def client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.from_url(self.url)
+        return self._client
+
+    @property
+    def async_client(self) -> aioredis.Redis:
+        if self._async_client is None:
+            self._async_client = aioredis.from_url(self.url)
+        return self._async_client
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        try:
+            self.client.hincrby(self.key, name, amount)
+        except redis.RedisError as e:
+            my_logger.warning(f"Failed to update metric {name}: {e}")
+
+    async def aincr(self, name: str, amount: int = 1) -> None:
+        try:
+            await self.async_client.hincrby(self.key, name, amount)
+        except redis.RedisError as e:
+            my_logger.warning(f"Failed to update metric {name}: {e}")
+
+    async def aincr_many(self, counters: Mapping[str, int]) -> None:
+        """Прибавляет несколько счетчиков за один запрос к Redis."""
+        try:
+            async with self.async_client.pipeline(transaction=False) as pipe:
+                for name, amount in counters.items():
+                    pipe.hincrby(self.key, name, amount)
+                await pipe.execute()
+        except redis.RedisError as e:
+            my_logger.warning(f"Failed to update metrics {list(counters)}: {e}")
+
+    async def aobserve(self, name: str, value: float) -> None:
+        """Накапливает сумму и количество замеров, например длительности в секундах."""
+        try:
+            async with self.async_client.pipeline(transaction=False) as pipe:
+                pipe.hincrbyfloat(self.key, f"{name}_sum", value)
+                pipe.hincrby(self.key, f"{name}_count", 1)
+                await pipe.execute()
+        except redis.RedisError as e:
+            my_logger.warning(f"Failed to update metric {name}: {e}")
+
+    async def snapshot(self) -> Dict[str, float]:
+        """
+        Все счетчики и доли попаданий: для каждой пары <name>_hits и
+        <name>_misses добавляется <name>_hit_rate.
+        """
+        values = await self.async_client.hgetall(self.key)
+        snapshot = {name.decode(): float(value) for name, value in values.items()}
+        for name in list(snapshot):
+            if not name.endswith("_hits"):
+                continue
+            base = name.removesuffix("_hits")
+            total = snapshot[name] + snapshot.get(f"{base}_misses", 0.0)
+            if total:
+                snapshot[f"{base}_hit_rate"] = snapshot[name] / total
+        return snapshot
+
+
+metrics = Metrics(url=settings.cache_url.redis_cache)
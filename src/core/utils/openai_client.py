@@ -0,0 +1,140 @@
+import asyncio
+import os
+import threading
+from typing import Optional
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from src.core.config import settings
+from src.core.utils.logging_config import my_logger
+
+
+class OpenAIClientManager:
+    """
+    Один клиент OpenAI (и его async вариант) на процесс.
+
+    Клиент создается лениво и переиспользуется между задачами, поэтому
+    HTTP соединения и TLS сессии не открываются заново на каждый запрос.
+    После fork (prefork воркеры Celery) ссылки на клиентов сбрасываются:
+    сокеты родителя в дочернем процессе использовать нельзя.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._client: Optional[OpenAI] = None
+        self._async_client: Optional[AsyncOpenAI] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @staticmethod
+    def _timeout() -> httpx.Timeout:
+        return httpx.Timeout(
+            settings.openapi.openai_timeout,
+            connect=settings.openapi.openai_connect_timeout,
+        )
+
+    @staticmethod
+    def _limits() -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.openapi.openai_max_connections,
+            max_keepalive_connections=settings.openapi.openai_max_keepalive_connections,
+            keepalive_expiry=settings.openapi.openai_keepalive_expiry,
+        )
+
+    def get_client(self) -> OpenAI:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = OpenAI(
+                        api_key=settings.openapi.openai_api_key,
+                        base_url=settings.openapi.openai_base_url,
+                        timeout=self._timeout(),
+                        max_retries=settings.openapi.openai_max_retries,
+                        http_client=httpx.Client(
+                            timeout=self._timeout(), limits=self._limits()
+                        ),
+                    )
+        return self._client
+
+    def get_async_client(self) -> AsyncOpenAI:
+        """
+        Возвращает async клиента для текущего event loop.
+        Соединения httpx привязаны к loop, поэтому при смене loop клиент
+        создается заново.
+
+        Повторы запросов SDK отключены: пакетная генерация повторяет их
+        сама, с паузами по Retry-After (иначе повторы перемножались бы).
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._close_async_client()
+            self._async_client = AsyncOpenAI(
+                api_key=settings.openapi.openai_api_key,
+                base_url=settings.openapi.openai_base_url,
+                timeout=self._timeout(),
+                max_retries=0,
+                http_client=httpx.AsyncClient(
+                    timeout=self._timeout(), limits=self._limits()
+                ),
+            )
+            self._async_loop = loop
+        return self._async_client
+
+    def _close_async_client(self) -> None:
+        """
+        Закрывает прежнего async клиента, чтобы не оставлять открытыми
+        соединения его пула. Закрыть их можно только в том loop, где они
+        открыты: в его потоке, если loop еще работает, или запустив его.
+        """
+        client, loop = self._async_client, self._async_loop
+        self._async_client = None
+        self._async_loop = None
+        if client is None or loop is None:
+            return
+        try:
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(client.close(), loop).result(
+                    settings.openapi.openai_connect_timeout
+                )
+            elif not loop.is_closed():
+                # В этом потоке уже работает новый loop, старый запускаем в другом
+                closer = threading.Thread(
+                    target=loop.run_until_complete, args=(client.close(),)
+                )
+                closer.start()
+                closer.join()
+            else:
+                my_logger.warning(
+                    "Event loop of the previous OpenAI client is closed, "
+                    "its connections are left to the garbage collector"
+                )
+        except Exception as e:
+            my_logger.warning(f"Failed to close previous OpenAI client: {e}")
+
+    async def aclose(self) -> None:
+        """Закрывает async клиента; вызывается из loop, в котором он создан."""
+        if self._async_loop is asyncio.get_running_loop():
+            client = self._async_client
+            self._async_client = None
+            self._async_loop = None
+            if client is not None:
+                await client.close()
+
+    def reset(self) -> None:
+        """Забывает клиентов без закрытия соединений (они принадлежат родителю)."""
+        self._lock = threading.Lock()
+        self._client = None
+        self._async_client = None
+        self._async_loop = None
+
+
+openai_clients = OpenAIClientManager()
+os.register_at_fork(after_in_child=openai_clients.reset)
+
+
+def get_openai_client() -> OpenAI:
+    return openai_clients.get_client()
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    return openai_clients.get_async_client()
@@ -0,0 +1,236 @@
+"""
+Обслуживание помесячных секций таблицы products.
+
+Запуск:
+    python -m src.core.utils.partitions maintain
+    python -m src.core.utils.partitions detach --older-than 24 [--drop]
+"""
+
+import argparse
+import asyncio
+import re
+from datetime import date
+from typing import List, Optional, Set
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.core.config import settings
+from src.core.db_helper import db_helper
+from src.core.utils.logging_config import my_logger
+
+PARTITIONED_TABLE = "products"
+DEFAULT_PARTITION = f"{PARTITIONED_TABLE}_default"
+PARTITION_NAME_RE = re.compile(rf"^{PARTITIONED_TABLE}_(\d{{4}})_(\d{{2}})$")
+
+
+def month_start(value: date) -> date:
+    return value.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARTITIONED_TABLE}_{month:%Y_%m}"
+
+
+def is_partition(name: str) -> bool:
+    """Таблица - секция products (а не самостоятельная таблица модели)."""
+    return name == DEFAULT_PARTITION or PARTITION_NAME_RE.match(name) is not None
+
+
+class ProductPartitions:
+    """
+    Помесячные секции products (PARTITION BY RANGE (date)).
+
+    Секции на ближайшие месяцы создаются заранее (maintain, раз в день
+    из Celery beat), а запись товаров проверяет секцию месяца файла перед
+    вставкой, поэтому backfill прошлых дат тоже попадает в свою секцию.
+    Строки, для которых секции нет, принимает секция по умолчанию; при
+    создании секции такие строки переносятся в нее.
+    Старые секции отсоединяются (detach) и переносятся в архивную схему
+    или удаляются.
+    """
+
+    def __init__(self, premake_months: int, archive_schema: str) -> None:
+        self.premake_months = premake_months
+        self.archive_schema = archive_schema
+        self._known_months: Set[date] = set()
+
+    async def list_months(self, conn: AsyncConnection) -> List[date]:
+        """:return: Месяцы, для которых есть секции, по возрастанию."""
+        result = await conn.execute(
+            text(
+                """
+                SELECT child.relname
+                FROM pg_inherits
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE pg_inherits.inhparent = CAST(:table AS regclass)
+                """
+            ),
+            {"table": PARTITIONED_TABLE},
+        )
+        months = []
+        for (name,) in result:
+            if match := PARTITION_NAME_RE.match(name):
+                months.append(date(int(match[1]), int(match[2]), 1))
+        return sorted(months)
+
+    async def create(self, conn: AsyncConnection, month: date) -> bool:
+        """
+        Создает секцию за месяц, если ее еще нет.
+        :return: True, если секция была создана.
+        """
+        name = partition_name(month)
+        exists = await conn.scalar(
+            text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}
+        )
+        if exists:
+            return False
+
+        bounds = f"FROM ('{month}') TO ('{add_months(month, 1)}')"
+        misplaced = await conn.scalar(
+            text(
+                f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} "
+                "WHERE date >= :start AND date < :end)"
+            ),
+            {"start": month, "end": add_months(month, 1)},
+        )
+        if not misplaced:
+            await conn.execute(
+                text(
+                    f"CREATE TABLE {name} PARTITION OF {PARTITIONED_TABLE} "
+                    f"FOR VALUES {bounds}"
+                )
+            )
+        else:
+            # Строки месяца уже лежат в секции по умолчанию: переносим их
+            # в новую таблицу и только потом подключаем ее как секцию
+            await conn.execute(
+                text(
+                    f"CREATE TABLE {name} "
+                    f"(LIKE {PARTITIONED_TABLE} INCLUDING DEFAULTS)"
+                )
+            )
+            await conn.execute(
+                text(
+                    f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} "
+                    "WHERE date >= :start AND date < :end RETURNING *) "
+                    f"INSERT INTO {name} SELECT * FROM moved"
+                ),
+                {"start": month, "end": add_months(month, 1)},
+            )
+            await conn.execute(
+                text(
+                    f"ALTER TABLE {PARTITIONED_TABLE} ATTACH PARTITION {name} "
+                    f"FOR VALUES {bounds}"
+                )
+            )
+        my_logger.info(f"Created partition {name}")
+        return True
+
+    async def ensure(self, value: date) -> None:
+        """
+        Проверяет, что для даты есть секция, и создает ее при необходимости.
+        Результат запоминается в процессе, поэтому обычно это не запрос к БД.
+        Ошибка не прерывает запись: строки попадут в секцию по умолчанию.
+        """
+        month = month_start(value)
+        if month in self._known_months:
+            return
+        try:
+            async with db_helper.engine.begin() as conn:
+                await self.create(conn, month)
+        except Exception as e:
+            my_logger.warning(f"Failed to create partition for {month}: {e}")
+            return
+        self._known_months.add(month)
+
+    async def maintain(self, today: Optional[date] = None) -> List[str]:
+        """
+        Создает секции с текущего месяца на premake_months вперед.
+        :return: Имена созданных секций.
+        """
+        current = month_start(today or date.today())
+        created = []
+        for offset in range(self.premake_months + 1):
+            month = add_months(current, offset)
+            async with db_helper.engine.begin() as conn:
+                if await self.create(conn, month):
+                    created.append(partition_name(month))
+            self._known_months.add(month)
+        return created
+
+    async def detach_older_than(
+        self, months: int, drop: bool = False, today: Optional[date] = None
+    ) -> List[str]:
+        """
+        Отсоединяет секции, все строки которых старше months месяцев.
+
+        :param months: Сколько последних месяцев оставить в products.
+        :param drop: Удалить секции вместо переноса в архивную схему.
+        :return: Имена отсоединенных секций.
+        """
+        cutoff = add_months(month_start(today or date.today()), -months)
+        detached = []
+        async with db_helper.engine.begin() as conn:
+            old_months = [m for m in await self.list_months(conn) if m < cutoff]
+            if old_months and not drop:
+                await conn.execute(
+                    text(f"CREATE SCHEMA IF NOT EXISTS {self.archive_schema}")
+                )
+            for month in old_months:
+                name = partition_name(month)
+                await conn.execute(
+                    text(f"ALTER TABLE {PARTITIONED_TABLE} DETACH PARTITION {name}")
+                )
+                if drop:
+                    await conn.execute(text(f"DROP TABLE {name}"))
+                else:
+                    await conn.execute(
+                        text(f"ALTER TABLE {name} SET SCHEMA {self.archive_schema}")
+                    )
+                self._known_months.discard(month)
+                detached.append(name)
+        my_logger.info(f"Detached partitions: {detached}")
+        return detached
+
+
+product_partitions = ProductPartitions(
+    premake_months=settings.db.partition_premake_months,
+    archive_schema=settings.db.partition_archive_schema,
+)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Секции таблицы products")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("maintain", help="Создать секции на ближайшие месяцы")
+    detach = commands.add_parser("detach", help="Отсоединить старые секции")
+    detach.add_argument(
+        "--older-than",
+        type=int,
+        default=settings.db.partition_retention_months,
+        help="Сколько последних месяцев оставить",
+    )
+    detach.add_argument(
+        "--drop", action="store_true", help="Удалить вместо переноса в архив"
+    )
+    args = parser.parse_args()
+
+    try:
+        if args.command == "maintain":
+            print(await product_partitions.maintain())
+        else:
+            print(
+                await product_partitions.detach_older_than(args.older_than, args.drop)
+            )
+    finally:
+        await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
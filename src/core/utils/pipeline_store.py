@@ -0,0 +1,130 @@
+import json
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import redis
+import redis.asyncio as aioredis
+
+from src.core.config import settings
+from src.core.utils.logging_config import my_logger
+
+STAGES_FIELD = "stages"
+TIMING_PREFIX = "timing:"
+
+
+class PipelineStore:
+    """
+    Цепочки обработки файлов в Redis hash под id цепочки (id первой задачи,
+    он же root_id всех задач цепочки и id, который получил клиент).
+
+    API при запуске записывает id и названия всех задач цепочки, а воркеры
+    после каждой задачи дописывают ее время: сколько задача ждала в очереди
+    и сколько выполнялась. Время хранится по (id задачи, стадия): задача,
+    заменившая себя через replace, делит id с телом chord. Запись живет столько же, сколько результаты задач
+    в result backend. Ошибки Redis только логируются: обработка файла
+    от записи не зависит.
+    """
+
+    prefix = "pipeline:"
+
+    def __init__(self, url: str, ttl: int) -> None:
+        self.url = url
+        self.ttl = ttl
+        self._client: Optional[redis.Redis] = None
+        self._async_client: Optional[aioredis.Redis] = None
+
+    @property
+    def client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.from_url(self.url, decode_responses=True)
+        return self._client
+
+    @property
+    def async_client(self) -> aioredis.Redis:
+        if self._async_client is None:
+            self._async_client = aioredis.from_url(self.url, decode_responses=True)
+        return self._async_client
+
+    def _key(self, pipeline_id: str) -> str:
+        return f"{self.prefix}{pipeline_id}"
+
+    async def register(
+        self, pipelines: Mapping[str, Sequence[Tuple[str, str]]]
+    ) -> None:
+        """
+        Записывает цепочки за один запрос к Redis.
+        :param pipelines: id цепочки -> (id задачи, название стадии)
+            в порядке выполнения.
+        """
+        try:
+            async with self.async_client.pipeline(transaction=False) as pipe:
+                for pipeline_id, stages in pipelines.items():
+                    key = self._key(pipeline_id)
+                    pipe.hset(key, STAGES_FIELD, json.dumps(stages))
+                    pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except redis.RedisError as e:
+            my_logger.warning(f"Failed to register pipelines {list(pipelines)}: {e}")
+
+    def record_timing(
+        self,
+        pipeline_id: str,
+        task_id: str,
+        stage: str,
+        queued_at: Optional[float],
+        started_at: float,
+        finished_at: float,
+    ) -> None:
+        """
+        Записывает время задачи цепочки (вызывается воркером).
+
+        :param pipeline_id: id цепочки (root_id задачи).
+        :param task_id: id задачи.
+        :param stage: Название стадии (задачи).
+        :param queued_at: Когда задача отправлена в брокер (unix time), если известно.
+        :param started_at: Когда воркер начал задачу.
+        :param finished_at: Когда воркер закончил задачу.
+        """
+        timing = {
+            "stage": stage,
+            "queued_at": queued_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+            # Часы API и воркеров могут немного расходиться
+            "queue_wait": (
+                max(started_at - queued_at, 0.0) if queued_at is not None else None
+            ),
+            "runtime": finished_at - started_at,
+        }
+        key = self._key(pipeline_id)
+        try:
+            with self.client.pipeline(transaction=False) as pipe:
+                pipe.hset(key, f"{TIMING_PREFIX}{task_id}:{stage}", json.dumps(timing))
+                pipe.expire(key, self.ttl)
+                pipe.execute()
+        except redis.RedisError as e:
+            my_logger.warning(f"Failed to record timing of {task_id}: {e}")
+
+    async def get(
+        self, pipeline_id: str
+    ) -> Optional[Tuple[List[Tuple[str, str]], Dict[Tuple[str, str], Dict[str, Any]]]]:
+        """
+        :param pipeline_id: id цепочки.
+        :return: (стадии, время задач по (id задачи, стадия)) или None, если цепочка
+            не регистрировалась (например, backfill) или запись истекла.
+        """
+        fields = await self.async_client.hgetall(self._key(pipeline_id))
+        if STAGES_FIELD not in fields:
+            return None
+        stages = [tuple(stage) for stage in json.loads(fields.pop(STAGES_FIELD))]
+        timings = {
+            tuple(name.removeprefix(TIMING_PREFIX).rsplit(":", 1)): json.loads(value)
+            for name, value in fields.items()
+            if name.startswith(TIMING_PREFIX)
+        }
+        return stages, timings
+
+
+pipeline_store = PipelineStore(
+    url=settings.cache_url.redis_cache,
+    ttl=settings.celery.result_expires,
+)
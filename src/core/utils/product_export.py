@@ -0,0 +1,72 @@
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Callable, Dict, Sequence
+
+from src.core.schemas.schemas import ProductResponse
+
+# Колонки товара в выгрузке
+PRODUCT_EXPORT_COLUMNS = ("id", "name", "quantity", "price", "category", "date")
+# Колонки товара в ответе /sales-product/ в порядке полей ProductResponse
+PRODUCT_RESPONSE_COLUMNS = tuple(ProductResponse.model_fields)
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def _json_default(value: Any) -> Any:
+    return value.isoformat()
+
+
+def rows_to_ndjson(rows: Sequence[Sequence[Any]]) -> str:
+    """Пачка строк в NDJSON: один JSON объект на строку."""
+    return "".join(
+        json.dumps(
+            dict(zip(PRODUCT_EXPORT_COLUMNS, row)),
+            ensure_ascii=False,
+            default=_json_default,
+        )
+        + "\n"
+        for row in rows
+    )
+
+
+def rows_to_csv(rows: Sequence[Sequence[Any]]) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        [value.isoformat() if hasattr(value, "isoformat") else value for value in row]
+        for row in rows
+    )
+    return buffer.getvalue()
+
+
+def csv_header() -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(PRODUCT_EXPORT_COLUMNS)
+    return buffer.getvalue()
+
+
+ENCODERS: Dict[str, Callable[[Sequence[Sequence[Any]]], str]] = {
+    "ndjson": rows_to_ndjson,
+    "csv": rows_to_csv,
+}
+
+
+async def encode_batches(
+    batches: AsyncIterator[Sequence[Sequence[Any]]], export_format: str
+) -> AsyncIterator[str]:
+    """
+    Кодирует пачки строк по мере их чтения из БД.
+    В памяти одновременно держится только одна пачка.
+
+    :param batches: Пачки строк в порядке PRODUCT_EXPORT_COLUMNS.
+    :param export_format: ndjson или csv.
+    :return: Части тела ответа.
+    """
+    encode = ENCODERS[export_format]
+    if export_format == "csv":
+        yield csv_header()
+    async for batch in batches:
+        yield encode(batch)
@@ -0,0 +1,163 @@
+import time
+from typing import AsyncIterator, List, Optional, Tuple
+
+import redis
+import redis.asyncio as aioredis
+
+from src.core.config import settings
+from src.core.utils.logging_config import my_logger
+
+# События потока отчета
+CHUNK_EVENT = "chunk"
+DONE_EVENT = "done"
+ERROR_EVENT = "error"
+
+
+def format_sse(entry_id: str, event: str, data: str) -> str:
+    """
+    Событие в формате Server-Sent Events.
+    Многострочные данные передаются несколькими полями data.
+    """
+    lines = [f"id: {entry_id}", f"event: {event}"]
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+class ReportStreamWriter:
+    """
+    Пишет части отчета в поток по мере их генерации.
+
+    Первая часть отправляется сразу (от нее зависит время до первого байта
+    у клиента), остальные копятся и отправляются не чаще flush_interval,
+    чтобы не делать запрос к Redis на каждый токен.
+    """
+
+    def __init__(
+        self, stream: "ReportStream", stream_id: str, flush_interval: float
+    ) -> None:
+        self.stream = stream
+        self.stream_id = stream_id
+        self.flush_interval = flush_interval
+        self._buffer: List[str] = []
+        self._last_flush: Optional[float] = None
+
+    def write(self, chunk: str) -> None:
+        if not chunk:
+            return
+        self._buffer.append(chunk)
+        now = time.monotonic()
+        if self._last_flush is None or now - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._buffer:
+            self.stream.publish(self.stream_id, CHUNK_EVENT, "".join(self._buffer))
+            self._buffer.clear()
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        """Отправляет остаток и отмечает конец отчета."""
+        self.flush()
+        self.stream.publish(self.stream_id, DONE_EVENT, "")
+
+    def fail(self, error: str) -> None:
+        self.flush()
+        self.stream.publish(self.stream_id, ERROR_EVENT, error)
+
+
+class ReportStream:
+    """
+    Частичные результаты генерации отчета LLM в Redis Stream.
+
+    Воркер дописывает в поток части отчета по мере их прихода от API,
+    а endpoint SSE читает поток с любого места (Last-Event-ID), поэтому
+    клиент может подключиться до начала генерации или переподключиться.
+    Поток живет ttl секунд после последней записи. Ошибки Redis только
+    логируются: генерация отчета от потока не зависит.
+    """
+
+    prefix = "report-stream:"
+
+    def __init__(
+        self,
+        url: str,
+        ttl: int,
+        maxlen: int,
+        flush_interval: float,
+        block_ms: int,
+    ) -> None:
+        self.url = url
+        self.ttl = ttl
+        self.maxlen = maxlen
+        self.flush_interval = flush_interval
+        self.block_ms = block_ms
+        self._client: Optional[redis.Redis] = None
+        self._async_client: Optional[aioredis.Redis] = None
+
+    @property
+    def client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = redis.from_url(self.url, decode_responses=True)
+        return self._client
+
+    @property
+    def async_client(self) -> aioredis.Redis:
+        if self._async_client is None:
+            self._async_client = aioredis.from_url(self.url, decode_responses=True)
+        return self._async_client
+
+    def _key(self, stream_id: str) -> str:
+        return f"{self.prefix}{stream_id}"
+
+    def writer(self, stream_id: str) -> ReportStreamWriter:
+        return ReportStreamWriter(self, stream_id, self.flush_interval)
+
+    def publish(self, stream_id: str, event: str, data: str) -> None:
+        key = self._key(stream_id)
+        try:
+            with self.client.pipeline(transaction=False) as pipe:
+                pipe.xadd(
+                    key,
+                    {"event": event, "data": data},
+                    maxlen=self.maxlen,
+                    approximate=True,
+                )
+                pipe.expire(key, self.ttl)
+                pipe.execute()
+        except redis.RedisError as e:
+            my_logger.warning(f"Report stream is unavailable: {e}")
+
+    async def listen(
+        self, stream_id: str, last_id: str = "0"
+    ) -> AsyncIterator[Optional[Tuple[str, str, str]]]:
+        """
+        Читает поток отчета, пока не придет событие done или error.
+
+        :param stream_id: id задачи, для которой генерируется отчет.
+        :param last_id: id последнего полученного клиентом события.
+        :return: Кортежи (id, event, data); None - если за block_ms
+            ничего не пришло (повод отправить клиенту keep-alive).
+        """
+        key = self._key(stream_id)
+        while True:
+            response = await self.async_client.xread(
+                {key: last_id}, block=self.block_ms
+            )
+            if not response:
+                yield None
+                continue
+            for entry_id, fields in response[0][1]:
+                last_id = entry_id
+                event = fields.get("event", CHUNK_EVENT)
+                yield entry_id, event, fields.get("data", "")
+                if event in (DONE_EVENT, ERROR_EVENT):
+                    return
+
+
+report_stream = ReportStream(
+    url=settings.cache_url.redis_cache,
+    ttl=settings.report_stream.report_stream_ttl,
+    maxlen=settings.report_stream.report_stream_maxlen,
+    flush_interval=settings.report_stream.report_stream_flush_interval,
+    block_ms=settings.report_stream.report_stream_block_ms,
+)
@@ -0,0 +1,307 @@
+import asyncio
+import time
+from collections import Counter, OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+import redis
+import redis.asyncio as aioredis
+from redis.asyncio.lock import Lock
+from redis.exceptions import LockError
+
+from src.core.config import settings
+from src.core.utils.logging_config import my_logger
+from src.core.utils.metrics import metrics
+
+# Область кэша для ответов по диапазонам дат: сбрасывается при любой записи
+ANALYTICS_SCOPE = "analytics"
+
+Loader = Callable[[], Awaitable[bytes]]
+
+
+class LocalCache:
+    """
+    LRU кэш ответов в памяти процесса.
+
+    Размер ограничен суммарной длиной тел ответов (max_bytes), записи живут
+    не дольше ttl секунд. Ответ больше max_bytes не сохраняется.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float) -> None:
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        # key -> (тело ответа, момент устаревания по time.monotonic)
+        self._entries: OrderedDict[str, Tuple[bytes, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        body, expires_at = entry
+        if expires_at <= time.monotonic():
+            self.pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return body
+
+    def set(self, key: str, body: bytes) -> None:
+        self.pop(key)
+        if len(body) > self.max_bytes:
+            return
+        self._entries[key] = (body, time.monotonic() + self.ttl)
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+
+    def pop_prefix(self, prefix: str) -> None:
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            self.pop(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+
+class ResponseCache:
+    """
+    Двухуровневый кэш готовых JSON ответов API: LRU в памяти процесса
+    (LocalCache) перед общим для всех процессов Redis.
+
+    Ответы группируются по областям (scope): дата в формате ISO или
+    ANALYTICS_SCOPE. У каждой области есть номер версии, он входит в ключ
+    записи. invalidate увеличивает версию и публикует событие в канал, так
+    что после записи новых данных старые ответы больше не читаются, даже
+    если их дописал запрос, начатый до записи. Старые версии удаляет сам
+    Redis по ttl.
+
+    Одновременные промахи по одному ключу объединяются (single-flight):
+    внутри процесса ждут одну задачу, между процессами - Redis lock, чтобы
+    запрос к БД выполнялся один раз. Ошибки (например, 404) не кэшируются.
+    При недоступном Redis ответ просто считается заново.
+
+    Кэш в памяти сбрасывается по тем же событиям канала (listen), поэтому
+    процессы gunicorn не отдают старые ответы после записи. Если события
+    могли быть пропущены (переподключение к Redis), он очищается целиком,
+    а ttl ограничивает устаревание на крайний случай. Попадания по уровням
+    считаются в памяти и периодически сбрасываются в метрики (report_stats).
+    """
+
+    prefix = "response-cache:"
+    version_prefix = "response-cache-version:"
+    channel = "response-cache-invalidate"
+
+    def __init__(
+        self,
+        url: str,
+        ttl: int,
+        lock_timeout: float,
+        poll_interval: float,
+        local_max_bytes: int,
+        local_ttl: float,
+        stats_interval: float,
+        enabled: bool = True,
+    ) -> None:
+        self.url = url
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self.stats_interval = stats_interval
+        self.enabled = enabled
+        self.local = LocalCache(max_bytes=local_max_bytes, ttl=local_ttl)
+        self._client: Optional[aioredis.Redis] = None
+        # Загрузки, которые сейчас идут в этом процессе: "scope:key" -> задача
+        self._inflight: Dict[str, asyncio.Task[bytes]] = {}
+        # Сколько раз сбрасывалась область и весь кэш: загрузка, начатая
+        # до сброса, не должна попасть в кэш в памяти
+        self._generations: Counter[str] = Counter()
+        self._epoch = 0
+        self._stats: Counter[str] = Counter()
+
+    @property
+    def client(self) -> aioredis.Redis:
+        if self._client is None:
+            self._client = aioredis.from_url(self.url)
+        return self._client
+
+    def _version_key(self, scope: str) -> str:
+        return f"{self.version_prefix}{scope}"
+
+    def _entry_key(self, scope: str, version: str, key: str) -> str:
+        return f"{self.prefix}{scope}:{version}:{key}"
+
+    async def get_or_load(self, scope: str, key: str, loader: Loader) -> bytes:
+        """
+        :param scope: Область кэша (дата ответа или ANALYTICS_SCOPE).
+        :param key: Ключ ответа внутри области (эндпоинт и его параметры).
+        :param loader: Считает тело ответа при промахе.
+        :return: Тело ответа из кэша или от loader.
+        """
+        if not self.enabled:
+            return await loader()
+
+        flight_key = f"{scope}:{key}"
+        body = self.local.get(flight_key)
+        if body is not None:
+            self._stats["response_cache_l1_hits"] += 1
+            return body
+        self._stats["response_cache_l1_misses"] += 1
+
+        task = self._inflight.get(flight_key)
+        if task is None:
+            generation = (self._epoch, self._generations[scope])
+            task = asyncio.create_task(self._load(scope, key, loader, generation))
+            self._inflight[flight_key] = task
+            task.add_done_callback(lambda _: self._forget(flight_key, task))
+        else:
+            self._stats["response_cache_coalesced"] += 1
+        # Отмена одного запроса не прерывает загрузку для остальных
+        return await asyncio.shield(task)
+
+    def _forget(self, flight_key: str, task: "asyncio.Task[bytes]") -> None:
+        if self._inflight.get(flight_key) is task:
+            del self._inflight[flight_key]
+
+    async def _load(
+        self, scope: str, key: str, loader: Loader, generation: Tuple[int, int]
+    ) -> bytes:
+        body = await self._load_shared(scope, key, loader)
+        if (self._epoch, self._generations[scope]) == generation:
+            self.local.set(f"{scope}:{key}", body)
+        return body
+
+    async def _load_shared(self, scope: str, key: str, loader: Loader) -> bytes:
+        # None - ответ считается без блокировки (ее держит другой процесс)
+        lock: Optional[Lock] = None
+        try:
+            version = await self.client.get(self._version_key(scope))
+            entry_key = self._entry_key(scope, (version or b"0").decode(), key)
+            body = await self.client.get(entry_key)
+            if body is not None:
+                self._stats["response_cache_l2_hits"] += 1
+                return body
+
+            lock_key = f"{entry_key}:lock"
+            lock = self.client.lock(lock_key, timeout=self.lock_timeout)
+            if not await lock.acquire(blocking=False):
+                # Тот же ответ уже считает другой процесс
+                body = await self._wait_for(entry_key, lock_key)
+                if body is not None:
+                    self._stats["response_cache_coalesced"] += 1
+                    return body
+                lock = None
+        except redis.RedisError as e:
+            my_logger.warning(f"Response cache is unavailable: {e}")
+            return await loader()
+
+        self._stats["response_cache_l2_misses"] += 1
+        try:
+            loaded = await loader()
+            try:
+                await self.client.set(entry_key, loaded, ex=self.ttl)
+            except redis.RedisError as e:
+                my_logger.warning(f"Response cache is unavailable: {e}")
+        finally:
+            if lock is not None:
+                try:
+                    await lock.release()
+                except (LockError, redis.RedisError):
+                    pass
+        return loaded
+
+    async def _wait_for(self, entry_key: str, lock_name: str) -> Optional[bytes]:
+        """
+        Ждет, пока другой процесс запишет ответ.
+        :return: Тело ответа или None, если тот процесс не смог его посчитать.
+        """
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.get(entry_key)
+                pipe.exists(lock_name)
+                body, locked = await pipe.execute()
+            if body is not None or not locked:
+                return body
+        return None
+
+    async def invalidate(self, *scopes: str) -> None:
+        """
+        Сбрасывает кэш областей: новая версия и событие для процессов API.
+        :param scopes: Даты в формате ISO и/или ANALYTICS_SCOPE.
+        """
+        if not self.enabled or not scopes:
+            return
+        for scope in scopes:
+            self._drop_scope(scope)
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for scope in scopes:
+                    pipe.incr(self._version_key(scope))
+                    pipe.publish(self.channel, scope)
+                await pipe.execute()
+        except redis.RedisError as e:
+            my_logger.warning(f"Failed to invalidate response cache {scopes}: {e}")
+
+    def _drop_scope(self, scope: str) -> None:
+        # Запросы после сброса не должны получать ответы из памяти или
+        # присоединяться к загрузкам, начатым до записи новых данных
+        self._generations[scope] += 1
+        self.local.pop_prefix(f"{scope}:")
+        for flight_key in [k for k in self._inflight if k.startswith(f"{scope}:")]:
+            del self._inflight[flight_key]
+
+    async def listen(self) -> None:
+        """Слушает события сброса кэша. Запускается фоновой задачей API."""
+        while True:
+            try:
+                async with self.client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    # Пока подписки не было, события сброса могли пропасть
+                    self._drop_all()
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._drop_scope(message["data"].decode())
+            except redis.RedisError as e:
+                my_logger.warning(f"Response cache listener failed: {e}")
+                await asyncio.sleep(1)
+
+    def _drop_all(self) -> None:
+        self._epoch += 1
+        self._inflight.clear()
+        self.local.clear()
+
+    async def flush_stats(self) -> None:
+        """Прибавляет накопленные в процессе счетчики к общим метрикам."""
+        stats, self._stats = self._stats, Counter()
+        if stats:
+            await metrics.aincr_many(stats)
+
+    async def report_stats(self) -> None:
+        """Периодически сбрасывает счетчики. Запускается фоновой задачей API."""
+        try:
+            while True:
+                await asyncio.sleep(self.stats_interval)
+                await self.flush_stats()
+        finally:
+            await self.flush_stats()
+
+
+response_cache = ResponseCache(
+    url=settings.cache_url.redis_cache,
+    ttl=settings.response_cache.response_cache_ttl,
+    lock_timeout=settings.response_cache.response_cache_lock_timeout,
+    poll_interval=settings.response_cache.response_cache_poll_interval,
+    local_max_bytes=settings.response_cache.response_cache_local_max_bytes,
+    local_ttl=settings.response_cache.response_cache_local_ttl,
+    stats_interval=settings.response_cache.response_cache_stats_interval,
+    enabled=settings.response_cache.response_cache_enabled,
+)
@@ -1,24 +1,34 @@
-from openai import OpenAI
+import asyncio
+import random
+from typing import Callable, Dict, List, Optional, Sequence
+
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    AsyncOpenAI,
+    OpenAI,
+    RateLimitError,
+)
 
 from src.core.config import settings
+from src.core.utils.llm_cache import llm_cache
 from src.core.utils.logging_config import my_logger
+from src.core.utils.openai_client import get_async_openai_client, get_openai_client
 
 
-def generate_report_content(
+def build_prompt(
     date: str, total_revenue: float, top_products: str, categories: str
-) -> str | None:
+) -> str:
     """
-    Генерирует аналитический отчет на основе предоставленных данных о продажах.
+    Формирует prompt запрос к LLM по сводке продаж.
 
     :param date: Дата отчета.
     :param total_revenue: Общая выручка за период.
     :param top_products: Список топ-3 товаров по продажам.
     :param categories: Список категорий с их долей в продажах.
-    :return: Сгенерированный текст аналитического отчета.
+    :return: Текст prompt.
     """
-    my_logger.debug("Starting generate_report_content.")
-
-    prompt = f"""
+    return f"""
     Проанализируй данные о продажах за {date}:
     1. Общая выручка: {total_revenue}
     2. Топ-3 товара по продажам: {top_products}
@@ -26,19 +36,170 @@ def generate_report_content(
 
     Составь краткий аналитический отчет с выводами и рекомендациями.
     """
+
+
+def generate_report_content(
+    date: str,
+    total_revenue: float,
+    top_products: str,
+    categories: str,
+    on_chunk: Optional[Callable[[str], None]] = None,
+) -> str | None:
+    """
+    Генерирует аналитический отчет на основе предоставленных данных о продажах.
+    Если такой же prompt уже отправлялся в ту же модель, ответ берется из кэша.
+
+    :param date: Дата отчета.
+    :param total_revenue: Общая выручка за период.
+    :param top_products: Список топ-3 товаров по продажам.
+    :param categories: Список категорий с их долей в продажах.
+    :param on_chunk: Если задан, отчет запрашивается потоково и каждая
+        пришедшая часть текста передается в on_chunk.
+    :return: Сгенерированный текст аналитического отчета.
+    """
+    my_logger.debug("Starting generate_report_content.")
+
+    prompt = build_prompt(date, total_revenue, top_products, categories)
+    model = settings.openapi.openai_gpt_model
+
+    cached_content = llm_cache.get(prompt, model)
+    if cached_content is not None:
+        my_logger.info("Report content served from LLM cache.")
+        if on_chunk is not None:
+            on_chunk(cached_content)
+        return cached_content
+
     try:
-        client = OpenAI(
-            api_key=settings.openapi.openai_api_key,
-            base_url=settings.openapi.openai_base_url,
-        )
-        completion = client.chat.completions.create(
-            model=settings.openapi.openai_gpt_model,
-            messages=[{"role": "user", "content": prompt}],
-        )
-        report_content = completion.choices[0].message.content
+        client = get_openai_client()
+        if on_chunk is None:
+            completion = client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+            )
+            report_content = completion.choices[0].message.content
+        else:
+            report_content = _stream_completion(client, prompt, model, on_chunk)
 
     except Exception as e:
         my_logger.error(f"Error in OpenAI completion: {str(e)}")
         raise Exception(e)
     my_logger.info("Prompt query completed successfully.")
+
+    if report_content:
+        llm_cache.set(prompt, model, report_content)
     return report_content
+
+
+def _stream_completion(
+    client: OpenAI, prompt: str, model: str, on_chunk: Callable[[str], None]
+) -> str | None:
+    """
+    Потоковый запрос к LLM: части ответа передаются в on_chunk по мере прихода.
+    :return: Полный текст ответа.
+    """
+    parts: List[str] = []
+    stream = client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        stream=True,
+    )
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        content = chunk.choices[0].delta.content
+        if content:
+            parts.append(content)
+            on_chunk(content)
+    return "".join(parts) or None
+
+
+def _backoff_delay(attempt: int, error: Exception) -> float:
+    """
+    Пауза перед повтором: Retry-After из ответа API, если он есть,
+    иначе экспоненциальная задержка с джиттером.
+    """
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), settings.openapi.openai_backoff_max)
+        except ValueError:
+            pass
+    delay = settings.openapi.openai_backoff_base * 2**attempt
+    return min(delay, settings.openapi.openai_backoff_max) * random.uniform(0.5, 1.0)
+
+
+async def _complete_with_backoff(
+    client: AsyncOpenAI, prompt: str, model: str
+) -> str | None:
+    max_attempts = settings.openapi.openai_batch_max_attempts
+    for attempt in range(max_attempts):
+        try:
+            completion = await client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+            )
+            return completion.choices[0].message.content
+        except (RateLimitError, APIConnectionError, APITimeoutError) as e:
+            if attempt == max_attempts - 1:
+                raise
+            delay = _backoff_delay(attempt, e)
+            my_logger.warning(f"OpenAI is throttling ({e}), retry in {delay:.1f}s")
+            await asyncio.sleep(delay)
+    return None
+
+
+async def generate_reports_batch(
+    summaries: Sequence[Sequence], concurrency: int | None = None
+) -> List[str | None]:
+    """
+    Генерирует отчеты сразу для многих сводок продаж (backfill истории).
+
+    Запросы к LLM идут параллельно через async клиент, но не больше
+    concurrency одновременно. При ограничении частоты запросов (429) и
+    сетевых ошибках запрос повторяется с паузой. Одинаковые prompt
+    отправляются один раз, уже известные ответы берутся из кэша.
+
+    :param summaries: Сводки вида (date, total_revenue, top_products, categories).
+    :param concurrency: Максимум одновременных запросов к LLM.
+    :return: Отчеты в порядке summaries, None - если отчет получить не удалось.
+    """
+    my_logger.debug(f"Starting generate_reports_batch for {len(summaries)} summaries.")
+
+    client = get_async_openai_client()
+    model = settings.openapi.openai_gpt_model
+    semaphore = asyncio.Semaphore(
+        concurrency or settings.openapi.openai_batch_concurrency
+    )
+
+    async def generate(prompt: str) -> str | None:
+        # Клиент кэша синхронный: запросы к Redis не должны держать event loop
+        cached_content = await asyncio.to_thread(llm_cache.get, prompt, model)
+        if cached_content is not None:
+            return cached_content
+        async with semaphore:
+            report_content = await _complete_with_backoff(client, prompt, model)
+        if report_content:
+            await asyncio.to_thread(llm_cache.set, prompt, model, report_content)
+        return report_content
+
+    prompts = [build_prompt(*summary) for summary in summaries]
+    unique_prompts: Dict[str, asyncio.Task] = {}
+    for prompt in prompts:
+        if prompt not in unique_prompts:
+            unique_prompts[prompt] = asyncio.ensure_future(generate(prompt))
+    await asyncio.gather(*unique_prompts.values(), return_exceptions=True)
+
+    reports: List[str | None] = []
+    for prompt in prompts:
+        task = unique_prompts[prompt]
+        if task.exception() is not None:
+            my_logger.error(f"Error in OpenAI completion: {task.exception()}")
+            reports.append(None)
+        else:
+            reports.append(task.result())
+
+    my_logger.info(
+        f"Batch completed: {sum(r is not None for r in reports)}/{len(reports)} reports."
+    )
+    return reports
@@ -0,0 +1,496 @@
+import fcntl
+import hashlib
+import io
+import json
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from src.core.config import settings
+from src.core.utils.logging_config import my_logger
+
+
+class StagedFile(BaseModel):
+    """Ссылка на файл в staging хранилище, которая передается между задачами."""
+
+    key: str
+    checksum: str
+    size: int
+
+
+# Загруженные XML, распаршенные товары и недописанные файлы
+STAGED_SUFFIXES = (".xml", ".ndjson", ".part")
+
+
+def chunk_ranges(size: int, chunks: int, min_chunk_size: int) -> List[Tuple[int, int]]:
+    """
+    Делит файл на диапазоны байт для параллельной обработки.
+    :param size: Размер файла.
+    :param chunks: Желаемое количество диапазонов.
+    :param min_chunk_size: Минимальный размер диапазона, мелкие файлы не делятся.
+    :return: Список (start, end)
+    """
+    chunks = max(1, min(chunks, size // max(min_chunk_size, 1)))
+    return [(size * i // chunks, size * (i + 1) // chunks) for i in range(chunks)]
+
+
+class _VerifiedReader(io.RawIOBase):
+    """
+    Файл хранилища, который сверяет sha256 со ссылкой, когда его прочитали
+    подряд от начала до конца (ошибка - на чтении последней части).
+    Диапазоны (после seek) читаются без хэширования: части файла сверять
+    не с чем, а хэшировать весь файл ради каждой части слишком дорого.
+    """
+
+    def __init__(self, file: io.FileIO, staged: StagedFile) -> None:
+        self._file = file
+        self._staged = staged
+        self._digest = hashlib.sha256()
+        # Сколько байт подряд от начала файла уже в _digest
+        self._hashed = 0
+        self._position = 0
+        self._verified = False
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def fileno(self) -> int:
+        return self._file.fileno()
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        self._position = self._file.seek(offset, whence)
+        return self._position
+
+    def readinto(self, buffer: Any) -> int:
+        size = self._file.readinto(buffer) or 0
+        if self._position == self._hashed and not self._verified:
+            self._digest.update(memoryview(buffer)[:size])
+            self._hashed += size
+            if self._hashed >= self._staged.size:
+                self._verified = True
+                if self._digest.hexdigest() != self._staged.checksum:
+                    my_logger.error(f"Staged file {self._staged.key} is corrupted")
+                    raise ValueError(
+                        f"Staged file {self._staged.key} checksum mismatch"
+                    )
+        self._position += size
+        return size
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+
+class UploadStorage:
+    """
+    Staging хранилище для загруженных XML файлов и распаршенных товаров.
+
+    Вместо самих данных через брокер Celery передается только StagedFile
+    (ключ + sha256 + размер), а каждая задача читает файл с диска сама.
+    """
+
+    def __init__(self, root: str, chunk_size: int = 1024 * 1024) -> None:
+        self.root = Path(root)
+        self.chunk_size = chunk_size
+
+    def path(self, key: str) -> Path:
+        return self.root / key
+
+    def _new_key(self, suffix: str) -> str:
+        return f"{uuid.uuid4().hex}{suffix}"
+
+    def _commit(self, tmp_path: Path, key: str) -> None:
+        os.replace(tmp_path, self.path(key))
+
+    def stage(self, source: BinaryIO, suffix: str = ".xml") -> StagedFile:
+        """
+        Копирует файловый объект в хранилище частями, считая sha256 на лету.
+        :param source: Бинарный файловый объект (например UploadFile.file).
+        :param suffix: Расширение файла в хранилище.
+        :return: StagedFile
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        key = self._new_key(suffix)
+        tmp_path = self.path(f"{key}.part")
+        digest = hashlib.sha256()
+        size = 0
+
+        try:
+            with open(tmp_path, "wb") as dst:
+                while chunk := source.read(self.chunk_size):
+                    digest.update(chunk)
+                    dst.write(chunk)
+                    size += len(chunk)
+        except BaseException:
+            # Оборванное чтение (например, лимит распаковки архива)
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        self._commit(tmp_path, key)
+        my_logger.debug(f"Staged file {key} ({size} bytes)")
+        return StagedFile(key=key, checksum=digest.hexdigest(), size=size)
+
+    def write_records(self, records: Iterable[Dict[str, Any]]) -> StagedFile:
+        """
+        Записывает товары в хранилище построчно в формате NDJSON.
+        :param records: Итератор словарей с данными о продажах.
+        :return: StagedFile
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        key = self._new_key(".ndjson")
+        tmp_path = self.path(f"{key}.part")
+        digest = hashlib.sha256()
+        size = 0
+
+        try:
+            with open(tmp_path, "wb") as dst:
+                for record in records:
+                    line = json.dumps(record, ensure_ascii=False).encode() + b"\n"
+                    digest.update(line)
+                    dst.write(line)
+                    size += len(line)
+        except BaseException:
+            # Оборванный парсинг: недописанный файл никому не нужен
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        self._commit(tmp_path, key)
+        my_logger.debug(f"Staged records {key} ({size} bytes)")
+        return StagedFile(key=key, checksum=digest.hexdigest(), size=size)
+
+    def concat(self, parts: List[StagedFile]) -> StagedFile:
+        """
+        Склеивает файлы хранилища по порядку в новый файл (например, NDJSON
+        частей, распаршенных параллельно). Части не удаляются.
+        :param parts: Ссылки на файлы с одинаковым расширением.
+        :return: StagedFile
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        key = self._new_key(Path(parts[0].key).suffix if parts else ".ndjson")
+        tmp_path = self.path(f"{key}.part")
+        digest = hashlib.sha256()
+        size = 0
+
+        try:
+            with open(tmp_path, "wb") as dst:
+                for part in parts:
+                    with self.open(part) as src:
+                        while chunk := src.read(self.chunk_size):
+                            digest.update(chunk)
+                            dst.write(chunk)
+                            size += len(chunk)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        self._commit(tmp_path, key)
+        my_logger.debug(f"Concatenated {len(parts)} files into {key} ({size} bytes)")
+        return StagedFile(key=key, checksum=digest.hexdigest(), size=size)
+
+    def open(self, staged: StagedFile) -> BinaryIO:
+        """
+        Открывает файл из хранилища на чтение. Размер сверяется со ссылкой
+        сразу, а sha256 - при чтении подряд до конца файла (ValueError),
+        поэтому файл не читается лишний раз ради проверки.
+        :param staged: Ссылка на файл.
+        :return: BinaryIO
+        """
+        file = open(self.path(staged.key), "rb", buffering=0)
+        try:
+            actual_size = os.fstat(file.fileno()).st_size
+            if actual_size != staged.size:
+                my_logger.error(f"Staged file {staged.key} is corrupted")
+                raise ValueError(
+                    f"Staged file {staged.key} size mismatch: "
+                    f"expected {staged.size}, got {actual_size}"
+                )
+        except BaseException:
+            file.close()
+            raise
+        return io.BufferedReader(_VerifiedReader(file, staged), self.chunk_size)
+
+    def read_records(
+        self, staged: StagedFile, start: int = 0, end: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Лениво читает товары, записанные write_records.
+
+        Можно прочитать только часть файла: строка относится к диапазону
+        [start, end), если начинается внутри него. Поэтому соседние диапазоны
+        покрывают файл без пропусков и повторов.
+
+        :param staged: Ссылка на NDJSON файл.
+        :param start: Смещение начала диапазона в байтах.
+        :param end: Смещение конца диапазона в байтах (по умолчанию конец файла).
+        :return: Iterator[Dict[str, Any]]
+        """
+        end = staged.size if end is None else end
+        with self.open(staged) as f:
+            position = start
+            if start > 0:
+                # Пропускаем строку, начавшуюся в предыдущем диапазоне
+                f.seek(start - 1)
+                position = start - 1 + len(f.readline())
+            while position < end:
+                line = f.readline()
+                if not line:
+                    break
+                position += len(line)
+                yield json.loads(line)
+
+    def delete(self, staged: StagedFile) -> None:
+        self.path(staged.key).unlink(missing_ok=True)
+
+    def remove_expired(self, ttl: int, now: Optional[float] = None) -> int:
+        """
+        Удаляет файлы, которые пролежали в хранилище дольше ttl: их не
+        удалила цепочка задач (например, упал воркер или задача chord).
+        :param ttl: Возраст файла в секундах.
+        :return: Количество удаленных файлов.
+        """
+        cutoff = (now or time.time()) - ttl
+        removed = 0
+        for suffix in STAGED_SUFFIXES:
+            for path in self.root.glob(f"*{suffix}"):
+                try:
+                    expired = path.stat().st_mtime < cutoff
+                except FileNotFoundError:
+                    # Файл только что удалила сама задача
+                    continue
+                if expired:
+                    path.unlink(missing_ok=True)
+                    removed += 1
+        return removed
+
+
+UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class UploadError(Exception):
+    """Ошибка загрузки частями; API переводит ее в HTTP ответ."""
+
+
+class UploadNotFound(UploadError):
+    pass
+
+
+class UploadBusy(UploadError):
+    pass
+
+
+class UploadOffsetMismatch(UploadError):
+    pass
+
+
+class ChunkTooLarge(UploadError):
+    pass
+
+
+class ChecksumMismatch(UploadError):
+    pass
+
+
+class EmptyUpload(UploadError):
+    pass
+
+
+class ChunkWriter:
+    """
+    Запись одной части загрузки: write по мере чтения тела запроса, затем
+    commit, а при любой ошибке - rollback (файл обрезается до offset).
+    Методы блокирующие, API вызывает их в пуле потоков.
+    """
+
+    def __init__(
+        self, uploads: "ChunkedUploads", upload_id: str, upload: BinaryIO, size: int
+    ) -> None:
+        self._uploads = uploads
+        self._upload_id = upload_id
+        self._upload = upload
+        self._size = size
+        self._digest = uploads._digest(upload_id, upload, size)
+        self._chunk_digest = hashlib.sha256()
+        self._written = 0
+        upload.seek(size)
+
+    def write(self, piece: bytes) -> None:
+        self._written += len(piece)
+        if self._written > self._uploads.max_chunk_size:
+            raise ChunkTooLarge(f"Chunk exceeds {self._uploads.max_chunk_size} bytes")
+        self._digest.update(piece)
+        self._chunk_digest.update(piece)
+        self._upload.write(piece)
+
+    def commit(self, checksum: Optional[str] = None) -> int:
+        """
+        :param checksum: sha256 части (необязательно).
+        :return: Новый offset загрузки.
+        """
+        if checksum and self._chunk_digest.hexdigest() != checksum.lower():
+            raise ChecksumMismatch("Chunk checksum mismatch")
+        self._upload.flush()
+        offset = self._size + self._written
+        self._uploads._digests[self._upload_id] = (self._digest, offset)
+        return offset
+
+    def rollback(self) -> None:
+        self._upload.truncate(self._size)
+
+    def close(self) -> None:
+        self._upload.close()
+
+
+class ChunkedUploads:
+    """
+    Загрузка файла в staging хранилище частями: create -> open_chunk
+    (сколько угодно раз; после обрыва - с offset из offset()) -> complete.
+
+    Части пишутся на диск по мере чтения тела запроса, поэтому в памяти
+    API держится только очередной кусок тела, а не файл целиком. sha256
+    файла считается по мере записи. Состояние хэша хранится в процессе;
+    если часть дописал другой процесс API или процесс перезапущен, хэш
+    догоняется чтением недостающего хвоста файла с диска.
+
+    Часть принимается целиком или не принимается вовсе: при обрыве или
+    несовпадении контрольной суммы части файл обрезается до offset.
+    """
+
+    suffix = ".upload"
+
+    def __init__(self, storage: UploadStorage, max_chunk_size: int, ttl: int) -> None:
+        self.storage = storage
+        self.max_chunk_size = max_chunk_size
+        self.ttl = ttl
+        # upload_id -> (sha256 первых offset байт, offset)
+        self._digests: Dict[str, Tuple[Any, int]] = {}
+
+    def _path(self, upload_id: str) -> Path:
+        path = self.storage.path(f"{upload_id}{self.suffix}")
+        if not UPLOAD_ID_RE.match(upload_id) or not path.exists():
+            raise UploadNotFound("Upload not found")
+        return path
+
+    def _open_locked(self, upload_id: str) -> BinaryIO:
+        # Блокировка файла общая для всех процессов API на этом хранилище
+        upload = open(self._path(upload_id), "r+b")
+        try:
+            fcntl.flock(upload.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            upload.close()
+            raise UploadBusy("Upload is busy")
+        return upload
+
+    def _digest(self, upload_id: str, upload: BinaryIO, size: int) -> Any:
+        digest, hashed = self._digests.pop(upload_id, (None, 0))
+        if digest is None or hashed > size:
+            digest, hashed = hashlib.sha256(), 0
+        upload.seek(hashed)
+        while hashed < size:
+            chunk = upload.read(min(self.storage.chunk_size, size - hashed))
+            if not chunk:
+                break
+            digest.update(chunk)
+            hashed += len(chunk)
+        return digest
+
+    def create(self) -> str:
+        """:return: id новой загрузки."""
+        self.storage.root.mkdir(parents=True, exist_ok=True)
+        upload_id = uuid.uuid4().hex
+        self.storage.path(f"{upload_id}{self.suffix}").touch(exist_ok=False)
+        self._digests[upload_id] = (hashlib.sha256(), 0)
+        return upload_id
+
+    def offset(self, upload_id: str) -> int:
+        """:return: Сколько байт загрузки уже принято (с этого места продолжать)."""
+        return self._path(upload_id).stat().st_size
+
+    def open_chunk(self, upload_id: str, offset: int) -> ChunkWriter:
+        """
+        Начинает запись части в конец загрузки. Загрузка заблокирована
+        до ChunkWriter.close().
+
+        :param upload_id: id загрузки.
+        :param offset: Смещение части; должно совпадать с размером
+            уже принятых данных (иначе UploadOffsetMismatch с текущим offset).
+        :return: ChunkWriter
+        """
+        upload = self._open_locked(upload_id)
+        try:
+            size = os.fstat(upload.fileno()).st_size
+            if offset != size:
+                raise UploadOffsetMismatch(f"Upload offset is {size}, not {offset}")
+            return ChunkWriter(self, upload_id, upload, size)
+        except BaseException:
+            upload.close()
+            raise
+
+    def complete(self, upload_id: str, checksum: Optional[str] = None) -> StagedFile:
+        """
+        Завершает загрузку и переносит файл в staging хранилище.
+
+        :param upload_id: id загрузки.
+        :param checksum: sha256 всего файла (необязательно): при
+            несовпадении загрузка удаляется (ChecksumMismatch).
+        :return: StagedFile, который передается в цепочку задач.
+        """
+        upload = self._open_locked(upload_id)
+        try:
+            size = os.fstat(upload.fileno()).st_size
+            if not size:
+                raise EmptyUpload("Upload is empty")
+            actual = self._digest(upload_id, upload, size).hexdigest()
+            if checksum and actual != checksum.lower():
+                self.storage.path(f"{upload_id}{self.suffix}").unlink()
+                raise ChecksumMismatch("Checksum mismatch")
+            key = self.storage._new_key(".xml")
+            self.storage._commit(self.storage.path(f"{upload_id}{self.suffix}"), key)
+        finally:
+            upload.close()
+        my_logger.debug(f"Upload {upload_id} staged as {key} ({size} bytes)")
+        return StagedFile(key=key, checksum=actual, size=size)
+
+    def abort(self, upload_id: str) -> None:
+        self._path(upload_id).unlink(missing_ok=True)
+        self._digests.pop(upload_id, None)
+
+    def remove_expired(self, now: Optional[float] = None) -> int:
+        """
+        Удаляет брошенные загрузки, которые не дописывались дольше ttl.
+        :return: Количество удаленных загрузок.
+        """
+        cutoff = (now or time.time()) - self.ttl
+        removed = 0
+        for path in self.storage.root.glob(f"*{self.suffix}"):
+            try:
+                if path.stat().st_mtime >= cutoff:
+                    continue
+                path.unlink()
+            except FileNotFoundError:
+                # Загрузку только что завершили или отменили
+                continue
+            self._digests.pop(path.stem, None)
+            removed += 1
+        return removed
+
+
+upload_storage = UploadStorage(
+    root=settings.staging.staging_dir,
+    chunk_size=settings.staging.staging_chunk_size,
+)
+chunked_uploads = ChunkedUploads(
+    upload_storage,
+    max_chunk_size=settings.staging.upload_chunk_size,
+    ttl=settings.staging.upload_ttl,
+)
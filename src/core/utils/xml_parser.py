@@ -1,8 +1,45 @@
-from typing import Any, Dict, List
+import io
+import mmap
+import os
+import re
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
 
 import defusedxml.ElementTree as ET
 
 from src.core.utils.logging_config import my_logger
+from src.core.utils.staging import chunk_ranges
+
+XMLSource = Union[bytes, str, os.PathLike, BinaryIO]
+
+# Имя корневого элемента после пролога (<?xml ...?>, пробелов)
+ROOT_TAG_RE = re.compile(rb"<([^\s>/!?]+)")
+PRODUCTS_START_RE = re.compile(rb"<products[\s>]")
+# Начало элемента <product>, а не <product_id> и т.п.
+PRODUCT_START_RE = re.compile(rb"<product[\s>/]")
+
+
+def _product_to_record(product: Any, date: Optional[str]) -> Dict[str, Any]:
+    """
+    Преобразует элемент <product> в словарь с данными о продаже.
+    :param product: XML элемент товара.
+    :param date: Дата из атрибута корневого элемента.
+    :return: Dict[str, Any]
+    """
+    try:
+        return {
+            "name": product.find("name").text,
+            "quantity": int(product.find("quantity").text),
+            "price": float(product.find("price").text),
+            "category": product.find("category").text,
+            "date": str(date),
+        }
+    except AttributeError as ae:
+        my_logger.error(f"Missing required product field: {ae}")
+        raise ae
+
+    except ValueError as ve:
+        my_logger.error(f"Invalid data type for product field: {ve}")
+        raise ve
 
 
 def parse_xml(xml_content: bytes) -> List[Dict[str, Any]]:
@@ -29,23 +66,180 @@ def parse_xml(xml_content: bytes) -> List[Dict[str, Any]]:
         raise AttributeError("No <products> found in XML")
 
     for product in products:
+        sales_data.append(_product_to_record(product, date))
+
+    my_logger.info("XML parsed successfully")
+    return sales_data
+
+
+def iter_parse_xml(xml_source: XMLSource) -> Iterator[Dict[str, Any]]:
+    """
+    Потоково парсит XML контент и отдает товары по одному.
+
+    В отличие от parse_xml не строит дерево целиком: обработанные элементы
+    сразу очищаются, поэтому потребление памяти не зависит от размера файла.
+    Ошибки валидации те же, что и у parse_xml.
+
+    :param xml_source: XML контент (bytes), путь к файлу или бинарный файловый объект.
+    :return: Iterator[Dict[str, Any]]
+    """
+    my_logger.debug("Task iter_parse_xml started")
+    if isinstance(xml_source, bytes):
+        xml_source = io.BytesIO(xml_source)
+
+    root = None
+    products = None
+    products_done = False
+    date = None
+    depth = 0
+    count = 0
+
+    try:
+        for event, elem in ET.iterparse(xml_source, events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if depth == 1:
+                    # Извлечение даты из атрибута корневого элемента
+                    root = elem
+                    date = elem.attrib.get("date")
+                elif (
+                    depth == 2
+                    and products is None
+                    and not products_done
+                    and elem.tag == "products"
+                ):
+                    products = elem
+                continue
+
+            depth -= 1
+            if depth == 2 and products is not None:
+                count += 1
+                yield _product_to_record(elem, date)
+                # Освобождаем уже обработанные товары
+                products.clear()
+            elif depth == 1:
+                if elem is products:
+                    products = None
+                    products_done = True
+                root.clear()  # type: ignore[union-attr]
+    except ET.ParseError as e:
+        my_logger.error(str(e))
+        raise e
+
+    if not products_done:
+        my_logger.error("No <products> found in XML")
+        raise AttributeError("No <products> found in XML")
+
+    my_logger.info(f"XML parsed successfully, {count} products streamed")
+
+
+def split_products(
+    xml_file: BinaryIO, chunks: int, min_chunk_size: int
+) -> Tuple[int, str, List[Tuple[int, int]]]:
+    """
+    Делит содержимое <products> на диапазоны байт по границам <product>,
+    чтобы товары парсились параллельно (см. iter_parse_xml_range).
+
+    Каждый диапазон парсится как отдельный документ: заголовок файла до
+    <products> включительно + диапазон + закрывающие теги. Остальная часть
+    документа (заголовок и все после </products>) проверяется здесь же.
+
+    Файлы, которые нельзя безопасно разрезать по байтам (комментарии,
+    CDATA, DOCTYPE, UTF-16, нет <products>), не делятся: возвращается один
+    диапазон - весь файл, он парсится как есть.
+
+    :param xml_file: XML файл, открытый на чтение.
+    :param chunks: Желаемое количество диапазонов.
+    :param min_chunk_size: Минимальный размер диапазона в байтах.
+    :return: (конец заголовка, закрывающие теги, список (start, end))
+    """
+    size = os.fstat(xml_file.fileno()).st_size
+    whole_file: Tuple[int, str, List[Tuple[int, int]]] = (0, "", [(0, size)])
+    if not size:
+        return whole_file
+
+    with mmap.mmap(xml_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if data[:2] in (b"\xff\xfe", b"\xfe\xff") or data.find(b"<!") != -1:
+            return whole_file
+        root_tag = ROOT_TAG_RE.search(data)
+        products = PRODUCTS_START_RE.search(data)
+        if root_tag is None or products is None:
+            return whole_file
+        # latin-1 переносит байты имени как есть, в любой кодировке файла
+        suffix = f"</products></{root_tag.group(1).decode('latin-1')}>"
+        body_start = data.find(b">", products.start()) + 1
+        body_end = data.find(b"</products>", body_start)
+        if data[body_start - 2] == ord("/") or body_end == -1:
+            return whole_file
+
+        # Заголовок и хвост документа без товаров: те же ошибки, что и при
+        # последовательном парсинге, для частей вне <products>
         try:
-            sales_data.append(
-                {
-                    "name": product.find("name").text,
-                    "quantity": int(product.find("quantity").text),
-                    "price": float(product.find("price").text),
-                    "category": product.find("category").text,
-                    "date": str(date),
-                }
+            ET.fromstring(data[:body_start] + data[body_end:])
+        except ET.ParseError as e:
+            my_logger.error(str(e))
+            raise e
+
+        # Диапазоны равного размера сдвигаются к началу следующего <product>
+        bounds = [body_start]
+        for nominal, _ in chunk_ranges(body_end - body_start, chunks, min_chunk_size)[
+            1:
+        ]:
+            product = PRODUCT_START_RE.search(
+                data, max(body_start + nominal, bounds[-1] + 1), body_end
             )
-        except AttributeError as ae:
-            my_logger.error(f"Missing required product field: {ae}")
-            raise ae
+            if product is not None:
+                bounds.append(product.start())
+        bounds.append(body_end)
 
-        except ValueError as ve:
-            my_logger.error(f"Invalid data type for product field: {ve}")
-            raise ve
+    return body_start, suffix, list(zip(bounds, bounds[1:]))
 
-    my_logger.info("XML parsed successfully")
-    return sales_data
+
+class _XMLFragment(io.RawIOBase):
+    """
+    Файловый объект для iterparse: заголовок файла + диапазон байт +
+    закрывающие теги, без копирования диапазона в память целиком.
+    """
+
+    def __init__(
+        self, xml_file: BinaryIO, prefix_end: int, start: int, end: int, suffix: str
+    ) -> None:
+        self._file = xml_file
+        self._parts = [(0, prefix_end), (start, end)]
+        self._suffix = suffix.encode("latin-1")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: Any) -> int:
+        while self._parts:
+            position, end = self._parts[0]
+            if position >= end:
+                self._parts.pop(0)
+                continue
+            self._file.seek(position)
+            chunk = self._file.read(min(len(buffer), end - position))
+            self._parts[0] = (position + len(chunk), end)
+            buffer[: len(chunk)] = chunk
+            return len(chunk)
+        size = len(buffer)
+        chunk, self._suffix = self._suffix[:size], self._suffix[size:]
+        buffer[: len(chunk)] = chunk
+        return len(chunk)
+
+
+def iter_parse_xml_range(
+    xml_file: BinaryIO, prefix_end: int, start: int, end: int, suffix: str
+) -> Iterator[Dict[str, Any]]:
+    """
+    Потоково парсит товары из диапазона байт, полученного от split_products.
+    :param xml_file: XML файл, открытый на чтение.
+    :param prefix_end: Конец заголовка файла (до товаров).
+    :param start: Начало диапазона в байтах.
+    :param end: Конец диапазона в байтах.
+    :param suffix: Закрывающие теги документа.
+    :return: Iterator[Dict[str, Any]]
+    """
+    return iter_parse_xml(
+        io.BufferedReader(_XMLFragment(xml_file, prefix_end, start, end, suffix))
+    )
@@ -1,24 +1,30 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from typing import AsyncIterator
 
-import redis
 import uvicorn
 from fastapi import FastAPI, Request
-from fastapi_cache import FastAPICache
-from fastapi_cache.backends.redis import RedisBackend
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from starlette.responses import JSONResponse
 
 from src.api.v1 import router
-from src.core.config import settings
 from src.core.db_helper import db_helper
+from src.core.utils.response_cache import response_cache
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI) -> AsyncIterator[None]:
-    redis_cache = redis.from_url(settings.cache_url.redis_cache)
-    FastAPICache.init(RedisBackend(redis_cache), prefix="fastapi-cache")  # type: ignore
+    # События сброса кэша ответов от воркеров, записавших новые данные,
+    # и сброс счетчиков попаданий кэша в метрики
+    background = [
+        asyncio.create_task(response_cache.listen()),
+        asyncio.create_task(response_cache.report_stats()),
+    ]
     yield
+    for task in background:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
     await db_helper.dispose()
 
 
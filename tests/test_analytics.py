@@ -0,0 +1,172 @@
+import json
+from collections import namedtuple
+from datetime import date
+from typing import Callable, Dict, Generator, Iterable
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+
+from src.api.v1.cruds.product_crud import (
+    SUMMARY_UPSERT,
+    OrmQuery,
+    _full_months,
+    _top_query,
+)
+from src.api.v1.veiws.analytics_router import _check_range, get_revenue
+
+Row = namedtuple("Row", ["date", "quantity", "revenue"])
+
+
+# Замокировать создание секций products, БД в тестах нет
+@pytest.fixture(autouse=True)
+def mock_partitions() -> Generator[MagicMock, None, None]:
+    with patch("src.api.v1.cruds.product_crud.product_partitions") as MockPartitions:
+        MockPartitions.ensure = AsyncMock()
+        yield MockPartitions
+
+
+# Справочники названий: id по порядку названий в пачке, без БД
+@pytest.fixture(autouse=True)
+def mock_dimensions() -> Generator[None, None, None]:
+    def resolve(names: Iterable[str]) -> Dict[str, int]:
+        return {name: code for code, name in enumerate(dict.fromkeys(names), 1)}
+
+    with (
+        patch("src.api.v1.cruds.product_crud.product_dim_ids") as product_ids,
+        patch("src.api.v1.cruds.product_crud.category_dim_ids") as category_ids,
+    ):
+        product_ids.resolve = AsyncMock(side_effect=resolve)
+        category_ids.resolve = AsyncMock(side_effect=resolve)
+        yield
+
+
+@pytest.fixture(autouse=True)
+def mock_response_cache() -> Generator[MagicMock, None, None]:
+    with patch("src.api.v1.cruds.product_crud.response_cache") as mock_cache:
+        mock_cache.invalidate = AsyncMock()
+        yield mock_cache
+
+
+def test_full_months() -> None:
+    assert _full_months(date(2024, 1, 15), date(2024, 12, 20)) == (
+        date(2024, 2, 1),
+        date(2024, 12, 1),
+    )
+    assert _full_months(date(2024, 1, 1), date(2024, 12, 31)) == (
+        date(2024, 1, 1),
+        date(2025, 1, 1),
+    )
+    # Внутри одного месяца полных месяцев нет
+    month_from, month_before = _full_months(date(2024, 3, 3), date(2024, 3, 9))
+    assert month_from >= month_before
+
+
+def test_top_query_reads_months_and_edge_days() -> None:
+    stmt = _top_query("product", date(2024, 1, 15), date(2024, 12, 20), 10, "revenue")
+    params = stmt.compile().params
+
+    levels = sorted(value for key, value in params.items() if key.startswith("level"))
+    assert levels == ["product", "product", "product_month"]
+    assert "GROUP BY anon_1.category, anon_1.product" in str(stmt)
+
+
+def test_top_query_inside_one_month_reads_days() -> None:
+    stmt = _top_query("category", date(2024, 3, 3), date(2024, 3, 9), 5, "quantity")
+    params = stmt.compile().params
+
+    levels = [value for key, value in params.items() if key.startswith("level")]
+    assert levels == ["category"]
+    assert "ORDER BY quantity DESC" in str(stmt)
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_products_and_report_updates_summary() -> None:
+    data = [
+        {
+            "name": "Product1",
+            "price": 10.0,
+            "quantity": 2,
+            "category": "A",
+            "date": "2024-01-01",
+        }
+    ]
+
+    with patch("src.core.db_helper.db_helper.session_factory") as mock_session_factory:
+        mock_session = AsyncMock()
+        mock_session.add = MagicMock()
+        mock_session.begin = MagicMock()
+        mock_session_factory.return_value.__aenter__.return_value = mock_session
+        mock_connection = mock_session.connection.return_value
+
+        await OrmQuery.bulk_create_products_and_report("Sample Report", data)
+
+        report = mock_session.add.call_args.args[0]
+        # Итоги пишутся в той же транзакции, после товаров
+        mock_connection.execute.assert_awaited_once_with(
+            SUMMARY_UPSERT, {"report_id": report.id}
+        )
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_without_products_skips_summary() -> None:
+    with patch("src.core.db_helper.db_helper.session_factory") as mock_session_factory:
+        mock_session = AsyncMock()
+        mock_session.add = MagicMock()
+        mock_session.begin = MagicMock()
+        mock_session_factory.return_value.__aenter__.return_value = mock_session
+
+        await OrmQuery.bulk_create_products_and_report("Sample Report", [])
+
+        mock_session.connection.return_value.execute.assert_not_awaited()
+
+
+def test_check_range_rejects_reversed_dates() -> None:
+    _check_range(date(2024, 1, 1), date(2024, 1, 1))
+
+    with pytest.raises(HTTPException) as excinfo:
+        _check_range(date(2024, 2, 1), date(2024, 1, 1))
+
+    assert excinfo.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_get_revenue_sums_days() -> None:
+    days = [
+        Row(date=date(2024, 1, 1), quantity=2, revenue=20.0),
+        Row(date=date(2024, 1, 2), quantity=3, revenue=15.0),
+    ]
+
+    async def load_through(scope: str, key: str, loader: Callable) -> bytes:
+        # Промах кэша: ответ считается loader
+        return await loader()
+
+    with (
+        patch(
+            "src.api.v1.veiws.analytics_router.OrmQuery.get_revenue",
+            AsyncMock(return_value=days),
+        ) as mock_get_revenue,
+        patch("src.core.db_helper.db_helper.session_factory") as mock_session_factory,
+        patch("src.core.utils.fast_json.response_cache") as mock_cache,
+    ):
+        mock_session = mock_session_factory.return_value.__aenter__.return_value
+        mock_cache.get_or_load = AsyncMock(side_effect=load_through)
+        response = await get_revenue(
+            date_from=date(2024, 1, 1),
+            date_to=date(2024, 1, 31),
+            accept_encoding=None,
+        )
+
+    # Общий для ожидающих запросов loader открывает свою сессию, а не
+    # берет сессию первого запроса, которую FastAPI закроет при его отмене
+    mock_get_revenue.assert_awaited_once_with(
+        mock_session, date(2024, 1, 1), date(2024, 1, 31)
+    )
+    cache_call = mock_cache.get_or_load.await_args
+    assert cache_call is not None
+    scope, key, _ = cache_call.args
+    assert (scope, key) == ("analytics", "revenue:2024-01-01:2024-01-31")
+    body = json.loads(response.body)
+    assert body["quantity"] == 5
+    assert body["revenue"] == 35.0
+    assert body["days"][1] == {"date": "2024-01-02", "quantity": 3, "revenue": 15.0}
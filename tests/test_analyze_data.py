@@ -1,6 +1,10 @@
+import math
+import random
+from typing import Any, Dict, List, Tuple
+
 import pytest
 
-from src.core.utils.data_analyzer import analyze_data
+from src.core.utils.data_analyzer import SalesAggregator, analyze_data
 
 
 def test_analyze_data_with_valid_sales_data() -> None:
@@ -66,3 +70,226 @@ def test_analyze_data_with_single_sale() -> None:
     assert result[1] == expected_total_revenue
     assert result[2] == expected_top_products_str
     assert result[3] == expected_categories_str
+
+
+def test_sales_aggregator_matches_analyze_data() -> None:
+    sales_data = [
+        {
+            "date": "2023-10-01",
+            "name": f"Product {i % 7}",
+            "category": f"Category {i % 3}",
+            "quantity": i % 5 + 1,
+            "price": 2.5,
+        }
+        for i in range(100)
+    ]
+
+    aggregator = SalesAggregator()
+    for sale in sales_data:
+        aggregator.add(sale)
+
+    assert aggregator.summary() == analyze_data(sales_data)
+
+
+def test_sales_aggregator_consume_passes_records_through() -> None:
+    sales_data = [
+        {
+            "date": "2023-10-01",
+            "name": "Product A",
+            "category": "Category 1",
+            "quantity": 3,
+            "price": 5.0,
+        },
+        {
+            "date": "2023-10-01",
+            "name": "Product B",
+            "category": "Category 1",
+            "quantity": 1,
+            "price": 10.0,
+        },
+    ]
+
+    aggregator = SalesAggregator()
+    assert list(aggregator.consume(iter(sales_data))) == sales_data
+    assert aggregator.summary() == (
+        "2023-10-01",
+        25.0,
+        "Product A (3), Product B (1)",
+        "Category 1: 4",
+    )
+
+
+def test_sales_aggregator_empty() -> None:
+    with pytest.raises(ValueError, match="Data is empty."):
+        SalesAggregator().summary()
+
+
+def test_sales_aggregator_merge_of_partials_matches_analyze_data() -> None:
+    sales_data = [
+        {
+            "date": "2023-10-01",
+            "name": f"Product {i % 11}",
+            "category": f"Category {i % 4}",
+            "quantity": i % 6 + 1,
+            "price": 1.5,
+        }
+        for i in range(120)
+    ]
+
+    partials = []
+    for start in range(0, len(sales_data), 25):
+        partial = SalesAggregator()
+        partial.update(sales_data[start:][:25])
+        # Частичные агрегаты передаются между задачами в сериализованном виде
+        partials.append(SalesAggregator.from_dict(partial.to_dict()))
+
+    merged = partials[0]
+    for partial in partials[1:]:
+        merged.merge(partial)
+
+    assert merged.summary() == analyze_data(sales_data)
+
+
+def test_sales_aggregator_merge_into_empty() -> None:
+    partial = SalesAggregator()
+    partial.add(
+        {
+            "date": "2023-10-01",
+            "name": "Product A",
+            "category": "Category 1",
+            "quantity": 2,
+            "price": 3.0,
+        }
+    )
+
+    assert SalesAggregator().merge(partial).summary() == partial.summary()
+
+
+def make_priced_sales(size: int, seed: int) -> List[Dict[str, Any]]:
+    # Цены с копейками не представимы точно в float
+    rnd = random.Random(seed)
+    return [
+        {
+            "date": "2023-10-01",
+            "name": f"Product {rnd.randint(0, 20)}",
+            "category": f"Category {rnd.randint(0, 4)}",
+            "quantity": rnd.randint(1, 50),
+            "price": rnd.randint(1, 99999) / 100,
+        }
+        for _ in range(size)
+    ]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_merged_revenue_does_not_depend_on_chunks(seed: int) -> None:
+    sales_data = make_priced_sales(500, seed)
+    rnd = random.Random(seed)
+    bounds = sorted(rnd.sample(range(1, len(sales_data)), 6))
+    partials = []
+    for start, end in zip([0, *bounds], [*bounds, len(sales_data)]):
+        partial = SalesAggregator()
+        partial.update(sales_data[start:end])
+        partials.append(SalesAggregator.from_dict(partial.to_dict()))
+    # Части приходят в chord в любом порядке
+    rnd.shuffle(partials)
+
+    merged = SalesAggregator()
+    for partial in partials:
+        merged.merge(partial)
+
+    expected = analyze_data(sales_data)
+    assert merged.total_revenue == expected[1]
+    assert expected[1] == math.fsum(
+        sale["quantity"] * sale["price"] for sale in sales_data
+    )
+
+
+def test_revenue_of_19_99_prices() -> None:
+    sale = {
+        "date": "2023-10-01",
+        "name": "Product A",
+        "category": "Category 1",
+        "quantity": 1,
+        "price": 19.99,
+    }
+    sequential = SalesAggregator()
+    sequential.update([sale] * 10)
+    left, right = SalesAggregator(), SalesAggregator()
+    left.update([sale] * 3)
+    right.update([sale] * 7)
+
+    assert left.merge(right).total_revenue == sequential.total_revenue
+    assert sequential.total_revenue == math.fsum([19.99] * 10)
+
+
+def loop_analyze_data(sales_data: List[Dict[str, Any]]) -> Tuple[str, float, str, str]:
+    # Прежняя реализация analyze_data: словари и сложение выручки по порядку
+    total_revenue = 0.0
+    product_sales: Dict[str, int] = {}
+    category_distribution: Dict[str, int] = {}
+    for sale in sales_data:
+        total_revenue += sale["quantity"] * sale["price"]
+        product_sales[sale["name"]] = (
+            product_sales.get(sale["name"], 0) + sale["quantity"]
+        )
+        category_distribution[sale["category"]] = (
+            category_distribution.get(sale["category"], 0) + sale["quantity"]
+        )
+    top_products = sorted(product_sales.items(), key=lambda x: x[1], reverse=True)[:3]
+    return (
+        sales_data[0]["date"],
+        total_revenue,
+        ", ".join(f"{name} ({quantity})" for name, quantity in top_products),
+        ", ".join(f"{cat}: {qty}" for cat, qty in category_distribution.items()),
+    )
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_analyze_data_matches_loop_except_revenue_rounding(seed: int) -> None:
+    sales_data = make_priced_sales(300, seed)
+    # Возвраты и много одинаковых количеств: топ меняется и делит места
+    for sale in random.Random(seed).sample(sales_data, 30):
+        sale["quantity"] = -sale["quantity"]
+
+    result = analyze_data(sales_data)
+    expected = loop_analyze_data(sales_data)
+
+    assert (result[0], result[2], result[3]) == (expected[0], expected[2], expected[3])
+    # Выручка - точная сумма (math.fsum), а не сумма по порядку
+    assert result[1] == math.fsum(
+        sale["quantity"] * sale["price"] for sale in sales_data
+    )
+    assert result[1] == pytest.approx(expected[1], rel=1e-12)
+
+
+def test_revenue_deviates_from_sequential_sum() -> None:
+    sales_data = [
+        {
+            "date": "2023-10-01",
+            "name": "Product A",
+            "category": "Category 1",
+            "quantity": 1,
+            "price": 0.1,
+        }
+    ] * 10
+
+    # Сложение по порядку дает 0.9999999999999999
+    assert loop_analyze_data(sales_data)[1] != 1.0
+    assert analyze_data(sales_data)[1] == 1.0
+
+
+def test_top_products_heap_stays_bounded() -> None:
+    aggregator = SalesAggregator(top_n=2)
+    aggregator.update(make_priced_sales(200, 0))
+
+    assert len(aggregator._top) == 2
+    assert (
+        aggregator.top_products()
+        == sorted(aggregator.product_sales.items(), key=lambda x: x[1], reverse=True)[
+            :2
+        ]
+    )
+
+    empty_top = SalesAggregator(top_n=0)
+    empty_top.update(make_priced_sales(10, 0))
+    assert empty_top.top_products() == []
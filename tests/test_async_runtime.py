@@ -0,0 +1,54 @@
+import asyncio
+from typing import Generator
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.celery.async_runtime import WorkerEventLoop
+
+
+@pytest.fixture
+def worker_loop() -> Generator[WorkerEventLoop, None, None]:
+    loop = WorkerEventLoop()
+    yield loop
+    with patch("src.celery.async_runtime.db_helper.dispose", AsyncMock()):
+        loop.shutdown()
+
+
+async def current_loop() -> asyncio.AbstractEventLoop:
+    return asyncio.get_running_loop()
+
+
+def test_run_reuses_one_loop(worker_loop: WorkerEventLoop) -> None:
+    first = worker_loop.run(current_loop())
+    second = worker_loop.run(current_loop())
+
+    assert first is second
+    assert first.is_running()
+
+
+def test_run_propagates_exceptions(worker_loop: WorkerEventLoop) -> None:
+    async def fail() -> None:
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        worker_loop.run(fail())
+
+
+def test_reset_creates_new_loop(worker_loop: WorkerEventLoop) -> None:
+    parent_loop = worker_loop.run(current_loop())
+
+    # Так выглядит процесс после fork: поток родительского loop не существует
+    worker_loop.reset()
+
+    assert worker_loop.run(current_loop()) is not parent_loop
+
+
+def test_shutdown_disposes_engine_in_loop(worker_loop: WorkerEventLoop) -> None:
+    worker_loop.run(current_loop())
+
+    with patch("src.celery.async_runtime.db_helper.dispose", AsyncMock()) as dispose:
+        worker_loop.shutdown()
+
+    dispose.assert_awaited_once()
+    assert worker_loop._loop is None
@@ -0,0 +1,222 @@
+import gzip
+import io
+import tarfile
+import zipfile
+from pathlib import Path
+from typing import Callable, Dict, List
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+import zstandard
+from fastapi import HTTPException, UploadFile
+
+from src.api.v1.veiws.xml_router import get_batch_status, parse_xml_batch_endpoint
+from src.core.utils.archives import BatchBudget, iter_xml_files, stage_xml_files
+from src.core.utils.staging import UploadStorage
+
+XML_A = b"<sales_data date='2024-01-01'><products/></sales_data>"
+XML_B = b"<sales_data date='2024-01-02'><products/></sales_data>"
+
+
+def make_zip(files: Dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def make_tar(files: Dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as archive:
+        for name, content in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+def zstd_compress(content: bytes) -> bytes:
+    return zstandard.ZstdCompressor().compress(content)
+
+
+def read_all(content: bytes, filename: str) -> Dict[str, bytes]:
+    budget = BatchBudget(max_files=10, max_size=1024 * 1024)
+    return {
+        name: stream.read()
+        for name, stream in iter_xml_files(io.BytesIO(content), filename, budget)
+    }
+
+
+@pytest.fixture
+def storage(tmp_path: Path) -> UploadStorage:
+    return UploadStorage(root=str(tmp_path), chunk_size=16)
+
+
+def test_zip_members_skip_service_files() -> None:
+    content = make_zip(
+        {
+            "a.xml": XML_A,
+            "day/b.XML": XML_B,
+            "__MACOSX/day/._b.XML": b"junk",
+            "readme.txt": b"text",
+        }
+    )
+
+    assert read_all(content, "sales.zip") == {"a.xml": XML_A, "day/b.XML": XML_B}
+
+
+@pytest.mark.parametrize(
+    "compress", [gzip.compress, zstd_compress], ids=["tar.gz", "tar.zst"]
+)
+def test_compressed_tar_is_read_as_stream(compress: Callable[[bytes], bytes]) -> None:
+    content = compress(make_tar({"a.xml": XML_A, "b.xml": XML_B, "c.txt": b"x"}))
+
+    assert read_all(content, "sales.tar") == {"a.xml": XML_A, "b.xml": XML_B}
+
+
+def test_single_compressed_xml() -> None:
+    assert read_all(gzip.compress(XML_A), "day.xml.gz") == {"day.xml": XML_A}
+    assert read_all(zstd_compress(XML_B), "day.xml.zst") == {"day.xml": XML_B}
+    # Несжатый файл отдается как есть
+    assert read_all(XML_A, "day.xml") == {"day.xml": XML_A}
+
+
+def test_multi_frame_zstd_is_read_to_the_end() -> None:
+    content = zstd_compress(XML_A[:20]) + zstd_compress(XML_A[20:])
+
+    assert read_all(content, "day.xml.zst") == {"day.xml": XML_A}
+
+
+def test_decompression_limit_stops_zip_bomb(storage: UploadStorage) -> None:
+    content = gzip.compress(b"<a/>" * 100_000)
+    budget = BatchBudget(max_files=10, max_size=1000)
+
+    with pytest.raises(HTTPException) as excinfo:
+        stage_xml_files(storage, io.BytesIO(content), "bomb.xml.gz", budget)
+
+    assert excinfo.value.status_code == 413
+    # Недописанный файл не остается в хранилище
+    assert not list(storage.root.iterdir())
+
+
+def test_too_many_files_removes_staged(storage: UploadStorage) -> None:
+    content = make_zip({"a.xml": XML_A, "b.xml": XML_B})
+    budget = BatchBudget(max_files=1, max_size=1024 * 1024)
+
+    with pytest.raises(HTTPException) as excinfo:
+        stage_xml_files(storage, io.BytesIO(content), "sales.zip", budget)
+
+    assert excinfo.value.status_code == 413
+    assert not list(storage.root.iterdir())
+
+
+@pytest.mark.asyncio
+async def test_batch_schedules_group_and_reuses_duplicates(
+    storage: UploadStorage,
+) -> None:
+    archive = UploadFile(
+        io.BytesIO(make_zip({"a.xml": XML_A, "b.xml": XML_B, "a2.xml": XML_A})),
+        filename="sales.zip",
+    )
+    claimed: Dict[str, str] = {}
+
+    async def claim(checksum: str, task_id: str) -> str | None:
+        # Повтор файла внутри пакета получает id первой задачи
+        existing = claimed.get(checksum)
+        claimed.setdefault(checksum, task_id)
+        return existing
+
+    with (
+        patch("src.api.v1.veiws.xml_router.upload_storage", storage),
+        patch("src.api.v1.veiws.xml_router.upload_index") as mock_index,
+        patch("src.api.v1.veiws.xml_router.metrics", AsyncMock()),
+        patch("src.api.v1.veiws.xml_router.pipeline_store") as mock_store,
+        patch("src.celery.celery_worker.report_pipeline") as mock_pipeline,
+        patch("celery.group") as mock_group,
+    ):
+        mock_index.get = AsyncMock(return_value=None)
+        mock_index.claim = AsyncMock(side_effect=claim)
+        mock_store.register = AsyncMock()
+
+        response = await parse_xml_batch_endpoint(files=[archive])
+
+    files: List[dict] = response["files"]
+    assert [file["name"] for file in files] == ["a.xml", "b.xml", "a2.xml"]
+    assert files[2] == {
+        "name": "a2.xml",
+        "task_id": files[0]["task_id"],
+        "duplicate": True,
+    }
+    assert response["duplicates"] == 1
+    # Две цепочки одной группой под id пакета
+    assert [call.args[1] for call in mock_pipeline.call_args_list] == [
+        files[0]["task_id"],
+        files[1]["task_id"],
+    ]
+    # Обе цепочки записаны в pipeline_store одним запросом
+    register_call = mock_store.register.await_args
+    assert register_call is not None
+    assert list(register_call.args[0]) == [
+        files[0]["task_id"],
+        files[1]["task_id"],
+    ]
+    mock_group.return_value.apply_async.assert_called_once_with(
+        task_id=response["batch_id"]
+    )
+    mock_group.return_value.apply_async.return_value.save.assert_called_once()
+    # Дубликат удален из хранилища
+    assert len(list(storage.root.iterdir())) == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_without_xml_is_rejected(storage: UploadStorage) -> None:
+    archive = UploadFile(
+        io.BytesIO(make_zip({"readme.txt": b"text"})), filename="sales.zip"
+    )
+
+    with patch("src.api.v1.veiws.xml_router.upload_storage", storage):
+        with pytest.raises(HTTPException) as excinfo:
+            await parse_xml_batch_endpoint(files=[archive])
+
+    assert excinfo.value.status_code == 400
+
+
+def stage_result(
+    task_id: str, state: str, parent: MagicMock | None = None
+) -> MagicMock:
+    result = MagicMock(id=task_id, state=state)
+    result.parent = parent
+    result.result = "boom" if state == "FAILURE" else {"report_id": 1}
+    return result
+
+
+@pytest.mark.asyncio
+async def test_batch_status_aggregates_pipelines() -> None:
+    done = stage_result("save-1", "SUCCESS", stage_result("file-1", "SUCCESS"))
+    # Упал парсинг: последняя задача цепочки так и осталась PENDING
+    failed = stage_result("save-2", "PENDING", stage_result("file-2", "FAILURE"))
+    running = stage_result("save-3", "PENDING", stage_result("file-3", "STARTED"))
+
+    with patch("src.api.v1.veiws.xml_router.GroupResult") as mock_group_result:
+        mock_group_result.restore.return_value.results = [done, failed, running]
+        response = await get_batch_status("batch-1")
+
+    assert response["status"] == "PROGRESS"
+    assert (response["total"], response["completed"], response["failed"]) == (3, 1, 1)
+    assert response["files"][1] == {
+        "task_id": "file-2",
+        "status": "FAILURE",
+        "result": "boom",
+    }
+    assert response["files"][2]["task_id"] == "file-3"
+
+
+@pytest.mark.asyncio
+async def test_unknown_batch() -> None:
+    with patch("src.api.v1.veiws.xml_router.GroupResult") as mock_group_result:
+        mock_group_result.restore.return_value = None
+        with pytest.raises(HTTPException) as excinfo:
+            await get_batch_status("batch-1")
+
+    assert excinfo.value.status_code == 404
@@ -0,0 +1,61 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.celery.celery_app import WORKER_STAGES, celery_app, select_stage_queue
+from src.core.config import settings
+
+TASKS = "src.celery.celery_worker"
+
+
+def route(task: str) -> str:
+    return celery_app.amqp.router.route({}, f"{TASKS}.{task}", (), {})["queue"].name
+
+
+@pytest.mark.parametrize(
+    "task, queue",
+    [
+        ("task_parse_and_analyze_xml", settings.celery.parse_queue),
+        ("task_parse_xml", settings.celery.parse_queue),
+        ("task_parse_chunk", settings.celery.parse_queue),
+        ("task_generate_report", settings.celery.llm_queue),
+        ("task_generate_reports_batch", settings.celery.llm_queue),
+        ("task_save_result_to_db", settings.celery.db_queue),
+        ("process_backfill", settings.celery.default_queue),
+        ("task_remove_expired_uploads", settings.celery.default_queue),
+    ],
+)
+def test_tasks_are_routed_to_stage_queues(task: str, queue: str) -> None:
+    assert route(task) == queue
+
+
+def test_stage_queues_have_own_routing_keys() -> None:
+    queues = celery_app.conf.task_queues
+
+    # Иначе каждая задача попадала бы во все очереди обменника
+    assert sorted(queue.routing_key for queue in queues) == sorted(
+        queue.name for queue in queues
+    )
+    assert {queue.name for queue in queues} == {
+        queue for queue, _, _ in WORKER_STAGES.values()
+    }
+
+
+def test_stage_worker_consumes_only_its_queue() -> None:
+    worker = MagicMock()
+
+    with patch.object(settings.celery, "celery_worker_stage", "llm"):
+        select_stage_queue(instance=worker, options={"queues": None})
+
+    worker.app.amqp.queues.select.assert_called_once_with(settings.celery.llm_queue)
+
+
+def test_explicit_queues_override_stage() -> None:
+    worker = MagicMock()
+
+    with patch.object(settings.celery, "celery_worker_stage", "llm"):
+        select_stage_queue(instance=worker, options={"queues": "parse,db"})
+    # Без стадии воркер читает все очереди, как раньше
+    select_stage_queue(instance=worker, options={})
+
+    worker.app.amqp.queues.select.assert_not_called()
@@ -0,0 +1,250 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import AsyncIterator, Iterable, List, Optional
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+
+from src.api.v1.veiws.xml_router import append_upload_chunk, complete_upload, get_upload
+from src.core.utils.staging import (
+    ChecksumMismatch,
+    ChunkedUploads,
+    ChunkTooLarge,
+    StagedFile,
+    UploadNotFound,
+    UploadOffsetMismatch,
+    UploadStorage,
+)
+
+CONTENT = b"<sales_data date='2024-01-01'><products/></sales_data>"
+
+
+@pytest.fixture
+def uploads(tmp_path: Path) -> ChunkedUploads:
+    return ChunkedUploads(
+        UploadStorage(root=str(tmp_path), chunk_size=4), max_chunk_size=32, ttl=60
+    )
+
+
+def append(
+    uploads: ChunkedUploads,
+    upload_id: str,
+    offset: int,
+    pieces: Iterable[bytes],
+    checksum: Optional[str] = None,
+) -> int:
+    # Так часть пишет API: write по мере чтения тела, rollback при ошибке
+    writer = uploads.open_chunk(upload_id, offset)
+    try:
+        try:
+            for piece in pieces:
+                writer.write(piece)
+            return writer.commit(checksum)
+        except BaseException:
+            writer.rollback()
+            raise
+    finally:
+        writer.close()
+
+
+def upload_all(uploads: ChunkedUploads, upload_id: str, size: int) -> None:
+    offset = 0
+    for start in range(0, len(CONTENT), size):
+        chunk = CONTENT[start:][:size]
+        offset = append(uploads, upload_id, offset, [chunk])
+
+
+def test_chunks_are_staged_with_checksum(uploads: ChunkedUploads) -> None:
+    upload_id = uploads.create()
+    upload_all(uploads, upload_id, 16)
+
+    staged = uploads.complete(upload_id, hashlib.sha256(CONTENT).hexdigest())
+
+    assert staged.size == len(CONTENT)
+    assert staged.checksum == hashlib.sha256(CONTENT).hexdigest()
+    assert uploads.storage.path(staged.key).read_bytes() == CONTENT
+    # Сама загрузка перенесена в хранилище
+    with pytest.raises(UploadNotFound):
+        uploads.offset(upload_id)
+
+
+def test_checksum_catches_up_after_restart(uploads: ChunkedUploads) -> None:
+    upload_id = uploads.create()
+    append(uploads, upload_id, 0, [CONTENT[:10]])
+    # Следующую часть принял другой процесс API: хэша в памяти нет
+    uploads._digests.clear()
+    append(uploads, upload_id, 10, [CONTENT[10:40]])
+    append(uploads, upload_id, 40, [CONTENT[40:]])
+
+    staged = uploads.complete(upload_id)
+
+    assert staged.checksum == hashlib.sha256(CONTENT).hexdigest()
+
+
+def test_wrong_offset_is_rejected(uploads: ChunkedUploads) -> None:
+    upload_id = uploads.create()
+    append(uploads, upload_id, 0, [CONTENT[:10]])
+
+    # Повтор уже принятой части
+    with pytest.raises(UploadOffsetMismatch, match="offset is 10, not 0"):
+        append(uploads, upload_id, 0, [CONTENT[:10]])
+
+    assert uploads.offset(upload_id) == 10
+
+
+def test_broken_chunk_is_rolled_back(uploads: ChunkedUploads) -> None:
+    upload_id = uploads.create()
+    append(uploads, upload_id, 0, [CONTENT[:10]])
+
+    def interrupted() -> Iterable[bytes]:
+        yield CONTENT[10:15]
+        raise ConnectionError("client disconnected")
+
+    with pytest.raises(ConnectionError):
+        append(uploads, upload_id, 10, interrupted())
+    with pytest.raises(ChecksumMismatch):
+        append(uploads, upload_id, 10, [b"x" * 10], checksum="0" * 64)
+    with pytest.raises(ChunkTooLarge):
+        append(uploads, upload_id, 10, [b"x" * 20, b"x" * 20])
+
+    # Ни одна сломанная часть не осталась в файле
+    assert uploads.offset(upload_id) == 10
+    append(
+        uploads,
+        upload_id,
+        10,
+        [CONTENT[10:30]],
+        checksum=hashlib.sha256(CONTENT[10:30]).hexdigest(),
+    )
+    append(uploads, upload_id, 30, [CONTENT[30:]])
+    assert uploads.complete(upload_id).checksum == hashlib.sha256(CONTENT).hexdigest()
+
+
+def test_complete_rejects_checksum_mismatch(uploads: ChunkedUploads) -> None:
+    upload_id = uploads.create()
+    append(uploads, upload_id, 0, [CONTENT[:10]])
+
+    with pytest.raises(ChecksumMismatch):
+        uploads.complete(upload_id, "0" * 64)
+
+    assert not list(uploads.storage.root.iterdir())
+
+
+def test_unknown_upload_id(uploads: ChunkedUploads) -> None:
+    for upload_id in ("0" * 32, "../../etc/passwd"):
+        with pytest.raises(UploadNotFound):
+            uploads.offset(upload_id)
+
+
+def test_remove_expired(uploads: ChunkedUploads) -> None:
+    stale, fresh = uploads.create(), uploads.create()
+    stale_path = uploads.storage.path(f"{stale}.upload")
+    mtime = stale_path.stat().st_mtime
+    fresh_path = uploads.storage.path(f"{fresh}.upload")
+    os.utime(stale_path, (mtime - 120, mtime - 120))
+
+    assert uploads.remove_expired() == 1
+    assert not stale_path.exists()
+    assert fresh_path.exists()
+
+
+def test_remove_expired_skips_completed_uploads(uploads: ChunkedUploads) -> None:
+    stale = uploads.create()
+    stale_path = uploads.storage.path(f"{stale}.upload")
+    mtime = stale_path.stat().st_mtime
+    os.utime(stale_path, (mtime - 120, mtime - 120))
+    # Загрузку завершили между листингом и stat: файла уже нет
+    completed_path = uploads.storage.path(f"{'0' * 32}.upload")
+
+    with patch.object(Path, "glob", return_value=[completed_path, stale_path]):
+        assert uploads.remove_expired() == 1
+    assert not stale_path.exists()
+
+
+@pytest.mark.asyncio
+async def test_complete_upload_enqueues_staged_file(
+    uploads: ChunkedUploads,
+) -> None:
+    upload_id = uploads.create()
+    upload_all(uploads, upload_id, 20)
+    enqueued: List[dict] = []
+
+    async def enqueue(staged_xml: StagedFile) -> dict:
+        enqueued.append(staged_xml.model_dump())
+        return {"result": "The report is being generated", "task_id": "task"}
+
+    with (
+        patch("src.api.v1.veiws.xml_router.chunked_uploads", uploads),
+        patch(
+            "src.api.v1.veiws.xml_router._enqueue_staged_xml",
+            AsyncMock(side_effect=enqueue),
+        ),
+    ):
+        response = await complete_upload(upload_id, checksum=None)
+
+    assert response["task_id"] == "task"
+    # В цепочку уходит только ссылка на файл
+    assert enqueued[0]["size"] == len(CONTENT)
+    assert set(enqueued[0]) == {"key", "checksum", "size"}
+
+
+def request_with_body(*pieces: bytes) -> MagicMock:
+    async def stream() -> AsyncIterator[bytes]:
+        for piece in pieces:
+            yield piece
+
+    request = MagicMock()
+    request.stream = stream
+    return request
+
+
+@pytest.mark.asyncio
+async def test_append_endpoint_writes_chunk(uploads: ChunkedUploads) -> None:
+    upload_id = uploads.create()
+
+    with patch("src.api.v1.veiws.xml_router.chunked_uploads", uploads):
+        response = await append_upload_chunk(
+            upload_id, request_with_body(CONTENT[:5], CONTENT[5:10]), 0, None
+        )
+
+    assert response["offset"] == 10
+    assert uploads.offset(upload_id) == 10
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "offset, pieces, checksum, status_code",
+    [
+        (5, [CONTENT[:10]], None, 409),
+        (0, [b"x" * 20, b"x" * 20], None, 413),
+        (0, [CONTENT[:10]], "0" * 64, 422),
+    ],
+)
+async def test_append_endpoint_maps_upload_errors(
+    uploads: ChunkedUploads,
+    offset: int,
+    pieces: List[bytes],
+    checksum: Optional[str],
+    status_code: int,
+) -> None:
+    upload_id = uploads.create()
+
+    with patch("src.api.v1.veiws.xml_router.chunked_uploads", uploads):
+        with pytest.raises(HTTPException) as excinfo:
+            await append_upload_chunk(
+                upload_id, request_with_body(*pieces), offset, checksum
+            )
+
+    assert excinfo.value.status_code == status_code
+    assert uploads.offset(upload_id) == 0
+
+
+@pytest.mark.asyncio
+async def test_unknown_upload_is_404(uploads: ChunkedUploads) -> None:
+    with patch("src.api.v1.veiws.xml_router.chunked_uploads", uploads):
+        with pytest.raises(HTTPException) as excinfo:
+            await get_upload("0" * 32)
+
+    assert excinfo.value.status_code == 404
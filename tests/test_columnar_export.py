@@ -0,0 +1,128 @@
+import io
+from datetime import datetime
+from typing import Any, AsyncIterator, List, Sequence
+from unittest.mock import patch
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+import pytest
+from fastapi import HTTPException
+
+from src.api.v1.veiws.xml_router import export_sales_product_columnar
+from src.core.config import settings
+from src.core.utils.columnar_export import (
+    PRODUCT_ARROW_SCHEMA,
+    choose_columnar_format,
+    encode_columnar,
+)
+
+ROWS = [
+    (1, "Product1", 2, 10.5, "A", datetime(2024, 1, 1)),
+    (2, "Продукт 2", 3, 99.99, "B", datetime(2024, 1, 2, 12, 30)),
+    (3, "Product3", 1, 5.0, "A", datetime(2024, 1, 3)),
+]
+
+
+async def batches_of(rows: List[Any], size: int) -> AsyncIterator[Sequence[Any]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:][:size]
+
+
+async def encode(export_format: str, size: int = 1) -> List[bytes]:
+    return [
+        chunk async for chunk in encode_columnar(batches_of(ROWS, size), export_format)
+    ]
+
+
+def test_choose_columnar_format() -> None:
+    assert choose_columnar_format(None) == "arrow"
+    assert choose_columnar_format("*/*") == "arrow"
+    assert choose_columnar_format("application/vnd.apache.parquet") == "parquet"
+    assert choose_columnar_format("application/x-parquet, */*;q=0.1") == "parquet"
+    assert (
+        choose_columnar_format(
+            "application/vnd.apache.parquet;q=0.5, "
+            "application/vnd.apache.arrow.stream"
+        )
+        == "arrow"
+    )
+    assert choose_columnar_format("application/json") is None
+    assert choose_columnar_format("application/vnd.apache.parquet;q=0") is None
+
+
+@pytest.mark.asyncio
+async def test_arrow_stream_round_trip() -> None:
+    chunks = await encode("arrow")
+
+    # Каждая пачка из БД уходит клиенту отдельной частью ответа
+    assert len(chunks) > len(ROWS)
+    table = ipc.open_stream(b"".join(chunks)).read_all()
+    assert table.schema == PRODUCT_ARROW_SCHEMA
+    assert [tuple(row.values()) for row in table.to_pylist()] == ROWS
+
+
+@pytest.mark.asyncio
+async def test_parquet_round_trip_by_row_groups() -> None:
+    with patch.object(settings.db, "export_parquet_row_group_size", 2):
+        chunks = await encode("parquet")
+
+    parquet = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+    assert [
+        parquet.metadata.row_group(i).num_rows
+        for i in range(parquet.metadata.num_row_groups)
+    ] == [2, 1]
+    table = parquet.read()
+    assert table.schema == PRODUCT_ARROW_SCHEMA.remove_metadata()
+    assert [tuple(row.values()) for row in table.to_pylist()] == ROWS
+
+
+@pytest.mark.asyncio
+async def test_export_rejects_long_range() -> None:
+    with pytest.raises(HTTPException) as excinfo:
+        await export_sales_product_columnar(
+            date_from=datetime(2024, 1, 1).date(),
+            date_to=datetime(2025, 1, 1).date(),
+            accept=None,
+        )
+
+    assert excinfo.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_export_rejects_unsupported_accept() -> None:
+    with pytest.raises(HTTPException) as excinfo:
+        await export_sales_product_columnar(
+            date_from=datetime(2024, 1, 1).date(),
+            date_to=datetime(2024, 1, 31).date(),
+            accept="text/csv",
+        )
+
+    assert excinfo.value.status_code == 406
+
+
+@pytest.mark.asyncio
+async def test_export_streams_parquet() -> None:
+    with patch(
+        "src.api.v1.veiws.xml_router.OrmQuery.stream_products_by_range",
+        return_value=batches_of(ROWS, 2),
+    ) as mock_stream:
+        response = await export_sales_product_columnar(
+            date_from=datetime(2024, 1, 1).date(),
+            date_to=datetime(2024, 1, 31).date(),
+            accept="application/vnd.apache.parquet",
+        )
+        body = b""
+        async for chunk in response.body_iterator:
+            assert isinstance(chunk, bytes)
+            body += chunk
+
+    assert mock_stream.call_args.args[:2] == (
+        datetime(2024, 1, 1).date(),
+        datetime(2024, 1, 31).date(),
+    )
+    assert response.media_type == "application/vnd.apache.parquet"
+    assert "products-2024-01-01-2024-01-31.parquet" in (
+        response.headers["content-disposition"]
+    )
+    assert pq.read_table(pa.BufferReader(body)).num_rows == len(ROWS)
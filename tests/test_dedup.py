@@ -0,0 +1,230 @@
+from typing import Dict
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.api.v1.veiws.xml_router import _enqueue_staged_xml
+from src.core.config import settings
+from src.core.utils.dedup import UploadIndex
+from src.core.utils.staging import StagedFile
+
+
+@pytest.fixture
+def staged_xml() -> StagedFile:
+    return StagedFile(key="upload.xml", checksum="a" * 64, size=10)
+
+
+@pytest.fixture
+def mock_redis() -> AsyncMock:
+    return AsyncMock()
+
+
+@pytest.fixture
+def index(mock_redis: AsyncMock) -> UploadIndex:
+    upload_index = UploadIndex(url="redis://localhost", ttl=60)
+    upload_index._client = mock_redis
+    return upload_index
+
+
+@pytest.mark.asyncio
+async def test_claim_new_file(index: UploadIndex, mock_redis: AsyncMock) -> None:
+    mock_redis.set.return_value = True
+
+    assert await index.claim("abc", "task-1") is None
+    mock_redis.set.assert_awaited_once_with("xml-upload:abc", "task-1", nx=True, ex=60)
+
+
+@pytest.mark.asyncio
+async def test_claim_existing_file(index: UploadIndex, mock_redis: AsyncMock) -> None:
+    mock_redis.set.return_value = None
+    mock_redis.get.return_value = "task-0"
+
+    assert await index.claim("abc", "task-1") == "task-0"
+
+
+@pytest.mark.asyncio
+async def test_enqueue_returns_existing_task_for_duplicate(
+    staged_xml: StagedFile,
+) -> None:
+    with (
+        patch("src.api.v1.veiws.xml_router.upload_index") as mock_index,
+        patch("src.api.v1.veiws.xml_router.metrics", AsyncMock()) as mock_metrics,
+        patch("src.api.v1.veiws.xml_router.upload_storage") as mock_storage,
+        patch("src.api.v1.veiws.xml_router.AsyncResult") as mock_result,
+        patch("src.api.v1.veiws.xml_router.pipeline_store") as mock_store,
+        patch("src.celery.celery_worker.report_pipeline") as mock_pipeline,
+    ):
+        mock_index.get = AsyncMock(return_value="task-0")
+        mock_store.get = AsyncMock(return_value=None)
+        mock_result.return_value.state = "SUCCESS"
+
+        response = await _enqueue_staged_xml(staged_xml)
+
+    assert response["task_id"] == "task-0"
+    assert response["duplicate"] is True
+    mock_pipeline.assert_not_called()
+    mock_storage.delete.assert_called_once_with(staged_xml)
+    mock_metrics.aincr.assert_awaited_once_with("dedup_hits")
+
+
+@pytest.mark.asyncio
+async def test_enqueue_starts_chain_for_new_file(staged_xml: StagedFile) -> None:
+    with (
+        patch("src.api.v1.veiws.xml_router.upload_index") as mock_index,
+        patch("src.api.v1.veiws.xml_router.metrics", AsyncMock()),
+        patch("src.api.v1.veiws.xml_router.pipeline_store") as mock_store,
+        patch("src.celery.celery_worker.report_pipeline") as mock_pipeline,
+    ):
+        mock_index.get = AsyncMock(return_value=None)
+        mock_index.claim = AsyncMock(return_value=None)
+        mock_store.register = AsyncMock()
+
+        response = await _enqueue_staged_xml(staged_xml)
+
+    task_id = response["task_id"]
+    assert response.get("duplicate") is None
+    mock_index.claim.assert_awaited_once_with(staged_xml.checksum, task_id)
+    # Цепочка отправляется сразу, без промежуточной задачи
+    mock_pipeline.assert_called_once_with(staged_xml.model_dump(), task_id)
+    register_call = mock_store.register.await_args
+    assert register_call is not None
+    assert list(register_call.args[0]) == [task_id]
+    # Небольшой файл идет в приоритетную полосу
+    mock_pipeline.return_value.apply_async.assert_called_once_with(
+        priority=settings.celery.interactive_priority
+    )
+
+
+@pytest.mark.asyncio
+async def test_enqueue_reprocesses_failed_file(staged_xml: StagedFile) -> None:
+    with (
+        patch("src.api.v1.veiws.xml_router.upload_index") as mock_index,
+        patch("src.api.v1.veiws.xml_router.metrics", AsyncMock()),
+        patch("src.api.v1.veiws.xml_router.AsyncResult") as mock_result,
+        patch("src.api.v1.veiws.xml_router.pipeline_store") as mock_store,
+        patch("src.celery.celery_worker.report_pipeline") as mock_pipeline,
+    ):
+        mock_index.get = AsyncMock(return_value="task-0")
+        mock_index.replace = AsyncMock()
+        mock_store.get = AsyncMock(return_value=None)
+        mock_store.register = AsyncMock()
+        mock_result.return_value.state = "FAILURE"
+
+        response = await _enqueue_staged_xml(staged_xml)
+
+    assert response["task_id"] != "task-0"
+    mock_index.replace.assert_awaited_once_with(
+        staged_xml.checksum, response["task_id"]
+    )
+    assert mock_pipeline.return_value.apply_async.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_enqueue_removes_staged_file_when_dispatch_fails(
+    staged_xml: StagedFile,
+) -> None:
+    with (
+        patch("src.api.v1.veiws.xml_router.upload_index") as mock_index,
+        patch("src.api.v1.veiws.xml_router.metrics", AsyncMock()),
+        patch("src.api.v1.veiws.xml_router.upload_storage") as mock_storage,
+        patch("src.api.v1.veiws.xml_router.pipeline_store") as mock_store,
+        patch("src.celery.celery_worker.report_pipeline") as mock_pipeline,
+    ):
+        mock_index.get = AsyncMock(return_value=None)
+        mock_index.claim = AsyncMock(return_value=None)
+        mock_index.release = AsyncMock()
+        mock_store.register = AsyncMock()
+        mock_pipeline.return_value.apply_async.side_effect = ConnectionError()
+
+        with pytest.raises(ConnectionError):
+            await _enqueue_staged_xml(staged_xml)
+
+    mock_storage.delete.assert_called_once_with(staged_xml)
+    mock_index.release.assert_awaited_once_with(staged_xml.checksum)
+
+
+@pytest.mark.asyncio
+async def test_enqueue_removes_staged_file_when_redis_fails(
+    staged_xml: StagedFile,
+) -> None:
+    with (
+        patch("src.api.v1.veiws.xml_router.upload_index") as mock_index,
+        patch("src.api.v1.veiws.xml_router.upload_storage") as mock_storage,
+    ):
+        mock_index.get = AsyncMock(side_effect=ConnectionError())
+
+        with pytest.raises(ConnectionError):
+            await _enqueue_staged_xml(staged_xml)
+
+    mock_storage.delete.assert_called_once_with(staged_xml)
+
+
+STAGES = [
+    ("task-0", "task_parse_and_analyze_xml"),
+    ("report-0", "task_generate_report"),
+    ("save-0", "task_save_result_to_db"),
+]
+
+
+def stage_states(states: Dict[str, str]) -> MagicMock:
+    return MagicMock(side_effect=lambda task_id: MagicMock(state=states[task_id]))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "states, reprocessed",
+    [
+        # Первая задача успешна, но отчет LLM не получен
+        ({"task-0": "SUCCESS", "report-0": "FAILURE", "save-0": "PENDING"}, True),
+        ({"task-0": "SUCCESS", "report-0": "SUCCESS", "save-0": "FAILURE"}, True),
+        # Цепочка еще идет
+        ({"task-0": "SUCCESS", "report-0": "STARTED", "save-0": "PENDING"}, False),
+        ({"task-0": "SUCCESS", "report-0": "SUCCESS", "save-0": "SUCCESS"}, False),
+    ],
+)
+async def test_enqueue_checks_every_pipeline_stage(
+    staged_xml: StagedFile, states: Dict[str, str], reprocessed: bool
+) -> None:
+    with (
+        patch("src.api.v1.veiws.xml_router.upload_index") as mock_index,
+        patch("src.api.v1.veiws.xml_router.metrics", AsyncMock()),
+        patch("src.api.v1.veiws.xml_router.upload_storage"),
+        patch("src.api.v1.veiws.xml_router.AsyncResult", stage_states(states)),
+        patch("src.api.v1.veiws.xml_router.pipeline_store") as mock_store,
+        patch("src.celery.celery_worker.report_pipeline") as mock_pipeline,
+    ):
+        mock_index.get = AsyncMock(return_value="task-0")
+        mock_index.replace = AsyncMock()
+        mock_store.get = AsyncMock(return_value=(STAGES, {}))
+        mock_store.register = AsyncMock()
+
+        response = await _enqueue_staged_xml(staged_xml)
+
+    assert (response["task_id"] != "task-0") is reprocessed
+    assert mock_pipeline.called is reprocessed
+
+
+def test_backfill_releases_files_without_report() -> None:
+    from src.celery.celery_worker import task_generate_reports_batch
+
+    summary = ("2024-01-01", 1.0, "A (1)", "Books: 1")
+    products = [
+        {"key": f"{i}.ndjson", "checksum": "b" * 64, "size": 1} for i in range(3)
+    ]
+    analyze_reports = [None, (summary, products[1]), (summary, products[2])]
+
+    with (
+        patch("src.celery.celery_worker.upload_index") as mock_index,
+        patch("src.celery.celery_worker.upload_storage"),
+        patch("src.celery.celery_worker.run_async") as mock_run_async,
+        patch("src.celery.celery_worker.generate_reports_batch", MagicMock()),
+        patch.object(task_generate_reports_batch, "replace") as mock_replace,
+    ):
+        mock_run_async.side_effect = [None, ["report", None], None]
+
+        task_generate_reports_batch(analyze_reports, upload_checksums=["a", "b", "c"])
+
+    # Битый файл и файл без отчета снова можно загрузить
+    assert [call.args for call in mock_index.release.call_args_list] == [("a",), ("c",)]
+    (save,) = mock_replace.call_args.args[0].tasks
+    assert save.kwargs == {"upload_checksum": "b"}
@@ -0,0 +1,79 @@
+from typing import Generator
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.core import ProductDim
+from src.core.utils.dimensions import DimensionIds
+
+
+@pytest.fixture
+def mock_conn() -> Generator[AsyncMock, None, None]:
+    conn = AsyncMock()
+    with patch("src.core.utils.dimensions.db_helper") as mock_db_helper:
+        mock_db_helper.engine.begin.return_value.__aenter__.return_value = conn
+        yield conn
+
+
+def selected(conn: AsyncMock, rows: list) -> None:
+    inserted = MagicMock()
+    result = MagicMock()
+    result.all.return_value = rows
+    conn.execute.side_effect = [inserted, result]
+
+
+@pytest.mark.asyncio
+async def test_new_names_are_inserted_once(mock_conn: AsyncMock) -> None:
+    ids = DimensionIds(ProductDim, max_size=10)
+    selected(mock_conn, [("A", 1), ("B", 2)])
+
+    assert await ids.resolve(["B", "A", "B"]) == {"A": 1, "B": 2}
+
+    insert, select = mock_conn.execute.await_args_list
+    assert "INSERT INTO product_dim" in str(insert.args[0])
+    assert "ON CONFLICT (name) DO NOTHING" in str(insert.args[0])
+    # Новые названия уходят в БД без повторов и по порядку
+    assert insert.args[1] == select.args[1] == {"names": ["A", "B"]}
+
+    # Повторно - из кэша процесса, без запросов
+    mock_conn.execute.reset_mock()
+    assert (await ids.resolve(["A"]))["A"] == 1
+    mock_conn.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_only_missing_names_are_queried(mock_conn: AsyncMock) -> None:
+    ids = DimensionIds(ProductDim, max_size=10)
+    selected(mock_conn, [("A", 1)])
+    await ids.resolve(["A"])
+    selected(mock_conn, [("C", 3)])
+
+    assert await ids.resolve(["A", "C"]) == {"A": 1, "C": 3}
+    assert mock_conn.execute.await_args.args[1] == {"names": ["C"]}
+
+
+@pytest.mark.asyncio
+async def test_full_cache_is_cleared(mock_conn: AsyncMock) -> None:
+    ids = DimensionIds(ProductDim, max_size=2)
+    selected(mock_conn, [("A", 1), ("B", 2)])
+    await ids.resolve(["A", "B"])
+    selected(mock_conn, [("C", 3)])
+
+    # Из БД запрашиваются только новые названия, в кэше остается пачка
+    assert await ids.resolve(["B", "C"]) == {"B": 2, "C": 3}
+    assert mock_conn.execute.await_args.args[1] == {"names": ["C"]}
+    assert len(ids) == 2
+
+
+@pytest.mark.asyncio
+async def test_resolved_ids_survive_cache_eviction(mock_conn: AsyncMock) -> None:
+    ids = DimensionIds(ProductDim, max_size=2)
+    selected(mock_conn, [("A", 1), ("B", 2)])
+    first = await ids.resolve(["A", "B"])
+    selected(mock_conn, [("C", 3), ("D", 4)])
+
+    await ids.resolve(["C", "D"])
+
+    # Словарь, полученный раньше, не меняется при вытеснении из кэша
+    assert first == {"A": 1, "B": 2}
+    assert len(ids) == 2
@@ -0,0 +1,135 @@
+import gzip
+from collections import namedtuple
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Callable, Generator
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import orjson
+import pytest
+
+from src.api.v1.veiws.xml_router import get_sales_product
+from src.core.config import settings
+from src.core.schemas.schemas import ProductPage
+from src.core.utils.fast_json import (
+    cached_json_response,
+    choose_encoding,
+    rows_to_dicts,
+)
+from src.core.utils.product_export import PRODUCT_RESPONSE_COLUMNS
+
+
+@pytest.fixture
+def mock_cache() -> Generator[MagicMock, None, None]:
+    async def load_through(scope: str, key: str, loader: Callable) -> bytes:
+        return await loader()
+
+    with patch("src.core.utils.fast_json.response_cache") as mock_cache:
+        mock_cache.get_or_load = AsyncMock(side_effect=load_through)
+        yield mock_cache
+
+
+@pytest.fixture
+def compression() -> Generator[None, None, None]:
+    with (
+        patch.object(settings.api_response, "api_compression", True),
+        patch.object(settings.api_response, "api_compression_min_size", 100),
+    ):
+        yield
+
+
+def test_rows_json_matches_pydantic_response() -> None:
+    rows = [
+        ("Product1", 2, 10.5, "A", datetime(2024, 1, 1), 1),
+        ("Продукт 2", 3, 99.99, "B", datetime(2024, 1, 1, 12, 30), 2),
+    ]
+    page = {"items": rows_to_dicts(PRODUCT_RESPONSE_COLUMNS, rows), "next_after_id": 2}
+
+    # Быстрый режим отдает тот же JSON, что и pydantic модель ответа
+    assert (
+        orjson.dumps(page)
+        == ProductPage.model_validate(page).model_dump_json().encode()
+    )
+
+
+def test_choose_encoding() -> None:
+    assert choose_encoding(None) is None
+    assert choose_encoding("deflate, gzip;q=0") is None
+    assert choose_encoding("GZIP; q=0.5") == "gzip"
+    assert choose_encoding("gzip, deflate, br") == "br"
+    assert choose_encoding("gzip, br;q=0") == "gzip"
+
+
+@pytest.mark.asyncio
+async def test_response_without_compression(mock_cache: MagicMock) -> None:
+    response = await cached_json_response(
+        "2024-01-01", "reports", AsyncMock(return_value=b"{}" * 1000), "gzip"
+    )
+
+    assert response.body == b"{}" * 1000
+    assert "content-encoding" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_large_response_is_compressed(
+    mock_cache: MagicMock, compression: None
+) -> None:
+    body = b"[" + b"1," * 1000 + b"1]"
+
+    response = await cached_json_response(
+        "2024-01-01", "reports", AsyncMock(return_value=body), "gzip, deflate"
+    )
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert gzip.decompress(response.body) == body
+    # Сжатый вариант кэшируется отдельной записью
+    keys = [call.args[1] for call in mock_cache.get_or_load.await_args_list]
+    assert keys == ["reports", "reports:gzip"]
+
+
+@pytest.mark.asyncio
+async def test_small_response_is_not_compressed(
+    mock_cache: MagicMock, compression: None
+) -> None:
+    response = await cached_json_response(
+        "2024-01-01", "reports", AsyncMock(return_value=b"{}"), "gzip"
+    )
+
+    assert response.body == b"{}"
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fast_json", [False, True], ids=["orm", "fast"])
+async def test_sales_product_keeps_list_response(
+    mock_cache: MagicMock, fast_json: bool
+) -> None:
+    product = {
+        "name": "Product1",
+        "quantity": 2,
+        "price": 10.5,
+        "category": "A",
+        "date": datetime(2024, 1, 1),
+        "id": 1,
+    }
+    row = namedtuple("Row", PRODUCT_RESPONSE_COLUMNS)(**product)
+
+    with (
+        patch.object(settings.api_response, "api_fast_json", fast_json),
+        patch("src.core.db_helper.db_helper.session_factory"),
+        patch("src.api.v1.veiws.xml_router.OrmQuery") as mock_orm,
+    ):
+        mock_orm.get_product_by_date = AsyncMock(
+            return_value=[SimpleNamespace(**product)]
+        )
+        mock_orm.get_product_rows_by_date = AsyncMock(return_value=[row])
+        response = await get_sales_product(
+            date_value=datetime(2024, 1, 1).date(), accept_encoding=None
+        )
+
+    # Без постраничного режима ответ - прежний список товаров за день
+    assert orjson.loads(response.body) == [{**product, "date": "2024-01-01T00:00:00"}]
+    scope, key, _ = mock_cache.get_or_load.await_args_list[0].args
+    assert (scope, key) == ("2024-01-01", "sales-product")
@@ -1,19 +1,35 @@
+import asyncio
+import threading
 from typing import Generator
 from unittest.mock import AsyncMock, MagicMock, Mock, patch
 
+import httpx
 import pytest
+from openai import RateLimitError
 
 from src.core.config import settings
-from src.core.utils.sales_data_prompt import generate_report_content
+from src.core.utils.sales_data_prompt import (
+    build_prompt,
+    generate_report_content,
+    generate_reports_batch,
+)
 
 
 # Замокировать клиент OpenAI
 @pytest.fixture
 def mock_openai() -> Generator[MagicMock | AsyncMock, None, None]:
-    with patch("src.core.utils.sales_data_prompt.OpenAI") as MockOpenAI:
+    with patch("src.core.utils.sales_data_prompt.get_openai_client") as MockOpenAI:
         yield MockOpenAI
 
 
+# Замокировать кэш ответов LLM, по умолчанию - промах
+@pytest.fixture(autouse=True)
+def mock_llm_cache() -> Generator[MagicMock, None, None]:
+    with patch("src.core.utils.sales_data_prompt.llm_cache") as MockCache:
+        MockCache.get.return_value = None
+        yield MockCache
+
+
 def test_generate_report_content_success(mock_openai: MagicMock) -> None:
     # Создаем мока для результата, который вернет наш фейковый клиент OpenAI
     mock_completion_response = Mock()
@@ -70,3 +86,187 @@ def test_generate_report_content_failure(mock_openai: MagicMock) -> None:
         generate_report_content(date, total_revenue, top_products, categories)
 
     assert str(exc_info.value) == "API error"
+
+
+def test_generate_report_content_cache_hit(
+    mock_openai: MagicMock, mock_llm_cache: MagicMock
+) -> None:
+    mock_llm_cache.get.return_value = "Cached report."
+
+    report = generate_report_content(
+        "2023-10-10", 10000, "ProductA (20)", "Category1: 30"
+    )
+
+    assert report == "Cached report."
+    mock_openai.assert_not_called()
+    mock_llm_cache.set.assert_not_called()
+
+
+def test_generate_report_content_stores_result_in_cache(
+    mock_openai: MagicMock, mock_llm_cache: MagicMock
+) -> None:
+    mock_client = mock_openai.return_value
+    mock_client.chat.completions.create.return_value = Mock(
+        choices=[Mock(message=Mock(content="Fresh report."))]
+    )
+
+    generate_report_content("2023-10-10", 10000, "ProductA (20)", "Category1: 30")
+
+    prompt = build_prompt("2023-10-10", 10000, "ProductA (20)", "Category1: 30")
+    mock_llm_cache.get.assert_called_once_with(
+        prompt, settings.openapi.openai_gpt_model
+    )
+    mock_llm_cache.set.assert_called_once_with(
+        prompt, settings.openapi.openai_gpt_model, "Fresh report."
+    )
+
+
+@pytest.fixture
+def mock_async_openai() -> Generator[MagicMock, None, None]:
+    with patch(
+        "src.core.utils.sales_data_prompt.get_async_openai_client"
+    ) as MockAsyncOpenAI:
+        yield MockAsyncOpenAI.return_value
+
+
+def make_completion(content: str) -> Mock:
+    return Mock(choices=[Mock(message=Mock(content=content))])
+
+
+def rate_limit_error() -> RateLimitError:
+    request = httpx.Request("POST", "http://llm/chat/completions")
+    response = httpx.Response(429, request=request, headers={"retry-after": "0"})
+    return RateLimitError("Rate limit", response=response, body=None)
+
+
+@pytest.mark.asyncio
+async def test_generate_reports_batch_bounded_concurrency(
+    mock_async_openai: MagicMock,
+) -> None:
+    in_flight = 0
+    max_in_flight = 0
+
+    async def create(model: str, messages: list) -> Mock:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return make_completion(messages[0]["content"].split("за ")[1].split(":")[0])
+
+    mock_async_openai.chat.completions.create = AsyncMock(side_effect=create)
+    summaries = [(f"2024-01-{day:02}", 100, "A (1)", "X: 1") for day in range(1, 11)]
+
+    reports = await generate_reports_batch(summaries, concurrency=3)
+
+    assert reports == [summary[0] for summary in summaries]
+    assert max_in_flight == 3
+
+
+@pytest.mark.asyncio
+async def test_generate_reports_batch_sends_identical_prompts_once(
+    mock_async_openai: MagicMock,
+) -> None:
+    mock_async_openai.chat.completions.create = AsyncMock(
+        return_value=make_completion("Report.")
+    )
+    summary = ("2024-01-01", 100, "A (1)", "X: 1")
+
+    reports = await generate_reports_batch([summary, summary, summary])
+
+    assert reports == ["Report.", "Report.", "Report."]
+    assert mock_async_openai.chat.completions.create.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_generate_reports_batch_retries_rate_limit(
+    mock_async_openai: MagicMock,
+) -> None:
+    mock_async_openai.chat.completions.create = AsyncMock(
+        side_effect=[rate_limit_error(), make_completion("Report.")]
+    )
+
+    with patch("src.core.utils.sales_data_prompt.asyncio.sleep") as mock_sleep:
+        reports = await generate_reports_batch([("2024-01-01", 100, "A (1)", "X: 1")])
+
+    assert reports == ["Report."]
+    mock_sleep.assert_awaited_once_with(0.0)  # Retry-After из ответа
+
+
+@pytest.mark.asyncio
+async def test_generate_reports_batch_returns_none_for_failed(
+    mock_async_openai: MagicMock,
+) -> None:
+    async def create(model: str, messages: list) -> Mock:
+        if "2024-01-02" in messages[0]["content"]:
+            raise Exception("API error")
+        return make_completion("Report.")
+
+    mock_async_openai.chat.completions.create = AsyncMock(side_effect=create)
+
+    reports = await generate_reports_batch(
+        [
+            ("2024-01-01", 100, "A (1)", "X: 1"),
+            ("2024-01-02", 100, "A (1)", "X: 1"),
+        ]
+    )
+
+    assert reports == ["Report.", None]
+
+
+def test_generate_report_content_streams_chunks(mock_openai: MagicMock) -> None:
+    mock_client = mock_openai.return_value
+    mock_client.chat.completions.create.return_value = iter(
+        [
+            Mock(choices=[Mock(delta=Mock(content="Отчет"))]),
+            Mock(choices=[]),
+            Mock(choices=[Mock(delta=Mock(content=" готов"))]),
+            Mock(choices=[Mock(delta=Mock(content=None))]),
+        ]
+    )
+    chunks: list[str] = []
+
+    report = generate_report_content(
+        "2023-10-10", 100, "A (1)", "C: 1", on_chunk=chunks.append
+    )
+
+    assert report == "Отчет готов"
+    assert chunks == ["Отчет", " готов"]
+    assert mock_client.chat.completions.create.call_args.kwargs["stream"] is True
+
+
+def test_generate_report_content_streams_cached_report(
+    mock_openai: MagicMock, mock_llm_cache: MagicMock
+) -> None:
+    mock_llm_cache.get.return_value = "cached report"
+    chunks: list[str] = []
+
+    generate_report_content("2023-10-10", 100, "A (1)", "C: 1", on_chunk=chunks.append)
+
+    assert chunks == ["cached report"]
+    mock_openai.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_generate_reports_batch_does_not_block_loop_on_cache(
+    mock_async_openai: MagicMock, mock_llm_cache: MagicMock
+) -> None:
+    cache_threads = []
+
+    def cache_get(prompt: str, model: str) -> None:
+        cache_threads.append(threading.current_thread())
+
+    def cache_set(prompt: str, model: str, content: str) -> None:
+        cache_threads.append(threading.current_thread())
+
+    mock_llm_cache.get.side_effect = cache_get
+    mock_llm_cache.set.side_effect = cache_set
+    mock_async_openai.chat.completions.create = AsyncMock(
+        return_value=make_completion("Report.")
+    )
+
+    reports = await generate_reports_batch([("2024-01-01", 100, "A (1)", "X: 1")])
+
+    assert reports == ["Report."]
+    assert len(cache_threads) == 2
+    assert threading.main_thread() not in cache_threads
@@ -0,0 +1,98 @@
+from typing import Generator
+from unittest.mock import MagicMock, patch
+
+import pytest
+import redis
+
+from src.core.utils.llm_cache import LLMCache
+
+
+@pytest.fixture
+def mock_metrics() -> Generator[MagicMock, None, None]:
+    with patch("src.core.utils.llm_cache.metrics") as MockMetrics:
+        yield MockMetrics
+
+
+@pytest.fixture
+def redis_client() -> MagicMock:
+    return MagicMock()
+
+
+@pytest.fixture
+def cache(redis_client: MagicMock) -> LLMCache:
+    llm_cache = LLMCache(url="redis://localhost", ttl=60, max_entries=2)
+    llm_cache._client = redis_client
+    return llm_cache
+
+
+def test_make_key_ignores_indentation() -> None:
+    prompt = """
+    Проанализируй данные:
+        1. Общая выручка: 100
+    """
+
+    key = LLMCache.make_key(prompt, "gpt")
+
+    assert key == LLMCache.make_key(
+        "Проанализируй данные:\n1. Общая выручка: 100", "gpt"
+    )
+    assert key != LLMCache.make_key(prompt, "other-model")
+    assert key.startswith(LLMCache.prefix)
+
+
+def test_get_hit_updates_access_time_and_ttl(
+    cache: LLMCache, redis_client: MagicMock, mock_metrics: MagicMock
+) -> None:
+    redis_client.getex.return_value = "report"
+
+    with patch("src.core.utils.llm_cache.time.time", return_value=100.0):
+        assert cache.get("prompt", "gpt") == "report"
+
+    key = LLMCache.make_key("prompt", "gpt")
+    # Ключ живет ttl с последнего обращения, как и его время в индексе
+    redis_client.getex.assert_called_once_with(key, ex=60)
+    redis_client.zadd.assert_called_once_with(cache.index_key, {key: 100.0})
+    mock_metrics.incr.assert_called_once_with("llm_cache_hits")
+
+
+def test_get_miss(
+    cache: LLMCache, redis_client: MagicMock, mock_metrics: MagicMock
+) -> None:
+    redis_client.getex.return_value = None
+
+    assert cache.get("prompt", "gpt") is None
+    mock_metrics.incr.assert_called_once_with("llm_cache_misses")
+
+
+def test_get_redis_error_is_a_miss(
+    cache: LLMCache, redis_client: MagicMock, mock_metrics: MagicMock
+) -> None:
+    redis_client.getex.side_effect = redis.ConnectionError("down")
+
+    assert cache.get("prompt", "gpt") is None
+
+
+def test_set_evicts_least_recently_used(
+    cache: LLMCache, redis_client: MagicMock, mock_metrics: MagicMock
+) -> None:
+    pipe = redis_client.pipeline.return_value.__enter__.return_value
+    pipe.execute.return_value = [True, 1, 0, 3]
+    redis_client.zrange.return_value = ["llm-cache:old"]
+
+    cache.set("prompt", "gpt", "report")
+
+    pipe.set.assert_called_once_with(
+        LLMCache.make_key("prompt", "gpt"), "report", ex=60
+    )
+    redis_client.zrange.assert_called_once_with(cache.index_key, 0, 0)
+    pipe.delete.assert_called_once_with("llm-cache:old")
+    mock_metrics.incr.assert_called_once_with("llm_cache_evictions", 1)
+
+
+def test_disabled_cache_does_nothing(cache: LLMCache, redis_client: MagicMock) -> None:
+    cache.enabled = False
+
+    assert cache.get("prompt", "gpt") is None
+    cache.set("prompt", "gpt", "report")
+    redis_client.getex.assert_not_called()
+    redis_client.pipeline.assert_not_called()
@@ -0,0 +1,25 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.core.utils.metrics import Metrics
+
+
+@pytest.mark.asyncio
+async def test_snapshot_adds_hit_rates() -> None:
+    metrics = Metrics(url="redis://localhost")
+    metrics._async_client = MagicMock()
+    metrics._async_client.hgetall = AsyncMock(
+        return_value={
+            b"response_cache_l1_hits": b"3",
+            b"response_cache_l1_misses": b"1",
+            b"response_cache_l2_hits": b"0",
+            b"upload_stage_seconds_sum": b"1.5",
+        }
+    )
+
+    snapshot = await metrics.snapshot()
+
+    assert snapshot["response_cache_l1_hit_rate"] == 0.75
+    assert snapshot["upload_stage_seconds_sum"] == 1.5
+    assert "response_cache_l2_hit_rate" not in snapshot  # обращений еще не было
@@ -0,0 +1,122 @@
+import asyncio
+import os
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from openai import AsyncOpenAI
+
+from src.celery.async_runtime import WorkerEventLoop
+from src.core.utils.openai_client import OpenAIClientManager
+
+
+def test_client_is_reused() -> None:
+    manager = OpenAIClientManager()
+
+    assert manager.get_client() is manager.get_client()
+
+
+def test_reset_drops_clients() -> None:
+    manager = OpenAIClientManager()
+    client = manager.get_client()
+
+    manager.reset()
+
+    assert manager.get_client() is not client
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="fork is not available")
+def test_client_is_recreated_in_forked_child() -> None:
+    from src.core.utils.openai_client import openai_clients
+
+    parent_client = openai_clients.get_client()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        same = openai_clients.get_client() is parent_client
+        os.write(write_fd, b"1" if same else b"0")
+        os._exit(0)
+
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    assert os.read(read_fd, 1) == b"0"
+    os.close(read_fd)
+
+
+def test_async_client_is_reused_within_loop() -> None:
+    manager = OpenAIClientManager()
+
+    async def get_twice() -> bool:
+        return manager.get_async_client() is manager.get_async_client()
+
+    assert asyncio.run(get_twice())
+
+
+def test_async_client_leaves_retries_to_batch_backoff() -> None:
+    manager = OpenAIClientManager()
+
+    async def get_client() -> AsyncOpenAI:
+        return manager.get_async_client()
+
+    assert asyncio.run(get_client()).max_retries == 0
+
+
+def test_async_client_is_recreated_for_new_loop() -> None:
+    manager = OpenAIClientManager()
+
+    async def get_client() -> object:
+        return manager.get_async_client()
+
+    assert asyncio.run(get_client()) is not asyncio.run(get_client())
+
+
+def test_previous_async_client_is_closed_in_its_loop() -> None:
+    manager = OpenAIClientManager()
+
+    async def get_client() -> AsyncOpenAI:
+        return manager.get_async_client()
+
+    old_loop = asyncio.new_event_loop()
+    try:
+        old_client = old_loop.run_until_complete(get_client())
+
+        new_client = asyncio.run(get_client())
+    finally:
+        old_loop.close()
+
+    assert old_client.is_closed()
+    assert not new_client.is_closed()
+
+
+def test_previous_async_client_is_closed_in_running_loop() -> None:
+    manager = OpenAIClientManager()
+    worker_loop = WorkerEventLoop()
+
+    async def get_client() -> AsyncOpenAI:
+        return manager.get_async_client()
+
+    old_client = worker_loop.run(get_client())
+    try:
+        asyncio.run(get_client())
+    finally:
+        with patch("src.celery.async_runtime.db_helper.dispose", AsyncMock()):
+            worker_loop.shutdown()
+
+    assert old_client.is_closed()
+
+
+def test_worker_loop_shutdown_closes_async_client() -> None:
+    worker_loop = WorkerEventLoop()
+    manager = OpenAIClientManager()
+
+    async def get_client() -> AsyncOpenAI:
+        return manager.get_async_client()
+
+    client = worker_loop.run(get_client())
+    with (
+        patch("src.celery.async_runtime.db_helper.dispose", AsyncMock()),
+        patch("src.celery.async_runtime.openai_clients", manager),
+    ):
+        worker_loop.shutdown()
+
+    assert client.is_closed()
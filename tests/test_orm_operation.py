@@ -1,14 +1,51 @@
-from datetime import datetime
+from datetime import date, datetime
+from typing import AsyncGenerator, Dict, Generator, Iterable
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from fastapi import HTTPException
 
-from src.api.v1.cruds.product_crud import OrmQuery
+from src.api.v1.cruds.product_crud import (
+    OrmQuery,
+    _products_by_date_query,
+    _products_by_range_query,
+    _report_by_date_query,
+    _with_product_columns,
+)
 from src.core import LLMreport, Product
 from src.core.schemas.schemas import ProductBase
 
 
+# Замокировать создание секций products, БД в тестах нет
+@pytest.fixture(autouse=True)
+def mock_partitions() -> Generator[MagicMock, None, None]:
+    with patch("src.api.v1.cruds.product_crud.product_partitions") as MockPartitions:
+        MockPartitions.ensure = AsyncMock()
+        yield MockPartitions
+
+
+# Справочники названий: id по порядку названий в пачке, без БД
+@pytest.fixture(autouse=True)
+def mock_dimensions() -> Generator[None, None, None]:
+    def resolve(names: Iterable[str]) -> Dict[str, int]:
+        return {name: code for code, name in enumerate(dict.fromkeys(names), 1)}
+
+    with (
+        patch("src.api.v1.cruds.product_crud.product_dim_ids") as product_ids,
+        patch("src.api.v1.cruds.product_crud.category_dim_ids") as category_ids,
+    ):
+        product_ids.resolve = AsyncMock(side_effect=resolve)
+        category_ids.resolve = AsyncMock(side_effect=resolve)
+        yield
+
+
+@pytest.fixture(autouse=True)
+def mock_response_cache() -> Generator[MagicMock, None, None]:
+    with patch("src.api.v1.cruds.product_crud.response_cache") as mock_cache:
+        mock_cache.invalidate = AsyncMock()
+        yield mock_cache
+
+
 @pytest.mark.asyncio
 async def test_create_new_products_and_report() -> None:
     mock_data = [
@@ -142,3 +179,270 @@ async def test_get_product_by_date_not_found() -> None:
     # Проверка, что вызвалось правильное исключение
     assert excinfo.value.status_code == 404
     assert excinfo.value.detail == "No products found for the given date"
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_products_and_report_uses_copy() -> None:
+    data = [
+        {
+            "name": f"Product{i}",
+            "price": 10.0,
+            "quantity": i,
+            "category": "A",
+            "date": "2024-01-01",
+        }
+        for i in range(5)
+    ]
+
+    with patch("src.core.db_helper.db_helper.session_factory") as mock_session_factory:
+        mock_session = AsyncMock()
+        mock_session.add = MagicMock()
+        mock_session.begin = MagicMock()
+        mock_session_factory.return_value.__aenter__.return_value = mock_session
+        mock_connection = mock_session.connection.return_value
+        raw_connection = mock_connection.get_raw_connection.return_value
+        copy_records = raw_connection.driver_connection.copy_records_to_table
+
+        result = await OrmQuery.bulk_create_products_and_report(
+            "Sample Report", iter(data), batch_size=2, use_copy=True
+        )
+
+        report = mock_session.add.call_args.args[0]
+        assert result == {"report_id": report.id, "products": 5}
+        assert mock_session.begin.call_count == 1  # Одна транзакция
+        assert copy_records.await_count == 3  # Пачки 2 + 2 + 1
+        first_batch = copy_records.await_args_list[0].kwargs["records"]
+        # Вместо названий пишутся id из справочников
+        assert first_batch[0] == (
+            report.id,
+            1,
+            0,
+            10.0,
+            1,
+            datetime(2024, 1, 1),
+        )
+        mock_session.execute.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_products_and_report_insert_fallback() -> None:
+    data = [
+        {
+            "name": "Product1",
+            "price": 10.0,
+            "quantity": 2,
+            "category": "A",
+            "date": "2024-01-01",
+        }
+    ]
+
+    with patch("src.core.db_helper.db_helper.session_factory") as mock_session_factory:
+        mock_session = AsyncMock()
+        mock_session.add = MagicMock()
+        mock_session.begin = MagicMock()
+        mock_session_factory.return_value.__aenter__.return_value = mock_session
+
+        result = await OrmQuery.bulk_create_products_and_report(
+            "Sample Report", data, use_copy=False
+        )
+
+        assert result["products"] == 1
+        assert mock_session.execute.await_count == 1
+        rows = mock_session.execute.await_args.args[1]
+        assert rows[0]["product_id"] == 1
+        assert rows[0]["category_id"] == 1
+        assert rows[0]["date"] == datetime(2024, 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_products_and_report_reraises() -> None:
+    with patch("src.core.db_helper.db_helper.session_factory") as mock_session_factory:
+        mock_session = AsyncMock()
+        mock_session.add = MagicMock()
+        mock_session.begin = MagicMock()
+        mock_session.flush.side_effect = Exception("DB error")
+        mock_session_factory.return_value.__aenter__.return_value = mock_session
+
+        with pytest.raises(Exception, match="DB error"):
+            await OrmQuery.bulk_create_products_and_report("Sample Report", [])
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_products_and_report_sets_report_date() -> None:
+    data = [
+        {
+            "name": "Product1",
+            "price": 10.0,
+            "quantity": 2,
+            "category": "A",
+            "date": "2024-01-01",
+        }
+    ]
+
+    with patch("src.core.db_helper.db_helper.session_factory") as mock_session_factory:
+        mock_session = AsyncMock()
+        mock_session.add = MagicMock()
+        mock_session.begin = MagicMock()
+        mock_session_factory.return_value.__aenter__.return_value = mock_session
+
+        await OrmQuery.bulk_create_products_and_report("Sample Report", data)
+
+        report = mock_session.add.call_args.args[0]
+        assert report.report_date == date(2024, 1, 1)
+
+
+def test_report_by_date_query_does_not_join_products() -> None:
+    sql = str(_report_by_date_query(date(2024, 1, 1)))
+
+    assert "products" not in sql
+    assert "llm_report.report_date = " in sql
+
+
+def test_products_by_date_query_is_range() -> None:
+    stmt = _products_by_date_query(date(2024, 1, 1))
+    params = stmt.compile().params
+
+    assert sorted(params.values()) == [datetime(2024, 1, 1), datetime(2024, 1, 2)]
+
+
+def test_products_by_range_query_is_half_open() -> None:
+    stmt = _products_by_range_query(date(2024, 1, 30), date(2024, 2, 2))
+    params = stmt.compile().params
+
+    assert sorted(params.values()) == [datetime(2024, 1, 30), datetime(2024, 2, 3)]
+    assert str(stmt).endswith("ORDER BY products.date, products.id")
+
+
+def test_product_columns_join_only_requested_names() -> None:
+    stmt = _with_product_columns(
+        _products_by_date_query(date(2024, 1, 1)), ("id", "name", "date")
+    )
+    sql = str(stmt)
+
+    assert [column.name for column in stmt.selected_columns] == ["id", "name", "date"]
+    assert "JOIN product_dim ON product_dim.id = products.product_id" in sql
+    assert "category_dim" not in sql
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_products_and_report_ensures_partition(
+    mock_partitions: MagicMock,
+) -> None:
+    data = [
+        {
+            "name": f"Product{i}",
+            "price": 10.0,
+            "quantity": i,
+            "category": "A",
+            "date": "2024-03-05",
+        }
+        for i in range(3)
+    ]
+
+    with patch("src.core.db_helper.db_helper.session_factory") as mock_session_factory:
+        mock_session = AsyncMock()
+        mock_session.add = MagicMock()
+        mock_session.begin = MagicMock()
+        mock_session_factory.return_value.__aenter__.return_value = mock_session
+
+        result = await OrmQuery.bulk_create_products_and_report(
+            "Sample Report", iter(data)
+        )
+
+    mock_partitions.ensure.assert_awaited_once_with(datetime(2024, 3, 5))
+    assert result["products"] == 3  # первая запись не потерялась
+
+
+def test_products_by_date_query_keyset_page() -> None:
+    sql = str(_products_by_date_query(date(2024, 1, 1), limit=10, after_id=5))
+
+    assert "(products.date, products.id) > (" in sql
+    assert sql.endswith("ORDER BY products.date, products.id\n LIMIT :param_2")
+
+
+@pytest.mark.asyncio
+async def test_get_product_by_date_last_page_is_empty() -> None:
+    fake_session = AsyncMock()
+    fake_results = MagicMock()
+    fake_session.execute.return_value = fake_results
+    fake_results.scalars.return_value.all.return_value = []
+
+    # После последней страницы - пустой список, а не 404
+    products = await OrmQuery.get_product_by_date(
+        fake_session, date(2024, 1, 1), limit=10, after_id=100
+    )
+
+    assert products == []
+
+
+@pytest.mark.asyncio
+async def test_stream_products_by_date_yields_batches() -> None:
+    rows = [[(1, "Product1")], [(2, "Product2")]]
+
+    async def partitions() -> AsyncGenerator[list, None]:
+        for batch in rows:
+            yield batch
+
+    with patch("src.core.db_helper.db_helper.session_factory") as mock_session_factory:
+        mock_session = AsyncMock()
+        mock_session.stream.return_value.partitions = partitions
+        mock_session_factory.return_value.__aenter__.return_value = mock_session
+
+        batches = [
+            batch
+            async for batch in OrmQuery.stream_products_by_date(
+                date(2024, 1, 1), ("id", "name"), batch_size=1
+            )
+        ]
+
+    assert batches == rows
+    stmt = mock_session.stream.await_args.args[0]
+    assert stmt.get_execution_options()["yield_per"] == 1
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_products_and_report_invalidates_cache(
+    mock_response_cache: MagicMock,
+) -> None:
+    data = [
+        {
+            "name": "Product1",
+            "price": 10.0,
+            "quantity": 2,
+            "category": "A",
+            "date": "2024-03-05",
+        }
+    ]
+
+    with patch("src.core.db_helper.db_helper.session_factory") as mock_session_factory:
+        mock_session = AsyncMock()
+        mock_session.add = MagicMock()
+        mock_session.begin = MagicMock()
+        mock_session_factory.return_value.__aenter__.return_value = mock_session
+
+        await OrmQuery.bulk_create_products_and_report("Sample Report", data)
+
+    mock_response_cache.invalidate.assert_awaited_once_with("analytics", "2024-03-05")
+
+
+@pytest.mark.asyncio
+async def test_get_product_rows_by_date_selects_columns() -> None:
+    fake_session = AsyncMock()
+    fake_results = MagicMock()
+    fake_session.execute.return_value = fake_results
+    fake_results.all.return_value = [("Product1", 1)]
+
+    rows = await OrmQuery.get_product_rows_by_date(
+        fake_session, date(2024, 1, 1), ("name", "id"), limit=10
+    )
+
+    assert rows == [("Product1", 1)]
+    stmt = fake_session.execute.await_args.args[0]
+    assert [column.name for column in stmt.selected_columns] == ["name", "id"]
+
+    fake_results.all.return_value = []
+    with pytest.raises(HTTPException) as excinfo:
+        await OrmQuery.get_product_rows_by_date(
+            fake_session, date(2024, 1, 1), ("name", "id")
+        )
+    assert excinfo.value.status_code == 404
@@ -0,0 +1,135 @@
+from datetime import date, datetime
+from typing import Generator
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.core.utils.partitions import (
+    ProductPartitions,
+    add_months,
+    is_partition,
+    partition_name,
+)
+
+
+@pytest.fixture
+def partitions() -> ProductPartitions:
+    return ProductPartitions(premake_months=2, archive_schema="archive")
+
+
+@pytest.fixture
+def mock_conn() -> Generator[AsyncMock, None, None]:
+    conn = AsyncMock()
+    with patch("src.core.utils.partitions.db_helper") as mock_db_helper:
+        mock_db_helper.engine.begin.return_value.__aenter__.return_value = conn
+        yield conn
+
+
+def executed_sql(conn: AsyncMock) -> list[str]:
+    return [str(call.args[0]) for call in conn.execute.await_args_list]
+
+
+def test_add_months_crosses_year() -> None:
+    assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+
+
+def test_partition_names() -> None:
+    assert partition_name(date(2024, 3, 1)) == "products_2024_03"
+    assert is_partition("products_2024_03")
+    assert is_partition("products_default")
+    assert not is_partition("products")
+    assert not is_partition("llm_report")
+
+
+@pytest.mark.asyncio
+async def test_create_skips_existing_partition(
+    partitions: ProductPartitions,
+) -> None:
+    conn = AsyncMock()
+    conn.scalar.return_value = True
+
+    assert await partitions.create(conn, date(2024, 3, 1)) is False
+    conn.execute.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_create_partition(partitions: ProductPartitions) -> None:
+    conn = AsyncMock()
+    conn.scalar.side_effect = [False, False]  # секции нет, строк в default нет
+
+    assert await partitions.create(conn, date(2024, 12, 1)) is True
+    assert executed_sql(conn) == [
+        "CREATE TABLE products_2024_12 PARTITION OF products "
+        "FOR VALUES FROM ('2024-12-01') TO ('2025-01-01')"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_create_moves_rows_from_default_partition(
+    partitions: ProductPartitions,
+) -> None:
+    conn = AsyncMock()
+    conn.scalar.side_effect = [False, True]  # строки месяца уже в default
+
+    await partitions.create(conn, date(2024, 3, 1))
+
+    create, move, attach = executed_sql(conn)
+    assert create.startswith("CREATE TABLE products_2024_03 (LIKE products")
+    assert "DELETE FROM products_default" in move
+    assert attach.startswith("ALTER TABLE products ATTACH PARTITION products_2024_03")
+
+
+@pytest.mark.asyncio
+async def test_ensure_remembers_month(
+    partitions: ProductPartitions, mock_conn: AsyncMock
+) -> None:
+    mock_conn.scalar.return_value = True
+
+    await partitions.ensure(datetime(2024, 3, 5))
+    await partitions.ensure(datetime(2024, 3, 20))
+
+    mock_conn.scalar.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_ensure_ignores_errors(
+    partitions: ProductPartitions, mock_conn: AsyncMock
+) -> None:
+    mock_conn.scalar.side_effect = Exception("DB error")
+
+    await partitions.ensure(date(2024, 3, 5))  # не падает
+
+    assert date(2024, 3, 1) not in partitions._known_months
+
+
+@pytest.mark.asyncio
+async def test_maintain_premakes_future_months(
+    partitions: ProductPartitions, mock_conn: AsyncMock
+) -> None:
+    # Текущий месяц уже есть, следующих двух нет
+    mock_conn.scalar.side_effect = [True, False, False, False, False]
+
+    created = await partitions.maintain(today=date(2024, 12, 15))
+
+    assert created == ["products_2025_01", "products_2025_02"]
+
+
+@pytest.mark.asyncio
+async def test_detach_older_than_archives_old_partitions(
+    partitions: ProductPartitions, mock_conn: AsyncMock
+) -> None:
+    mock_conn.execute.return_value = MagicMock()
+    with patch.object(
+        partitions,
+        "list_months",
+        AsyncMock(return_value=[date(2023, 1, 1), date(2023, 2, 1), date(2024, 1, 1)]),
+    ):
+        detached = await partitions.detach_older_than(12, today=date(2024, 2, 10))
+
+    assert detached == ["products_2023_01"]
+    assert executed_sql(mock_conn) == [
+        "CREATE SCHEMA IF NOT EXISTS archive",
+        "ALTER TABLE products DETACH PARTITION products_2023_01",
+        "ALTER TABLE products_2023_01 SET SCHEMA archive",
+    ]
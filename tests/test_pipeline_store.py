@@ -0,0 +1,236 @@
+import json
+from typing import Any, Dict, List, Tuple
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.api.v1.veiws.xml_router import _pipeline_task_status, get_task_status
+from src.celery.celery_worker import pipeline_stages, report_pipeline
+from src.core.config import settings
+from src.core.utils.pipeline_store import PipelineStore
+
+STAGES = [
+    ("pipe-1", "task_parse_and_analyze_xml"),
+    ("report-1", "task_generate_report"),
+    ("save-1", "task_save_result_to_db"),
+]
+
+
+def timing(queued_at: float, started_at: float, finished_at: float) -> Dict:
+    return {
+        "queued_at": queued_at,
+        "started_at": started_at,
+        "finished_at": finished_at,
+        "queue_wait": started_at - queued_at,
+        "runtime": finished_at - started_at,
+    }
+
+
+@pytest.fixture
+def redis_client() -> MagicMock:
+    return MagicMock()
+
+
+@pytest.fixture
+def async_redis_client() -> MagicMock:
+    return MagicMock()
+
+
+@pytest.fixture
+def store(redis_client: MagicMock, async_redis_client: MagicMock) -> PipelineStore:
+    pipeline_store = PipelineStore(url="redis://localhost", ttl=60)
+    pipeline_store._client = redis_client
+    pipeline_store._async_client = async_redis_client
+    return pipeline_store
+
+
+async def get_pipeline(
+    store: PipelineStore, pipeline_id: str
+) -> Tuple[List[Tuple[str, str]], Dict[Tuple[str, str], Dict[str, Any]]]:
+    pipeline = await store.get(pipeline_id)
+    assert pipeline is not None
+    return pipeline
+
+
+def test_report_pipeline_stage_ids_are_known_before_sending() -> None:
+    staged_xml = {"key": "a.xml", "checksum": "a" * 64, "size": 10}
+
+    pipeline = report_pipeline(staged_xml, "pipe-1")
+    stages = pipeline_stages(pipeline)
+
+    assert [stage for _, stage in stages] == [stage for _, stage in STAGES]
+    # id цепочки - id первой задачи, он же root_id и id потока отчета
+    assert stages[0][0] == "pipe-1"
+    assert all(stage_id for stage_id, _ in stages)
+
+
+def test_large_file_pipeline_fans_out_analysis() -> None:
+    size = settings.celery.parallel_analysis_min_size
+    staged_xml = {"key": "a.xml", "checksum": "a" * 64, "size": size}
+
+    stages = pipeline_stages(report_pipeline(staged_xml, "pipe-1"))
+
+    assert [stage for _, stage in stages][:2] == [
+        "task_fan_out_analysis",
+        "task_merge_aggregates",
+    ]
+    # Тело chord из replace выполняется под id task_fan_out_analysis
+    assert stages[0][0] == stages[1][0] == "pipe-1"
+
+
+def test_record_timing_splits_queue_wait_and_runtime(
+    store: PipelineStore, redis_client: MagicMock
+) -> None:
+    pipe = redis_client.pipeline.return_value.__enter__.return_value
+
+    store.record_timing("pipe-1", "report-1", "task_generate_report", 10.0, 12.5, 20.0)
+
+    key, field, value = pipe.hset.call_args.args
+    assert (key, field) == (
+        "pipeline:pipe-1",
+        "timing:report-1:task_generate_report",
+    )
+    assert json.loads(value)["queue_wait"] == 2.5
+    assert json.loads(value)["runtime"] == 7.5
+    pipe.expire.assert_called_once_with("pipeline:pipe-1", 60)
+
+
+@pytest.mark.asyncio
+async def test_get_returns_stages_and_timings(
+    store: PipelineStore, async_redis_client: MagicMock
+) -> None:
+    async_redis_client.hgetall = AsyncMock(
+        return_value={
+            "stages": json.dumps(STAGES),
+            "timing:pipe-1:task_parse_and_analyze_xml": json.dumps(
+                timing(0.0, 1.0, 3.0)
+            ),
+        }
+    )
+
+    stages, timings = await get_pipeline(store, "pipe-1")
+
+    assert stages == STAGES
+    assert timings[("pipe-1", "task_parse_and_analyze_xml")]["runtime"] == 2.0
+
+
+@pytest.mark.asyncio
+async def test_get_unknown_pipeline(
+    store: PipelineStore, async_redis_client: MagicMock
+) -> None:
+    async_redis_client.hgetall = AsyncMock(return_value={})
+
+    assert await store.get("task-0") is None
+
+
+def stage_results(states: Dict[str, str]) -> MagicMock:
+    def make(task_id: str) -> MagicMock:
+        state = states[task_id]
+        return MagicMock(
+            id=task_id,
+            state=state,
+            result="boom" if state == "FAILURE" else {"report_id": 1},
+            traceback="Traceback" if state == "FAILURE" else None,
+        )
+
+    return MagicMock(side_effect=make)
+
+
+@pytest.mark.asyncio
+async def test_task_status_reports_stage_timings() -> None:
+    timings = {
+        STAGES[0]: timing(100.0, 100.5, 102.0),
+        STAGES[1]: timing(102.0, 102.1, 110.0),
+        STAGES[2]: timing(110.0, 110.2, 111.0),
+    }
+    states = {"pipe-1": "SUCCESS", "report-1": "SUCCESS", "save-1": "SUCCESS"}
+
+    with (
+        patch("src.api.v1.veiws.xml_router.pipeline_store") as mock_store,
+        patch("src.api.v1.veiws.xml_router.AsyncResult", stage_results(states)),
+    ):
+        mock_store.get = AsyncMock(return_value=(STAGES, timings))
+        response = await get_task_status("pipe-1")
+
+    assert response["status"] == "SUCCESS"
+    assert response["result"] == "{'report_id': 1}"
+    assert response["elapsed"] == pytest.approx(11.0)
+    assert response["stages"][1] == {
+        "task_id": "report-1",
+        "stage": "task_generate_report",
+        "status": "SUCCESS",
+        "queue_wait": pytest.approx(0.1),
+        "runtime": pytest.approx(7.9),
+    }
+
+
+@pytest.mark.asyncio
+async def test_task_status_reports_failed_stage() -> None:
+    # Упала генерация отчета: раньше /task-status/ этого не видел
+    states = {"pipe-1": "SUCCESS", "report-1": "FAILURE", "save-1": "PENDING"}
+
+    with (
+        patch("src.api.v1.veiws.xml_router.pipeline_store") as mock_store,
+        patch("src.api.v1.veiws.xml_router.AsyncResult", stage_results(states)),
+    ):
+        mock_store.get = AsyncMock(
+            return_value=(STAGES, {STAGES[0]: timing(0.0, 1.0, 2.0)})
+        )
+        response = await get_task_status("pipe-1")
+
+    assert response["task_id"] == "report-1"
+    assert response["status"] == "FAILURE"
+    assert response["result"] == "boom"
+    assert [stage["status"] for stage in response["stages"]] == [
+        "SUCCESS",
+        "FAILURE",
+        "PENDING",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_task_status_of_running_pipeline() -> None:
+    states = {"pipe-1": "SUCCESS", "report-1": "PENDING", "save-1": "PENDING"}
+
+    with (
+        patch("src.api.v1.veiws.xml_router.pipeline_store") as mock_store,
+        patch("src.api.v1.veiws.xml_router.AsyncResult", stage_results(states)),
+    ):
+        mock_store.get = AsyncMock(
+            return_value=(STAGES, {STAGES[0]: timing(0.0, 1.0, 2.0)})
+        )
+        response = await get_task_status("pipe-1")
+
+    assert (response["task_id"], response["status"]) == ("pipe-1", "STARTED")
+    assert response["stages"][1]["runtime"] is None
+
+
+@pytest.mark.asyncio
+async def test_fan_out_and_merge_timings_are_kept_apart(
+    store: PipelineStore, redis_client: MagicMock, async_redis_client: MagicMock
+) -> None:
+    pipe = redis_client.pipeline.return_value.__enter__.return_value
+    store.record_timing("pipe-1", "fan-1", "task_fan_out_analysis", 1.0, 1.5, 2.0)
+    store.record_timing("pipe-1", "fan-1", "task_merge_aggregates", 5.0, 6.0, 9.0)
+    async_redis_client.hgetall = AsyncMock(
+        return_value={
+            "stages": json.dumps(
+                [
+                    ("fan-1", "task_fan_out_analysis"),
+                    ("fan-1", "task_merge_aggregates"),
+                ]
+            ),
+            **{call.args[1]: call.args[2] for call in pipe.hset.call_args_list},
+        }
+    )
+
+    stages, timings = await get_pipeline(store, "pipe-1")
+    states = {"fan-1": "SUCCESS"}
+    with patch("src.api.v1.veiws.xml_router.AsyncResult", stage_results(states)):
+        response = _pipeline_task_status("pipe-1", stages, timings)
+
+    assert [stage["runtime"] for stage in response["stages"]] == [
+        pytest.approx(0.5),
+        pytest.approx(3.0),
+    ]
+    assert response["elapsed"] == pytest.approx(8.0)
@@ -0,0 +1,59 @@
+from datetime import datetime
+from typing import Any, AsyncIterator, Sequence
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+
+from src.api.v1.veiws.xml_router import export_sales_product
+from src.core.utils.product_export import encode_batches, rows_to_csv, rows_to_ndjson
+
+ROW = (1, "Товар, 1", 2, 9.5, "A", datetime(2024, 1, 1))
+
+
+def test_rows_to_ndjson() -> None:
+    assert rows_to_ndjson([ROW]) == (
+        '{"id": 1, "name": "Товар, 1", "quantity": 2, "price": 9.5, '
+        '"category": "A", "date": "2024-01-01T00:00:00"}\n'
+    )
+
+
+def test_rows_to_csv_quotes_values() -> None:
+    assert rows_to_csv([ROW]) == '1,"Товар, 1",2,9.5,A,2024-01-01T00:00:00\r\n'
+
+
+async def batches(*items: Sequence[Any]) -> AsyncIterator[Sequence[Any]]:
+    for batch in items:
+        yield batch
+
+
+@pytest.mark.asyncio
+async def test_encode_batches_writes_csv_header_once() -> None:
+    chunks = [chunk async for chunk in encode_batches(batches([ROW], [ROW]), "csv")]
+
+    assert chunks[0] == "id,name,quantity,price,category,date\r\n"
+    assert len(chunks) == 3
+
+
+@pytest.mark.asyncio
+async def test_export_sales_product_streams_batches() -> None:
+    with patch("src.api.v1.veiws.xml_router.OrmQuery") as mock_orm:
+        mock_orm.stream_products_by_date.return_value = batches([ROW], [ROW])
+
+        response = await export_sales_product(datetime(2024, 1, 1), "ndjson")
+        body = [chunk async for chunk in response.body_iterator]
+
+    assert response.media_type == "application/x-ndjson"
+    assert len(body) == 2
+    assert body[0] == rows_to_ndjson([ROW])
+
+
+@pytest.mark.asyncio
+async def test_export_sales_product_not_found() -> None:
+    with patch("src.api.v1.veiws.xml_router.OrmQuery") as mock_orm:
+        mock_orm.stream_products_by_date.return_value = batches()
+
+        with pytest.raises(HTTPException) as excinfo:
+            await export_sales_product(datetime(2024, 1, 1), "csv")
+
+    assert excinfo.value.status_code == 404
@@ -0,0 +1,201 @@
+"""
+Планы запросов чтения по дате на реальном Postgres.
+
+Таблицы создаются в отдельной схеме и заполняются ежедневными отчетами
+за 10 лет и товарами за первый год (по 1000 в день, помесячные секции),
+после чего проверяется, что EXPLAIN не содержит полного сканирования
+таблиц, а запрос товаров читает только секцию своего месяца (и небольшие
+справочники названий). Аналитика за год читает daily_sales_summary только
+по ее уникальному индексу.
+Если БД из .env недоступна, тесты пропускаются.
+"""
+
+import json
+from datetime import date
+from typing import Any, AsyncGenerator, Dict, Iterator, List
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import Select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+
+from src.api.v1.cruds.product_crud import (
+    SUMMARY_UPSERT,
+    _products_by_date_query,
+    _report_by_date_query,
+    _revenue_query,
+    _top_query,
+)
+from src.core import Base
+from src.core.config import settings
+from src.core.utils.partitions import ProductPartitions, add_months
+
+SCHEMA = "test_query_plans"
+REPORT_DAYS = 3650
+PRODUCT_DAYS = 365
+PRODUCTS_PER_DAY = 1000
+
+partitions = ProductPartitions(premake_months=0, archive_schema="archive")
+
+
+@pytest_asyncio.fixture
+async def connection() -> AsyncGenerator[AsyncConnection, None]:
+    engine = create_async_engine(
+        settings.db.url,
+        connect_args={"timeout": 2, "server_settings": {"search_path": SCHEMA}},
+    )
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            await conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+            await conn.run_sync(Base.metadata.create_all)
+            for month in range(PRODUCT_DAYS // 30):
+                await partitions.create(conn, add_months(date(2024, 1, 1), month))
+            await conn.commit()
+    except Exception as e:
+        await engine.dispose()
+        pytest.skip(f"Postgres is unavailable: {e}")
+
+    async with engine.connect() as conn:
+        await conn.execute(
+            text(
+                """
+                INSERT INTO llm_report (id, ai_report, report_date)
+                SELECT day, 'report', DATE '2024-01-01' + day - 1
+                FROM generate_series(1, :days) AS day
+                """
+            ),
+            {"days": REPORT_DAYS},
+        )
+        await conn.execute(
+            text(
+                """
+                INSERT INTO product_dim (id, name)
+                SELECT n, 'Product ' || n FROM generate_series(1, :products) AS n
+                """
+            ),
+            {"products": PRODUCTS_PER_DAY},
+        )
+        await conn.execute(
+            text(
+                """
+                INSERT INTO category_dim (id, name)
+                SELECT n, 'Category ' || n FROM generate_series(1, 20) AS n
+                """
+            )
+        )
+        await conn.execute(
+            text(
+                """
+                INSERT INTO products
+                    (report_id, product_id, quantity, price, category_id, date)
+                SELECT day, n, n, 9.99, n % 20 + 1,
+                       TIMESTAMP '2024-01-01' + (day - 1) * INTERVAL '1 day'
+                FROM generate_series(1, :days) AS day,
+                     generate_series(1, :products) AS n
+                """
+            ),
+            {"days": PRODUCT_DAYS, "products": PRODUCTS_PER_DAY},
+        )
+        await conn.execute(
+            SUMMARY_UPSERT,
+            [{"report_id": day} for day in range(1, PRODUCT_DAYS + 1)],
+        )
+        await conn.execute(text("ANALYZE"))
+        await conn.commit()
+        yield conn
+
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+    await engine.dispose()
+
+
+def iter_nodes(plan: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from iter_nodes(child)
+
+
+async def explain(conn: AsyncConnection, stmt: Select) -> List[Dict[str, Any]]:
+    sql = stmt.compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    )
+    result = await conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return list(iter_nodes(plan[0]["Plan"]))
+
+
+def scans(nodes: List[Dict[str, Any]]) -> Dict[str, str]:
+    return {
+        node["Relation Name"]: node["Node Type"]
+        for node in nodes
+        if "Relation Name" in node
+    }
+
+
+@pytest.mark.asyncio
+async def test_report_by_date_uses_index(connection: AsyncConnection) -> None:
+    nodes = await explain(connection, _report_by_date_query(date(2024, 6, 1)))
+
+    # products в запросе больше не участвует
+    assert scans(nodes) == {"llm_report": "Index Scan"}
+    assert nodes[-1]["Index Name"] == "ix_llm_report_report_date"
+
+
+@pytest.mark.asyncio
+async def test_products_by_date_uses_index_range(connection: AsyncConnection) -> None:
+    nodes = await explain(connection, _products_by_date_query(date(2024, 6, 1)))
+
+    # Читается только секция июня, по ее индексу на date; названия
+    # подставляются из справочников
+    relations = scans(nodes)
+    assert set(relations) == {"products_2024_06", "product_dim", "category_dim"}
+    scan_type = relations["products_2024_06"]
+    assert scan_type in ("Index Scan", "Bitmap Heap Scan")
+    index_nodes = [node for node in nodes if node.get("Index Name")]
+    assert index_nodes[0]["Index Name"] == "products_2024_06_date_id_idx"
+
+
+@pytest.mark.asyncio
+async def test_products_keyset_page_reads_one_page(
+    connection: AsyncConnection,
+) -> None:
+    after_id = await connection.scalar(
+        text("SELECT min(id) + 500 FROM products WHERE date = '2024-06-01'")
+    )
+    stmt = _products_by_date_query(date(2024, 6, 1), limit=100, after_id=after_id)
+
+    nodes = await explain(connection, stmt)
+
+    # Страница читается из индекса по порядку, без сортировки всего дня
+    assert nodes[0]["Node Type"] == "Limit"
+    assert not [node for node in nodes if node["Node Type"] == "Sort"]
+    # Дата курсора ищется по первичному ключу (InitPlan), сама страница -
+    # по индексу (date, id)
+    page_scan, *_ = [
+        node
+        for node in nodes
+        if node.get("Relation Name") == "products_2024_06"
+        and node.get("Parent Relationship") != "InitPlan"
+    ]
+    assert page_scan["Index Name"] == "products_2024_06_date_id_idx"
+
+
+@pytest.mark.asyncio
+async def test_analytics_read_summary_index(connection: AsyncConnection) -> None:
+    date_from, date_to = date(2024, 1, 15), date(2024, 12, 20)
+    for stmt in (
+        _revenue_query(date_from, date_to),
+        _top_query("product", date_from, date_to, 10, "revenue"),
+        _top_query("category", date_from, date_to, 10, "quantity"),
+    ):
+        nodes = await explain(connection, stmt)
+
+        # products не читается, итоги - только диапазонами индекса
+        assert set(scans(nodes)) == {"daily_sales_summary"}
+        assert "Seq Scan" not in {node["Node Type"] for node in nodes}
+        index_names = {node["Index Name"] for node in nodes if "Index Name" in node}
+        assert index_names == {"uq_daily_sales_summary_level_date_category_product"}
@@ -0,0 +1,122 @@
+from typing import Generator
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+import redis
+
+from src.api.v1.veiws.xml_router import _report_events
+from src.core.utils.report_stream import ReportStream, format_sse
+
+
+@pytest.fixture
+def redis_client() -> MagicMock:
+    return MagicMock()
+
+
+@pytest.fixture
+def async_redis_client() -> AsyncMock:
+    return AsyncMock()
+
+
+@pytest.fixture
+def stream(redis_client: MagicMock, async_redis_client: AsyncMock) -> ReportStream:
+    report_stream = ReportStream(
+        url="redis://localhost", ttl=60, maxlen=100, flush_interval=10, block_ms=10
+    )
+    report_stream._client = redis_client
+    report_stream._async_client = async_redis_client
+    return report_stream
+
+
+@pytest.fixture
+def mock_publish(stream: ReportStream) -> Generator[MagicMock, None, None]:
+    with patch.object(stream, "publish") as MockPublish:
+        yield MockPublish
+
+
+def test_format_sse_splits_multiline_data() -> None:
+    assert format_sse("1-0", "chunk", "line 1\nline 2") == (
+        "id: 1-0\nevent: chunk\ndata: line 1\ndata: line 2\n\n"
+    )
+
+
+def test_writer_sends_first_chunk_immediately(
+    stream: ReportStream, mock_publish: MagicMock
+) -> None:
+    writer = stream.writer("task-1")
+
+    writer.write("Отчет")
+    writer.write(" за ")
+    writer.write("день")
+
+    # Первая часть ушла сразу, остальные ждут flush_interval
+    mock_publish.assert_called_once_with("task-1", "chunk", "Отчет")
+
+    writer.close()
+
+    assert mock_publish.call_args_list[1:] == [
+        (("task-1", "chunk", " за день"),),
+        (("task-1", "done", ""),),
+    ]
+
+
+def test_writer_fail_publishes_error(
+    stream: ReportStream, mock_publish: MagicMock
+) -> None:
+    stream.writer("task-1").fail("API error")
+
+    mock_publish.assert_called_once_with("task-1", "error", "API error")
+
+
+def test_publish_ignores_redis_errors(
+    stream: ReportStream, redis_client: MagicMock
+) -> None:
+    redis_client.pipeline.side_effect = redis.ConnectionError("down")
+
+    stream.publish("task-1", "chunk", "text")  # не падает
+
+
+@pytest.mark.asyncio
+async def test_listen_stops_after_done(
+    stream: ReportStream, async_redis_client: AsyncMock
+) -> None:
+    async_redis_client.xread.side_effect = [
+        [],
+        [["report-stream:task-1", [("1-0", {"event": "chunk", "data": "a"})]]],
+        [["report-stream:task-1", [("2-0", {"event": "done", "data": ""})]]],
+    ]
+
+    messages = [message async for message in stream.listen("task-1")]
+
+    assert messages == [None, ("1-0", "chunk", "a"), ("2-0", "done", "")]
+    # Чтение продолжается с последнего полученного события
+    assert async_redis_client.xread.call_args_list[-1].args == (
+        {"report-stream:task-1": "1-0"},
+    )
+
+
+@pytest.mark.asyncio
+async def test_report_events_relays_stream_as_sse(
+    stream: ReportStream, async_redis_client: AsyncMock
+) -> None:
+    async_redis_client.xread.side_effect = [
+        [],
+        [
+            [
+                "report-stream:task-1",
+                [
+                    ("1-0", {"event": "chunk", "data": "a"}),
+                    ("2-0", {"event": "done", "data": ""}),
+                ],
+            ]
+        ],
+    ]
+
+    with patch("src.api.v1.veiws.xml_router.report_stream", stream):
+        events = [event async for event in _report_events("task-1", "0")]
+
+    assert events == [
+        ": keep-alive\n\n",
+        "id: 1-0\nevent: chunk\ndata: a\n\n",
+        "id: 2-0\nevent: done\ndata: \n\n",
+    ]
@@ -0,0 +1,242 @@
+import asyncio
+from typing import Generator
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+import redis
+
+from src.core.utils.response_cache import LocalCache, ResponseCache
+
+
+@pytest.fixture(autouse=True)
+def mock_metrics() -> Generator[MagicMock, None, None]:
+    with patch("src.core.utils.response_cache.metrics") as mock_metrics:
+        mock_metrics.aincr_many = AsyncMock()
+        yield mock_metrics
+
+
+@pytest.fixture
+def redis_client() -> MagicMock:
+    client = MagicMock()
+    client.get = AsyncMock(return_value=None)
+    client.set = AsyncMock()
+    client.lock.return_value.acquire = AsyncMock(return_value=True)
+    client.lock.return_value.release = AsyncMock()
+    return client
+
+
+@pytest.fixture
+def cache(redis_client: MagicMock) -> ResponseCache:
+    cache = ResponseCache(
+        url="redis://localhost",
+        ttl=60,
+        lock_timeout=1,
+        poll_interval=0.01,
+        local_max_bytes=1024,
+        local_ttl=60,
+        stats_interval=10,
+    )
+    cache._client = redis_client
+    return cache
+
+
+def pipeline(client: MagicMock, results: list) -> MagicMock:
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(side_effect=results)
+    client.pipeline.return_value.__aenter__.return_value = pipe
+    return pipe
+
+
+@pytest.mark.asyncio
+async def test_hit_skips_loader(cache: ResponseCache, redis_client: MagicMock) -> None:
+    redis_client.get.side_effect = [b"3", b'{"id": 1}']
+    loader = AsyncMock()
+
+    body = await cache.get_or_load("2024-01-01", "reports", loader)
+
+    assert body == b'{"id": 1}'
+    loader.assert_not_awaited()
+    # Ключ записи содержит текущую версию даты
+    redis_client.get.assert_awaited_with("response-cache:2024-01-01:3:reports")
+
+
+@pytest.mark.asyncio
+async def test_miss_stores_body(cache: ResponseCache, redis_client: MagicMock) -> None:
+    loader = AsyncMock(return_value=b"[]")
+
+    body = await cache.get_or_load("2024-01-01", "reports", loader)
+
+    assert body == b"[]"
+    redis_client.set.assert_awaited_once_with(
+        "response-cache:2024-01-01:0:reports", b"[]", ex=60
+    )
+    redis_client.lock.return_value.release.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_run_loader_once(cache: ResponseCache) -> None:
+    release = asyncio.Event()
+
+    async def load() -> bytes:
+        await release.wait()
+        return b"[]"
+
+    loader = AsyncMock(side_effect=load)
+    requests = [
+        asyncio.create_task(cache.get_or_load("2024-01-01", "reports", loader))
+        for _ in range(5)
+    ]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*requests) == [b"[]"] * 5
+    loader.assert_awaited_once()
+    assert cache._inflight == {}
+
+
+@pytest.mark.asyncio
+async def test_errors_are_not_cached(
+    cache: ResponseCache, redis_client: MagicMock
+) -> None:
+    loader = AsyncMock(side_effect=ValueError("not found"))
+
+    with pytest.raises(ValueError):
+        await cache.get_or_load("2024-01-01", "reports", loader)
+
+    redis_client.set.assert_not_awaited()
+    redis_client.lock.return_value.release.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_waits_for_other_process(
+    cache: ResponseCache, redis_client: MagicMock
+) -> None:
+    redis_client.lock.return_value.acquire.return_value = False
+    pipeline(redis_client, [[None, 1], [b"[]", 1]])
+    loader = AsyncMock()
+
+    body = await cache.get_or_load("2024-01-01", "reports", loader)
+
+    assert body == b"[]"
+    loader.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_loads_when_other_process_failed(
+    cache: ResponseCache, redis_client: MagicMock
+) -> None:
+    redis_client.lock.return_value.acquire.return_value = False
+    pipeline(redis_client, [[None, 0]])  # lock снят, а ответа нет
+    loader = AsyncMock(return_value=b"[]")
+
+    assert await cache.get_or_load("2024-01-01", "reports", loader) == b"[]"
+    loader.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_redis_errors_fall_back_to_loader(
+    cache: ResponseCache, redis_client: MagicMock
+) -> None:
+    redis_client.get.side_effect = redis.ConnectionError("down")
+    loader = AsyncMock(return_value=b"[]")
+
+    assert await cache.get_or_load("2024-01-01", "reports", loader) == b"[]"
+
+
+@pytest.mark.asyncio
+async def test_invalidate_bumps_version_and_publishes(
+    cache: ResponseCache, redis_client: MagicMock
+) -> None:
+    pipe = pipeline(redis_client, [[1, 1, 1, 1]])
+
+    await cache.invalidate("2024-01-01", "analytics")
+
+    pipe.incr.assert_any_call("response-cache-version:2024-01-01")
+    pipe.publish.assert_any_call("response-cache-invalidate", "2024-01-01")
+    pipe.publish.assert_any_call("response-cache-invalidate", "analytics")
+
+
+@pytest.mark.asyncio
+async def test_invalidated_scope_starts_new_load(cache: ResponseCache) -> None:
+    release = asyncio.Event()
+
+    async def load() -> bytes:
+        await release.wait()
+        return b"old"
+
+    first = asyncio.create_task(cache.get_or_load("2024-01-01", "reports", load))
+    await asyncio.sleep(0)
+    cache._drop_scope("2024-01-01")
+    second_loader = AsyncMock(return_value=b"new")
+
+    # Запрос после сброса не присоединяется к загрузке старых данных
+    assert await cache.get_or_load("2024-01-01", "reports", second_loader) == b"new"
+    release.set()
+    assert await first == b"old"
+    # Старый ответ не попал в кэш в памяти
+    assert cache.local.get("2024-01-01:reports") == b"new"
+
+
+def test_local_cache_evicts_least_recent_by_size() -> None:
+    local = LocalCache(max_bytes=10, ttl=60)
+    local.set("a", b"1234")
+    local.set("b", b"1234")
+    local.get("a")
+    local.set("c", b"1234")  # 12 байт > 10: вытесняется b
+
+    assert local.get("b") is None
+    assert local.get("a") == b"1234"
+    assert local.size == 8
+
+    local.set("big", b"x" * 11)  # больше всего кэша - не сохраняется
+    assert local.get("big") is None
+    assert len(local) == 2
+
+
+def test_local_cache_expires_entries() -> None:
+    local = LocalCache(max_bytes=10, ttl=60)
+    with patch("src.core.utils.response_cache.time.monotonic", return_value=0):
+        local.set("a", b"1")
+    with patch("src.core.utils.response_cache.time.monotonic", return_value=61):
+        assert local.get("a") is None
+    assert local.size == 0
+
+
+@pytest.mark.asyncio
+async def test_local_hit_skips_redis(
+    cache: ResponseCache, redis_client: MagicMock
+) -> None:
+    loader = AsyncMock(return_value=b"[]")
+    await cache.get_or_load("2024-01-01", "reports", loader)
+    redis_client.get.reset_mock()
+
+    assert await cache.get_or_load("2024-01-01", "reports", loader) == b"[]"
+
+    redis_client.get.assert_not_awaited()
+    loader.assert_awaited_once()
+    assert cache._stats["response_cache_l1_hits"] == 1
+    assert cache._stats["response_cache_l2_misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidation_drops_local_entries(
+    cache: ResponseCache, redis_client: MagicMock
+) -> None:
+    cache.local.set("2024-01-01:reports", b"old")
+    cache.local.set("2024-01-02:reports", b"other")
+    pipeline(redis_client, [[1, 1]])
+
+    await cache.invalidate("2024-01-01")
+
+    assert cache.local.get("2024-01-01:reports") is None
+    assert cache.local.get("2024-01-02:reports") == b"other"
+
+
+@pytest.mark.asyncio
+async def test_flush_stats(cache: ResponseCache, mock_metrics: MagicMock) -> None:
+    cache._stats["response_cache_l1_hits"] += 3
+
+    await cache.flush_stats()
+    await cache.flush_stats()  # нечего отправлять
+
+    mock_metrics.aincr_many.assert_awaited_once_with({"response_cache_l1_hits": 3})
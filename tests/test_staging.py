@@ -0,0 +1,256 @@
+import hashlib
+import io
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator
+from unittest.mock import patch
+
+import pytest
+from tests.test_xml_parser import sales_xml
+
+from src.celery.celery_worker import (
+    task_merge_aggregates,
+    task_parse_and_analyze_xml,
+    task_parse_chunk,
+    task_parse_xml,
+)
+from src.core.utils.staging import StagedFile, UploadStorage, chunk_ranges
+from src.core.utils.xml_parser import split_products
+
+
+@pytest.fixture
+def storage(tmp_path: Path) -> UploadStorage:
+    return UploadStorage(root=str(tmp_path), chunk_size=4)
+
+
+def test_stage_copies_file_and_computes_checksum(storage: UploadStorage) -> None:
+    content = b"<sales_data date='2024-01-01'><products/></sales_data>"
+
+    staged = storage.stage(io.BytesIO(content))
+
+    assert staged.size == len(content)
+    assert staged.checksum == hashlib.sha256(content).hexdigest()
+    assert storage.path(staged.key).read_bytes() == content
+    assert not list(storage.root.glob("*.part"))
+
+
+def test_write_and_read_records_roundtrip(storage: UploadStorage) -> None:
+    records = [
+        {
+            "name": "Товар A",
+            "quantity": 1,
+            "price": 10.0,
+            "category": "A",
+            "date": "2024-01-01",
+        },
+        {
+            "name": "Товар B",
+            "quantity": 2,
+            "price": 20.0,
+            "category": "B",
+            "date": "2024-01-01",
+        },
+    ]
+
+    staged = storage.write_records(iter(records))
+
+    # Через брокер передается только маленькая ссылка
+    assert StagedFile.model_validate(staged.model_dump()) == staged
+    assert list(storage.read_records(staged)) == records
+
+
+def test_open_detects_size_mismatch(storage: UploadStorage) -> None:
+    staged = storage.stage(io.BytesIO(b"<xml/>"))
+    storage.path(staged.key).write_bytes(b"<x/>")
+
+    with pytest.raises(ValueError, match="size mismatch"):
+        storage.open(staged)
+
+
+def test_full_read_detects_checksum_mismatch(storage: UploadStorage) -> None:
+    staged = storage.stage(io.BytesIO(b"<xml/>"))
+    # Тот же размер, другое содержимое
+    storage.path(staged.key).write_bytes(b"<yml/>")
+
+    with storage.open(staged) as f, pytest.raises(
+        ValueError, match="checksum mismatch"
+    ):
+        f.read()
+
+
+def test_read_records_detects_checksum_mismatch(storage: UploadStorage) -> None:
+    staged = storage.write_records([{"name": "Product 1"}])
+    path = storage.path(staged.key)
+    path.write_bytes(path.read_bytes().replace(b"1", b"2"))
+
+    with pytest.raises(ValueError, match="checksum mismatch"):
+        list(storage.read_records(staged))
+
+
+def test_range_read_skips_checksum(storage: UploadStorage) -> None:
+    staged = storage.stage(io.BytesIO(b"<xml>text</xml>"))
+    storage.path(staged.key).write_bytes(b"<yml>text</xml>")
+
+    with storage.open(staged) as f:
+        f.seek(5)
+        assert f.read() == b"text</xml>"
+
+
+def test_full_read_after_seek_back_is_verified(storage: UploadStorage) -> None:
+    content = b"<xml>" + b"x" * 100 + b"</xml>"
+    staged = storage.stage(io.BytesIO(content))
+
+    with storage.open(staged) as f:
+        f.seek(50)
+        f.read(10)
+        f.seek(0)
+        assert f.read() == content
+
+
+def test_delete_removes_file(storage: UploadStorage) -> None:
+    staged = storage.stage(io.BytesIO(b"<xml/>"))
+
+    storage.delete(staged)
+
+    assert not storage.path(staged.key).exists()
+
+
+@pytest.mark.parametrize("chunks", [1, 2, 3, 7])
+def test_read_records_by_ranges_covers_file_once(
+    storage: UploadStorage, chunks: int
+) -> None:
+    records = [{"name": f"Product {i}", "quantity": i} for i in range(50)]
+    staged = storage.write_records(records)
+
+    ranges = chunk_ranges(staged.size, chunks, min_chunk_size=1)
+    result = [
+        record
+        for start, end in ranges
+        for record in storage.read_records(staged, start, end)
+    ]
+
+    assert len(ranges) == chunks
+    assert result == records
+
+
+def test_chunk_ranges_does_not_split_small_files() -> None:
+    assert chunk_ranges(100, 4, min_chunk_size=1000) == [(0, 100)]
+    assert chunk_ranges(4000, 4, min_chunk_size=1000) == [
+        (0, 1000),
+        (1000, 2000),
+        (2000, 3000),
+        (3000, 4000),
+    ]
+
+
+def test_write_records_removes_partial_file_on_error(storage: UploadStorage) -> None:
+    def broken_records() -> Iterator[Dict[str, Any]]:
+        yield {"name": "Product A", "quantity": 1}
+        raise ValueError("Broken XML")
+
+    with pytest.raises(ValueError, match="Broken XML"):
+        storage.write_records(broken_records())
+
+    assert not list(storage.root.iterdir())
+
+
+def test_parse_error_removes_staged_xml(storage: UploadStorage) -> None:
+    staged = storage.stage(io.BytesIO(b"<sales_data><products>"))
+
+    with patch("src.celery.celery_worker.upload_storage", storage):
+        with pytest.raises(Exception):
+            task_parse_xml(staged.model_dump())
+
+    # Ни XML, ни недописанного NDJSON в хранилище не остается
+    assert not list(storage.root.iterdir())
+
+
+@pytest.mark.parametrize("skip_errors", [False, True])
+def test_fused_parse_error_removes_staged_xml(
+    storage: UploadStorage, skip_errors: bool
+) -> None:
+    staged = storage.stage(io.BytesIO(b"<sales_data><products>"))
+
+    with patch("src.celery.celery_worker.upload_storage", storage):
+        try:
+            result = task_parse_and_analyze_xml(staged.model_dump(), skip_errors)
+        except Exception:
+            result = "raised"
+
+    assert result == (None if skip_errors else "raised")
+    assert not list(storage.root.iterdir())
+
+
+def test_remove_expired_sweeps_abandoned_files(storage: UploadStorage) -> None:
+    old_xml = storage.stage(io.BytesIO(b"<xml/>"))
+    old_records = storage.write_records([{"name": "Product A"}])
+    old_part = storage.path("abandoned.xml.part")
+    old_part.write_bytes(b"<xml")
+    fresh_xml = storage.stage(io.BytesIO(b"<xml/>"))
+    now = time.time()
+    for path in [storage.path(old_xml.key), storage.path(old_records.key), old_part]:
+        os.utime(path, (now - 120, now - 120))
+
+    assert storage.remove_expired(ttl=60, now=now) == 3
+    assert [path.name for path in storage.root.iterdir()] == [fresh_xml.key]
+
+
+def test_concat_joins_files_in_order(storage: UploadStorage) -> None:
+    first = storage.write_records([{"name": "Product A"}])
+    second = storage.write_records([{"name": "Product B"}, {"name": "Product C"}])
+
+    joined = storage.concat([first, second])
+
+    content = (
+        storage.path(first.key).read_bytes() + storage.path(second.key).read_bytes()
+    )
+    assert joined.size == len(content)
+    assert joined.checksum == hashlib.sha256(content).hexdigest()
+    assert [record["name"] for record in storage.read_records(joined)] == [
+        "Product A",
+        "Product B",
+        "Product C",
+    ]
+
+
+def test_parallel_parse_matches_fused_parse(storage: UploadStorage) -> None:
+    content = sales_xml(40)
+    fused_xml = storage.stage(io.BytesIO(content))
+    staged = storage.stage(io.BytesIO(content))
+
+    with patch("src.celery.celery_worker.upload_storage", storage):
+        fused_summary, fused_products = task_parse_and_analyze_xml(
+            fused_xml.model_dump()
+        )
+        with storage.open(staged) as xml_file:
+            prefix_end, suffix, ranges = split_products(xml_file, 4, min_chunk_size=1)
+        partials = [
+            task_parse_chunk(staged.model_dump(), prefix_end, start, end, suffix)
+            for start, end in ranges
+        ]
+        summary, products = task_merge_aggregates(partials, staged.model_dump())
+
+    assert len(ranges) == 4
+    assert summary == fused_summary
+    assert products["checksum"] == fused_products["checksum"]
+    # XML и NDJSON частей удалены, остались только итоговые NDJSON
+    assert sorted(path.name for path in storage.root.iterdir()) == sorted(
+        [fused_products["key"], products["key"]]
+    )
+
+
+def test_failed_merge_removes_chunks_and_xml(storage: UploadStorage) -> None:
+    staged = storage.stage(io.BytesIO(sales_xml(0)))
+
+    with patch("src.celery.celery_worker.upload_storage", storage):
+        with storage.open(staged) as xml_file:
+            prefix_end, suffix, ranges = split_products(xml_file, 4, min_chunk_size=1)
+        partials = [
+            task_parse_chunk(staged.model_dump(), prefix_end, start, end, suffix)
+            for start, end in ranges
+        ]
+        with pytest.raises(ValueError, match="Data is empty"):
+            task_merge_aggregates(partials, staged.model_dump())
+
+    assert not list(storage.root.iterdir())
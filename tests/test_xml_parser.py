@@ -1,7 +1,36 @@
+from pathlib import Path
+from typing import Iterator
+
 import defusedxml.ElementTree as ET
 import pytest
+from defusedxml import EntitiesForbidden
+
+from src.core.utils.xml_parser import (
+    iter_parse_xml,
+    iter_parse_xml_range,
+    parse_xml,
+    split_products,
+)
 
-from src.core.utils.xml_parser import parse_xml
+
+def sales_xml(count: int) -> bytes:
+    products = "".join(
+        f"""
+            <product>
+                <product_id>{i}</product_id>
+                <name>Товар {i % 7}</name>
+                <quantity>{i % 5 + 1}</quantity>
+                <price>{i}.99</price>
+                <category>Category {i % 3}</category>
+            </product>"""
+        for i in range(count)
+    )
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+    <sales_data date="2024-01-01">
+        <products>{products}
+        </products>
+    </sales_data>
+    """.encode()
 
 
 def test_parse_xml_successful() -> None:
@@ -99,3 +128,174 @@ def test_parse_xml_invalid_xml() -> None:
 
     with pytest.raises(ET.ParseError):
         parse_xml(xml_content)
+
+
+def test_iter_parse_xml_matches_parse_xml() -> None:
+    xml_content = b"""
+    <sales_data date="2024-01-01">
+        <products>
+            <product>
+                <id>1</id>
+                <name>Product A</name>
+                <quantity>100</quantity>
+                <price>1500.00</price>
+                <category>Electronics</category>
+            </product>
+            <product>
+                <id>2</id>
+                <name>Product B</name>
+                <quantity>50</quantity>
+                <price>500.00</price>
+                <category>Home</category>
+            </product>
+        </products>
+    </sales_data>
+    """
+
+    result = iter_parse_xml(xml_content)
+    assert isinstance(result, Iterator)
+    assert list(result) == parse_xml(xml_content)
+
+
+def test_iter_parse_xml_from_file(tmp_path: Path) -> None:
+    xml_path = tmp_path / "sales.xml"
+    xml_path.write_bytes(
+        b"""
+    <sales_data date="2024-01-01">
+        <products>
+            <product>
+                <name>Product A</name>
+                <quantity>1</quantity>
+                <price>10.00</price>
+                <category>Books</category>
+            </product>
+        </products>
+    </sales_data>
+    """
+    )
+
+    assert list(iter_parse_xml(str(xml_path))) == [
+        {
+            "name": "Product A",
+            "quantity": 1,
+            "price": 10.0,
+            "category": "Books",
+            "date": "2024-01-01",
+        }
+    ]
+
+
+def test_iter_parse_xml_no_products() -> None:
+    xml_content = b"""
+    <sales_data date="2024-01-01">
+    </sales_data>
+    """
+
+    with pytest.raises(AttributeError, match="No <products> found in XML"):
+        list(iter_parse_xml(xml_content))
+
+
+def test_iter_parse_xml_missing_field() -> None:
+    xml_content = b"""
+    <sales_data date="2024-01-01">
+        <products>
+            <product>
+                <name>Product A</name>
+                <price>1500.00</price>
+                <category>Electronics</category>
+            </product>
+        </products>
+    </sales_data>
+    """
+
+    with pytest.raises(AttributeError):
+        list(iter_parse_xml(xml_content))
+
+
+def test_iter_parse_xml_invalid_data_type() -> None:
+    xml_content = b"""
+    <sales_data date="2024-01-01">
+        <products>
+            <product>
+                <name>Product A</name>
+                <quantity>invalid_number</quantity>
+                <price>1500.00</price>
+                <category>Electronics</category>
+            </product>
+        </products>
+    </sales_data>
+    """
+
+    with pytest.raises(ValueError):
+        list(iter_parse_xml(xml_content))
+
+
+def test_iter_parse_xml_invalid_xml() -> None:
+    xml_content = b"<sales_data><products><product></products>"
+
+    with pytest.raises(ET.ParseError):
+        list(iter_parse_xml(xml_content))
+
+
+def test_iter_parse_xml_forbids_entities() -> None:
+    xml_content = b"""<?xml version="1.0"?>
+    <!DOCTYPE sales_data [<!ENTITY boom "boom">]>
+    <sales_data date="2024-01-01"><products></products></sales_data>
+    """
+
+    with pytest.raises(EntitiesForbidden):
+        list(iter_parse_xml(xml_content))
+
+
+@pytest.mark.parametrize("chunks", [1, 2, 3, 8])
+def test_split_products_ranges_match_iter_parse_xml(
+    tmp_path: Path, chunks: int
+) -> None:
+    xml_path = tmp_path / "sales.xml"
+    xml_path.write_bytes(sales_xml(50))
+
+    with open(xml_path, "rb") as xml_file:
+        prefix_end, suffix, ranges = split_products(xml_file, chunks, min_chunk_size=1)
+        records = [
+            record
+            for start, end in ranges
+            for record in iter_parse_xml_range(xml_file, prefix_end, start, end, suffix)
+        ]
+
+    assert len(ranges) == chunks
+    assert suffix == "</products></sales_data>"
+    assert records == list(iter_parse_xml(str(xml_path)))
+
+
+def test_split_products_does_not_split_small_files(tmp_path: Path) -> None:
+    xml_path = tmp_path / "sales.xml"
+    xml_path.write_bytes(sales_xml(10))
+
+    with open(xml_path, "rb") as xml_file:
+        _, _, ranges = split_products(xml_file, 4, min_chunk_size=10**6)
+
+    assert len(ranges) == 1
+
+
+def test_split_products_keeps_comments_whole(tmp_path: Path) -> None:
+    xml_path = tmp_path / "sales.xml"
+    xml_path.write_bytes(
+        sales_xml(10).replace(b"<products>", b"<products><!-- <product> -->")
+    )
+
+    with open(xml_path, "rb") as xml_file:
+        prefix_end, suffix, ranges = split_products(xml_file, 4, min_chunk_size=1)
+        records = list(iter_parse_xml_range(xml_file, prefix_end, *ranges[0], suffix))
+
+    # Комментарий может содержать что угодно: файл парсится целиком
+    assert (prefix_end, suffix, ranges) == (0, "", [(0, xml_path.stat().st_size)])
+    assert len(records) == 10
+
+
+def test_split_products_checks_document_outside_products(tmp_path: Path) -> None:
+    xml_path = tmp_path / "sales.xml"
+    xml_path.write_bytes(sales_xml(10).replace(b"</sales_data>", b"</sales>"))
+
+    with open(xml_path, "rb") as xml_file:
+        with pytest.raises(ET.ParseError):
+            split_products(xml_file, 4, min_chunk_size=1)